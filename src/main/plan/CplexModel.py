@@ -12,11 +12,16 @@ File: CplexModel.py
 Description: Builds CPLEX model via python API from event graph
 """
 import time
-import cplex
+try:
+    import cplex
+except ImportError:
+    # reading and building the event graph work without CPLEX (e.g. benchmarks without solver)
+    cplex = None
 from typing import Set, List, Tuple, Dict
-from utils import Global, Timer
+from utils import Global, Timer, Instrumentation
+from main.plan import SolverParameters
 from models.Demand import Request, SplitRequest
-from utils.EventGraph import EventGraph, IdleEvent, PickUpEvent, Event
+from utils.EventGraph import EventGraph, IdleEvent, PickUpEvent, Event, StartEvent
 from models.Network import Bus, Line
 from models.Plan import RouteStop, Route
 
@@ -27,108 +32,269 @@ class CplexSolver:
     """
 
     def __init__(self, event_graph: EventGraph, requests: Set[Request], bus_list: List[Bus]):
-        self.event_graph = event_graph
-        self.requests = requests
+        self.run: Global.Run = Global.current_run()
+        self.config: Global.RunConfig = self.run.config
+        self.metrics: Global.RunMetrics = self.run.metrics
         self.buses = bus_list
-        self.multi_objective = False  # enables two solves with separate objectives if True
+        self.parameters = self.config.SOLVER_PARAMETERS or SolverParameters.DEFAULT_PARAMETERS
+        self.multi_objective = self.parameters["multiObjective"]  # enables two solves with separate objectives if True
+        # rows and variable bounds in the model, to update it in a dynamic context (see update_model)
+        self.row_names: Dict[Tuple, List[str]] = {}
+        self.row_counter: int = 0
+        self.var_bounds: Dict[str, Tuple[float, float]] = {}
+        self.last_solution: Dict[str, float] = {}
+        self.bus_paths: Dict[Bus, List[Event]] = {}  # events visited by every bus in the converted solution
+        self.set_state(event_graph, requests)
         self.model = self.build_model()
 
+    def set_state(self, event_graph: EventGraph, requests: Set[Request]):
+        """
+        Sets the event graph and requests the model is built from, with all information derived from them.
+        :param event_graph: EventGraph
+        :param requests: set of all requests active in the graph
+        """
+        self.event_graph = event_graph
+        self.requests = requests
+        self.fallback_values: Dict[str, float] | None = None  # solution of fallback heuristic, if solver found none
+        self.request_vars: List[str] = [f"q_{x.id}" for x in self.requests]
+        self.time_bounds: Dict[Tuple[SplitRequest, bool], Tuple[int, int]] = {}
+        # dynamic context: requests with executed actions keep their route option, options with splits
+        # that are not part of the event graph (e.g. already passed) can not be selected
+        self.started_requests: Set[Request] = {x[0].parent for x in self.event_graph.fixed_times}
+        # requests accepted by an earlier plan stay accepted
+        self.accepted_requests: Set[Request] = {x for x in self.requests if x.route_int is not None}
+        self.usable_options: Dict[Request, List[int]] = {
+            x: [key for key in x.split_requests if all(self.check_plannable(y) for y in x.split_requests[key])]
+            for x in self.requests}
+
+        # distance costs of all edges are computed only once and reused for every objective
+        km_per_unit = self.config.KM_PER_UNIT
+        self.distance_costs: List[Tuple[str, float]] = []
+        for first_event in self.event_graph.edge_dict.keys():
+            for second_event in self.event_graph.edge_dict[first_event][1]:
+                self.distance_costs.append((f"x_{first_event.id},{second_event.id}",
+                                            first_event.location.calc_distance(second_event.location, km_per_unit)))
+        lines = {x.line for x in self.buses}
+        self.penalty: int = (int(2 * calc_total_network_size(lines, km_per_unit)) * len(self.requests)) + 1
+
+    @Instrumentation.traced("build_model")
     def build_model(self):
         """
         Builds Cplex model
         :return: python cplex class
         """
+        if cplex is None:
+            raise ImportError("CPLEX is not installed, the model can not be built")
         model = cplex.Cplex()
-        # add variables
+        # add variables: q_r, z_i, B_e and x_a (see get_variables)
+        variables = self.get_variables()
+        var_names, var_types, var_low, var_up = zip(*variables)
+        model.variables.add(names=list(var_names), types=list(var_types), lb=list(var_low), ub=list(var_up))
+        self.var_bounds = {x[0]: (x[2], x[3]) for x in variables}
+
+        if self.multi_objective:
+            # lower bound on number of accepted requests for second stage, inactive until first stage is solved
+            model.linear_constraints.add(
+                lin_expr=[cplex.SparsePair(ind=self.request_vars, val=[1] * len(self.request_vars))],
+                senses=["G"],
+                rhs=[0],
+                names=["lexico_bound"]
+            )
+            # maximize number of requests first
+            self.set_stage_objective(model, 1)
+        else:
+            # minimize weighted objective function
+            self.set_stage_objective(model, 0)
+
+        rows = self.get_constraints()
+        self.add_rows(model, rows)
+
+        return model
+
+    def add_rows(self, model, rows: List[Tuple[List[str], List[float], str, float]]):
+        """
+        Adds rows to the model, named by a counter and registered by their content.
+        :param model: python cplex class
+        :param rows: list of rows as tuples (variable names, coefficients, sense, right hand side)
+        """
+        names = [f"c{self.row_counter + x}" for x in range(len(rows))]
+        self.row_counter += len(rows)
+        for name, row in zip(names, rows):
+            self.row_names.setdefault(get_row_key(row), []).append(name)
+        model.linear_constraints.add(
+            lin_expr=[cplex.SparsePair(ind=x[0], val=x[1]) for x in rows],
+            senses=[x[2] for x in rows],
+            rhs=[x[3] for x in rows],
+            names=names
+        )
+
+    @Global.in_run
+    def update_model(self, event_graph: EventGraph, requests: Set[Request]):
+        """
+        Updates the model to the changed event graph and requests of the next replanning (dynamic context)
+        instead of building it again: rows and variables no longer needed are deleted, new ones added and
+        bounds of kept variables adjusted (fixing executed actions and boarded passengers).
+        The last solution is added as MIP start for the kept variables.
+        :param event_graph: EventGraph
+        :param requests: set of all requests active in the graph
+        """
+        self.set_state(event_graph, requests)
+        variables = self.get_variables()
+        new_bounds = {x[0]: (x[2], x[3]) for x in variables}
+
+        # rows are matched by their content, changed rows are replaced
+        old_rows = self.row_names
+        self.row_names = {}
+        added_rows = []
+        for row in self.get_constraints():
+            key = get_row_key(row)
+            if len(old_rows.get(key, [])) > 0:
+                self.row_names.setdefault(key, []).append(old_rows[key].pop())
+            else:
+                added_rows.append(row)
+        removed_rows = [name for names in old_rows.values() for name in names]
+        if len(removed_rows) > 0:
+            self.model.linear_constraints.delete(removed_rows)
+
+        removed_vars = [x for x in self.var_bounds if x not in new_bounds]
+        if len(removed_vars) > 0:
+            self.model.variables.delete(removed_vars)
+        added_vars = [x for x in variables if x[0] not in self.var_bounds]
+        if len(added_vars) > 0:
+            var_names, var_types, var_low, var_up = zip(*added_vars)
+            self.model.variables.add(names=list(var_names), types=list(var_types), lb=list(var_low), ub=list(var_up))
+        changed_vars = [x for x in variables if x[0] in self.var_bounds and self.var_bounds[x[0]] != (x[2], x[3])]
+        if len(changed_vars) > 0:
+            self.model.variables.set_lower_bounds([(x[0], x[2]) for x in changed_vars])
+            self.model.variables.set_upper_bounds([(x[0], x[3]) for x in changed_vars])
+        self.var_bounds = new_bounds
+
+        if self.multi_objective:
+            self.model.linear_constraints.set_coefficients([("lexico_bound", x, 1) for x in self.request_vars])
+            self.set_stage_objective(self.model, 1)
+        else:
+            self.set_stage_objective(self.model, 0)
+        if len(added_rows) > 0:
+            self.add_rows(self.model, added_rows)
+
+        self.model.MIP_starts.delete()
+        start = [(x, y) for x, y in self.last_solution.items() if x in new_bounds]
+        if len(start) > 0:
+            self.model.MIP_starts.add(cplex.SparsePair(ind=[x[0] for x in start], val=[x[1] for x in start]),
+                                      self.model.MIP_starts.effort_level.repair, "previous_plan")
+
+        print(f"Updated Cplex-Model: {len(added_vars)} variables and {len(added_rows)} rows added, "
+              f"{len(removed_vars)} variables and {len(removed_rows)} rows removed")
+
+    def get_variables(self):
+        """
+        Collects all variables of the model.
+        :return: list of tuples (name, type, lower bound, upper bound), type 'B' for binary and 'C' for continuous
+        """
+        variables: List[Tuple[str, str, float, float]] = []
         # q_r for every request, acceptance variable
-        model.variables.add(names=[f'q_{x.id}' for x in self.requests],
-                            types=[model.variables.type.binary] * len(self.requests))
+        variables += [(f'q_{x.id}', "B", int(x in self.accepted_requests), 1) for x in self.requests]
 
         # z_i for route option selection
         for req in self.requests:
             for key in req.split_requests.keys():
-                model.variables.add(names=[f'z_{req.id},{key}'], types=[model.variables.type.binary])
+                variables.append((f'z_{req.id},{key}', "B", int(req in self.started_requests and key == req.route_int),
+                                  int(key in self.usable_options[req])))
 
         # B_e for every split request (shared B_e variables) -> relative based on lower bound
-        for key in self.event_graph.request_dict:
-            variable_args = [{"names": [f"B_{key.split_id}+"], "lb": [Global.TRANSFER_SECONDS],
-                              "ub": [
-                                  key.latest_start_time.get_in_seconds() - key.earl_start_time.get_in_seconds() + Global.TRANSFER_SECONDS]},
-                             {"names": [f"B_{key.split_id}-"], "lb": [Global.TRANSFER_SECONDS],
-                              "ub": [
-                                  key.latest_arr_time.get_in_seconds() - key.earl_arr_time.get_in_seconds() + Global.TRANSFER_SECONDS]}]
-
-            model.variables.add(**variable_args[0])
-            model.variables.add(**variable_args[1])
+        # bounds are tightened by the propagated event windows (see get_time_bounds)
+        # splits already finished are not in the event graph, their times are fixed
+        finished_splits = sorted({x[0] for x in self.event_graph.fixed_times
+                                  if x[0] not in self.event_graph.request_dict}, key=lambda x: x.split_id)
+        for key in list(self.event_graph.request_dict) + finished_splits:
+            pick_low, pick_up = self.get_time_bounds(key, True)
+            drop_low, drop_up = self.get_time_bounds(key, False)
+            variables.append((f"B_{key.split_id}+", "C",
+                              pick_low - key.earl_start_time.get_in_seconds() + self.config.TRANSFER_SECONDS,
+                              pick_up - key.earl_start_time.get_in_seconds() + self.config.TRANSFER_SECONDS))
+            variables.append((f"B_{key.split_id}-", "C",
+                              drop_low - key.earl_arr_time.get_in_seconds() + self.config.TRANSFER_SECONDS,
+                              drop_up - key.earl_arr_time.get_in_seconds() + self.config.TRANSFER_SECONDS))
 
         # x_a for every edge
         for first in self.event_graph.edge_dict:
             for second in self.event_graph.edge_dict[first][1]:
-                model.variables.add(names=[f'x_{first.id},{second.id}'], types=[model.variables.type.binary])
-
-        lines = {x.line for x in self.buses}
-
-        if self.multi_objective:
-            # maximize number of requests first
-            model.objective.set_sense(model.objective.sense.maximize)
-            obj_pairs = [(f"q_{x.id}", 1) for x in self.requests]
+                variables.append((f'x_{first.id},{second.id}', "B", 0, 1))
 
-            model.objective.set_linear(obj_pairs)
+        return variables
 
-        else:
-            # minimize weighted objective function
-            model.objective.set_sense(model.objective.sense.minimize)
-            penalty = (int(2 * calc_total_network_size(lines)) * len(self.requests)) + 1
-            obj_pairs = [(f"q_{x.id}", -penalty) for x in self.requests]
-            for first_event in self.event_graph.edge_dict.keys():
-                for second_event in self.event_graph.edge_dict[first_event][1]:
-                    obj_pairs += [(f"x_{first_event.id},{second_event.id}",
-                                   first_event.location.calc_distance(second_event.location))]
+    def get_constraints(self):
+        """
+        Collects all constraints of the model (except the lexicographic bound).
+        :return: list of rows as tuples (variable names, coefficients, sense, right hand side)
+        """
+        return (self.get_flow_constraints() + self.get_option_constraints() + self.get_idle_constraints()
+                + self.get_timing_constraints() + self.get_request_constraints() + self.get_start_constraints())
 
-            model.objective.set_linear(obj_pairs)
+    def check_plannable(self, split_req: SplitRequest):
+        """
+        :param split_req: SplitRequest
+        :return: True if split has events in the event graph or is already finished
+        """
+        return split_req in self.event_graph.request_dict or (split_req, False) in self.event_graph.fixed_times
 
-        # set up constraints:
-        # for all events: sum out - sum in = 0
+    def get_flow_constraints(self):
+        """
+        For all events: sum out - sum in = 0,
+        a bus leaves its start event exactly once and returns to the idle event of its line
+        :return: list of rows
+        """
+        rows: List[Tuple[List[str], List[float], str, float]] = []
         for key in self.event_graph.edge_dict.keys():
             var_names = [f'x_{x.id},{key.id}' for x in self.event_graph.edge_dict[key][0]] \
                         + [f'x_{key.id},{x.id}' for x in self.event_graph.edge_dict[key][1]]
 
             coeffs = [1] * len(self.event_graph.edge_dict[key][0]) + [-1] * len(self.event_graph.edge_dict[key][1])
-            model.linear_constraints.add(
-                lin_expr=[cplex.SparsePair(ind=var_names, val=coeffs)],
-                senses=["E"],
-                rhs=[0]
-            )
-
-        # for all split_options: sum of incoming edges x_a to first event >= z_i
+            rhs = 0
+            if isinstance(key, StartEvent):
+                rhs = -1
+            elif isinstance(key, IdleEvent):
+                rhs = sum(1 for x in self.event_graph.start_events.values() if x.line == key.line)
+            rows.append((var_names, coeffs, "E", rhs))
+        return rows
+
+    def get_option_constraints(self):
+        """
+        For all split_options: sum of incoming edges x_a to first event >= z_i
+        :return: list of rows
+        """
+        rows: List[Tuple[List[str], List[float], str, float]] = []
         for req in self.requests:
-            for option in req.split_requests:
+            for option in self.usable_options[req]:
                 for split_req in req.split_requests[option]:
+                    # split already picked up
+                    if (split_req, True) in self.event_graph.fixed_times:
+                        continue
                     var_names = []
                     for event in self.event_graph.request_dict[split_req][0]:
                         var_names += [f"x_{x.id},{event.id}" for x in self.event_graph.edge_dict[event][0]]
                     var_names += [f"z_{req.id},{option}"]
                     coeffs = [1] * (len(var_names) - 1) + [-1]
-                    model.linear_constraints.add(
-                        lin_expr=[cplex.SparsePair(ind=var_names, val=coeffs)],
-                        senses=["G"],
-                        rhs=[0]
-                    )
+                    rows.append((var_names, coeffs, "G", 0))
+        return rows
 
-        # for line: sum of outgoing from idle event <= number of buses
+    def get_idle_constraints(self):
+        """
+        For line: sum of outgoing from idle event <= number of buses,
+        timing for every bus from and to idle event (earliest start and latest arrival time of buses)
+        :return: list of rows
+        """
+        rows: List[Tuple[List[str], List[float], str, float]] = []
+        lines = {x.line for x in self.buses}
         for line in lines:
-            amount = sum(1 for x in self.buses if x.line == line)
+            # buses already on their tour leave from their start events
+            amount = sum(1 for x in self.buses if x.line == line and x not in self.event_graph.start_events)
             idle_event = next(
                 iter(x for x in self.event_graph.edge_dict.keys() if isinstance(x, IdleEvent) and x.line == line))
 
             var_names = [f"x_{idle_event.id},{x.id}" for x in self.event_graph.edge_dict[idle_event][1]]
-            model.linear_constraints.add(
-                lin_expr=[cplex.SparsePair(ind=var_names, val=[1] * len(var_names))],
-                senses=["L"],
-                rhs=[amount]
-            )
+            rows.append((var_names, [1] * len(var_names), "L", amount))
 
-        # add timing constraints for every bus from and to idle event (earliest start and latest arrival time of buses)
         for line in lines:
             idle_event = next(
                 iter(x for x in self.event_graph.edge_dict.keys() if isinstance(x, IdleEvent) and x.line == line))
@@ -136,6 +302,8 @@ class CplexSolver:
             # check incoming edges / previous event was drop-off (enforces earliest start time of bus)
             var_dict: Dict[SplitRequest, List[str]] = {}
             for sub_event in self.event_graph.edge_dict[idle_event][0]:
+                if isinstance(sub_event, StartEvent):
+                    continue
                 if sub_event.first in var_dict:
                     var_dict[sub_event.first] += [f"x_{sub_event.id},{idle_event.id}"]
                 else:
@@ -143,13 +311,10 @@ class CplexSolver:
 
             for found_split in var_dict.keys():
                 var_names = [f"B_{found_split.split_id}-"]
-                duration = Timer.calc_time(found_split.drop_off_location.calc_distance(idle_event.location))
+                duration = self.event_graph.travel(found_split.drop_off_location, idle_event.location)
                 coeffs = [duration] * len(var_dict[found_split]) + [1]
-                model.linear_constraints.add(
-                    lin_expr=[cplex.SparsePair(ind=var_dict[found_split] + var_names, val=coeffs)],
-                    senses=["L"],
-                    rhs=[line.end_time.get_in_seconds() - found_split.earl_arr_time.get_in_seconds()]
-                )
+                rows.append((var_dict[found_split] + var_names, coeffs, "L",
+                             line.end_time.get_in_seconds() - found_split.earl_arr_time.get_in_seconds()))
 
             # check outgoing edges / start at idle_event (enforces latest arrival time of bus)
             for sub_event in self.event_graph.edge_dict[idle_event][1]:
@@ -160,18 +325,22 @@ class CplexSolver:
 
             for found_split in var_dict.keys():
                 var_names = [f"B_{found_split.split_id}+"]
-                duration = Timer.calc_time(idle_event.location.calc_distance(found_split.pick_up_location))
+                duration = self.event_graph.travel(idle_event.location, found_split.pick_up_location)
                 coeffs = [-duration] * len(var_dict[found_split]) + [1]
-                model.linear_constraints.add(
-                    lin_expr=[cplex.SparsePair(ind=var_dict[found_split] + var_names, val=coeffs)],
-                    senses=["G"],
-                    rhs=[
-                        line.start_time.get_in_seconds() + Global.TRANSFER_SECONDS - found_split.earl_start_time.get_in_seconds()]
-                )
-
-        # make timing constraints for all subsequent splits in event_graph
+                start_time = line.start_time.get_in_seconds()
+                if self.event_graph.time_now is not None:
+                    start_time = max(start_time, self.event_graph.time_now)
+                rows.append((var_dict[found_split] + var_names, coeffs, "G",
+                             start_time + self.config.TRANSFER_SECONDS - found_split.earl_start_time.get_in_seconds()))
+        return rows
+
+    def get_timing_constraints(self):
+        """
+        Timing constraints for all subsequent splits in event_graph
+        :return: list of rows
+        """
+        rows: List[Tuple[List[str], List[float], str, float]] = []
         for split_req in self.event_graph.request_dict.keys():
-
             for i in {0, 1}:
                 var_dict: Dict[
                     Tuple[SplitRequest, bool], List[str]] = {}  # dict of form: {(request.id, type): [var_names]}
@@ -200,12 +369,11 @@ class CplexSolver:
                         split_first_location = split_req.pick_up_location
                         var_names += [f"B_{split_req.split_id}+"]
                         low_bound_pred = split_req.earl_start_time.get_in_seconds()
-                        up_bound_pred = split_req.latest_start_time.get_in_seconds()
                     else:
                         split_first_location = split_req.drop_off_location
                         var_names += [f"B_{split_req.split_id}-"]
                         low_bound_pred = split_req.earl_arr_time.get_in_seconds()
-                        up_bound_pred = split_req.latest_arr_time.get_in_seconds()
+                    up_bound_pred = self.get_time_bounds(split_req, i == 0)[1]
 
                     if type_bool:
                         split_sec_location = other_split.pick_up_location
@@ -215,21 +383,31 @@ class CplexSolver:
                         split_sec_location = other_split.drop_off_location
                         var_names += [f"B_{other_split.split_id}-"]
                         low_bound_suc = other_split.earl_arr_time.get_in_seconds()
-
-                    duration = Timer.calc_time(split_first_location.calc_distance(split_sec_location))
-                    big_m = get_big_m(up_bound_pred, low_bound_suc, duration)
+                    tight_low_suc = self.get_time_bounds(other_split, type_bool)[0]
+
+                    # big-M only has to cover the tightened windows of both variables,
+                    # if it is not positive the constraint is implied by the variable bounds and left out
+                    duration = self.event_graph.travel(split_first_location, split_sec_location)
+                    big_m = get_big_m(up_bound_pred, tight_low_suc, duration, self.config.TRANSFER_SECONDS)
+                    if big_m <= 0:
+                        continue
                     coeffs = [-big_m] * len(var_dict[found_tuple]) + [-1] + [1]
 
-                    service_time = Global.TRANSFER_SECONDS * (int(bool(duration)))
-                    model.linear_constraints.add(
-                        lin_expr=[cplex.SparsePair(ind=var_dict[found_tuple] + var_names, val=coeffs)],
-                        senses=["G"],
-                        rhs=[service_time - big_m + duration + low_bound_pred - low_bound_suc]
-                    )
+                    service_time = self.config.TRANSFER_SECONDS * (int(bool(duration)))
+                    rows.append((var_dict[found_tuple] + var_names, coeffs, "G",
+                                 service_time - big_m + duration + low_bound_pred - low_bound_suc))
 
+        return rows
+
+    def get_request_constraints(self):
+        """
+        Maximum ride time, timing of subsequent splits at transfer stops and route option selection for every request
+        :return: list of rows
+        """
+        rows: List[Tuple[List[str], List[float], str, float]] = []
         for req in self.requests:
             found_tuples = set()
-            for key in req.split_requests.keys():
+            for key in self.usable_options[req]:
                 start_split = req.split_requests[key][0]
                 end_split = req.split_requests[key][-1]
                 if (start_split, end_split) not in found_tuples:
@@ -238,104 +416,191 @@ class CplexSolver:
                     max_ride_time = (req.latest_arr_time - req.latest_start_time).get_in_seconds()
 
                     # max ride time constraint
-                    model.linear_constraints.add(
-                        lin_expr=[cplex.SparsePair(ind=var_names + [f"B_{end_split.split_id}-"], val=[-1, 1])],
-                        senses=["L"],
-                        rhs=[max_ride_time + start_split.earl_start_time.get_in_seconds()
-                             - end_split.earl_arr_time.get_in_seconds()]
-                    )
+                    rows.append((var_names + [f"B_{end_split.split_id}-"], [-1, 1], "L",
+                                 max_ride_time + start_split.earl_start_time.get_in_seconds()
+                                 - end_split.earl_arr_time.get_in_seconds()))
 
                 # add timing constraint for subsequent split actions at same stop
                 for i in range(0, len(req.split_requests[key]) - 1):
                     prev_split = req.split_requests[key][i]
                     sub_split = req.split_requests[key][i + 1]
                     var_names = [f"B_{prev_split.split_id}-", f"B_{sub_split.split_id}+", f"z_{req.id},{key}"]
-                    sub_m = max(0, (prev_split.latest_arr_time - sub_split.earl_start_time).get_in_seconds())
-                    model.linear_constraints.add(
-                        lin_expr=[cplex.SparsePair(ind=var_names, val=[-1, 1, -sub_m])],
-                        senses=["G"],
-                        rhs=[prev_split.earl_arr_time.get_in_seconds() - sub_split.earl_start_time.get_in_seconds() - sub_m]
-                    )
+                    sub_m = self.get_time_bounds(prev_split, False)[1] - self.get_time_bounds(sub_split, True)[0]
+                    if sub_m <= 0:
+                        continue
+                    rows.append((var_names, [-1, 1, -sub_m], "G",
+                                 prev_split.earl_arr_time.get_in_seconds() - sub_split.earl_start_time.get_in_seconds()
+                                 - sub_m))
 
             # z variables for request sum to p_r
             var_names = [f"z_{req.id},{x}" for x in req.split_requests.keys()] + [f"q_{req.id}"]
             coeffs = [1] * len(req.split_requests.keys()) + [-1]
-            model.linear_constraints.add(
-                lin_expr=[cplex.SparsePair(ind=var_names, val=coeffs)],
-                senses=["E"],
-                rhs=[0]
-            )
+            rows.append((var_names, coeffs, "E", 0))
 
-        return model
+        return rows
+
+    def get_start_constraints(self):
+        """
+        Timing for every bus from its start event (dynamic context), first action not before bus is available
+        :return: list of rows
+        """
+        rows: List[Tuple[List[str], List[float], str, float]] = []
+        for start_event in self.event_graph.start_events.values():
+            var_dict: Dict[Tuple[SplitRequest, bool], List[str]] = {}
+            for sub_event in self.event_graph.edge_dict[start_event][1]:
+                if not isinstance(sub_event, IdleEvent):
+                    poss_tuple = (sub_event.first, isinstance(sub_event, PickUpEvent))
+                    if poss_tuple in var_dict:
+                        var_dict[poss_tuple] += [f"x_{start_event.id},{sub_event.id}"]
+                    else:
+                        var_dict[poss_tuple] = [f"x_{start_event.id},{sub_event.id}"]
+
+            for found_tuple in var_dict.keys():
+                found_split, type_bool = found_tuple
+                if type_bool:
+                    location = found_split.pick_up_location
+                    var_name = f"B_{found_split.split_id}+"
+                    offset = found_split.earl_start_time.get_in_seconds()
+                else:
+                    location = found_split.drop_off_location
+                    var_name = f"B_{found_split.split_id}-"
+                    offset = found_split.earl_arr_time.get_in_seconds()
+                low_bound = self.get_time_bounds(found_split, type_bool)[0]
+                duration = self.event_graph.travel(start_event.location, location)
+                coeff = start_event.earl_depart.get_in_seconds() + duration - low_bound
+                if coeff <= 0:
+                    continue
+                rows.append((var_dict[found_tuple] + [var_name], [-coeff] * len(var_dict[found_tuple]) + [1], "G",
+                             low_bound + self.config.TRANSFER_SECONDS - offset))
+        return rows
+
+    def get_time_bounds(self, split_req: SplitRequest, pick_up: bool):
+        """
+        Bounds on the time of a pick-up/drop-off of a split request (in seconds), used for B_e variables and big-M values.
+        Windows of the split are tightened by the propagated windows of its events, but only in directions
+        that keep the model feasible if the split is not served:
+        the earliest pick-up and latest drop-off always, the latest pick-up only if the split does not start at the
+        pick-up location of its request and the earliest drop-off only if it does not end at its drop-off location
+        (those are bound by the maximum ride time constraint).
+        In a dynamic context executed actions are fixed and remaining ones can not take place before the current time.
+        :param split_req: SplitRequest
+        :param pick_up: True for pick-up, False for drop-off
+        :return: tuple of earliest and latest time
+        """
+        if (split_req, pick_up) in self.time_bounds:
+            return self.time_bounds[(split_req, pick_up)]
+
+        # action already executed (dynamic context)
+        if (split_req, pick_up) in self.event_graph.fixed_times:
+            fixed = self.event_graph.fixed_times[(split_req, pick_up)]
+            self.time_bounds[(split_req, pick_up)] = (fixed, fixed)
+            return fixed, fixed
+
+        if pick_up:
+            low = split_req.earl_start_time.get_in_seconds()
+            up = split_req.latest_start_time.get_in_seconds()
+        else:
+            low = split_req.earl_arr_time.get_in_seconds()
+            up = split_req.latest_arr_time.get_in_seconds()
+
+        event_bounds = self.event_graph.get_split_bounds(split_req, pick_up)
+        if event_bounds is not None:
+            if pick_up:
+                low = min(max(low, event_bounds[0]), up)
+                if split_req.pick_up_location is not split_req.parent.pick_up_location:
+                    up = max(min(up, event_bounds[1]), low)
+            else:
+                up = max(min(up, event_bounds[1]), low)
+                if split_req.drop_off_location is not split_req.parent.drop_off_location:
+                    low = min(max(low, event_bounds[0]), up)
+
+        # remaining actions can not take place in the past
+        if self.event_graph.time_now is not None:
+            low = min(max(low, self.event_graph.time_now), up)
+
+        self.time_bounds[(split_req, pick_up)] = (low, up)
+        return low, up
+
+    def set_stage_objective(self, model, stage: int, accepted: float = 0):
+        """
+        Swaps the objective vector of the model without rebuilding it.
+        Stage 0: weighted objective, stage 1: maximize number of requests,
+        stage 2: minimize travelled km while keeping number of accepted requests.
+        :param model: python cplex class
+        :param stage: objective stage
+        :param accepted: number of accepted requests from first stage (only for stage 2)
+        """
+        if stage == 0:
+            model.objective.set_sense(model.objective.sense.minimize)
+            model.objective.set_linear([(x, -self.penalty) for x in self.request_vars] + self.distance_costs)
+        elif stage == 1:
+            model.objective.set_sense(model.objective.sense.maximize)
+            model.objective.set_linear([(x, 1) for x in self.request_vars] + [(x[0], 0) for x in self.distance_costs])
+            model.linear_constraints.set_rhs("lexico_bound", 0)
+        else:
+            model.objective.set_sense(model.objective.sense.minimize)
+            model.objective.set_linear([(x, 0) for x in self.request_vars] + self.distance_costs)
+            model.linear_constraints.set_rhs("lexico_bound", accepted * 0.99999)
+
+    def get_relative_gap(self):
+        """
+        :return: relative MIP gap of current incumbent in percent, None if no incumbent exists
+        """
+        if not self.model.solution.is_primal_feasible():
+            return None
+        return round(self.model.solution.MIP.get_mip_relative_gap() * 100, 2)
 
-    def solve_model(self):
+    @Global.in_run
+    def solve_model(self, deadline: float = None):
         """
         Starts solve of the model with specific Cplex Parameters.
+        With multi objective, the second stage reuses the model by swapping the objective vectors,
+        is warm started with the incumbent of the first stage and gets the remaining time budget.
+        :param deadline: wall-clock time (as time.time()) the solve has to finish, None for no deadline
         """
         # self.model.parameters.randomseed.set(2)
         # self.model.write("model.lp")
 
-        self.model.parameters.mip.tolerances.mipgap.set(0.0)
-        self.model.parameters.threads.set(31)  # specify number of threads
-        self.model.parameters.workmem.set(27000)  # Up to 27 GB of RAM
+        # parameters from config file (see SolverParameters), overriding the defaults
+        parameters = self.parameters
+        SolverParameters.apply_parameters(self.model, parameters)
         if self.multi_objective:
-            self.model.parameters.timelimit.set(600)
+            self.model.parameters.timelimit.set(get_timelimit(parameters["firstStageTimelimit"], deadline))
         else:
-            self.model.parameters.timelimit.set(900)
-
-        # self.model.parameters.emphasis.mip.set(3)
-
-        self.model.parameters.mip.strategy.nodeselect.set(
-            2)  # (check 1-3)select strategy for selecting node for branching
-        self.model.parameters.mip.strategy.variableselect.set(
-            0)  # (check 0 /-1 - 4) select on which variable to branch on
-
-        self.model.parameters.mip.strategy.lbheur.set(0)  # check(0,1)local branching heuristic
-        self.model.parameters.mip.strategy.heuristicfreq.set(0)  # (check 0/-1) disable use of heuristic
-        self.model.parameters.mip.strategy.rinsheur.set(0)  # 50 = apply every 50 nodes
-        self.model.parameters.preprocessing.presolve.set(1)  # decide if presolve heuristic is used
-        self.model.parameters.preprocessing.numpass.set(-1)  # check(-1, 0) limits number of presolves
-        # self.model.parameters.mip.strategy.presolvenode.set(2) # check(0, -1, 3) decides if presolve at node
-
-        # self.model.parameters.mip.cuts.nodecuts.set(3)
-        # self.model.parameters.mip.cuts.flowcovers.set(2)
-        self.model.parameters.mip.cuts.gomory.set(2)
-        # self.model.parameters.mip.cuts.mircut.set(2)
-        # self.model.parameters.mip.cuts.implied.set(-1)
-        # self.model.parameters.mip.cuts.localimplied.set(-1)
-        # self.model.parameters.mip.cuts.disjunctive.set(2)  # check(0 -1 - 3) choose to use more aggressive cuts
-
-        self.model.parameters.mip.display.set(3)  # set extent of logging
+            self.model.parameters.timelimit.set(get_timelimit(parameters["timelimit"], deadline))
 
         var_names = self.model.variables.get_names()
         var_names_set = set(var_names)
         if len(var_names) != len(var_names_set):
             print("There are duplicate variable names")
 
-        Global.NUMBER_OF_VARIABLES = self.model.variables.get_num()
-        Global.NUMBER_OF_CONSTRAINTS = self.model.linear_constraints.get_num()
+        self.metrics.NUMBER_OF_VARIABLES = self.model.variables.get_num()
+        self.metrics.NUMBER_OF_CONSTRAINTS = self.model.linear_constraints.get_num()
 
         self.model.solve()
 
-        print("Objective Value: " + str(self.model.solution.get_objective_value()))
-        Global.INTEGRALITY_GAP_FIRST = int(self.model.solution.MIP.get_mip_relative_gap() * 100)
-
-        Global.COMPUTATION_TIME_SOLVING_FIRST = round(time.time() - Global.COMPUTATION_START_TIME, 4)
-        print(f"Solved model after {Global.COMPUTATION_TIME_SOLVING_FIRST} seconds")
-        Global.COMPUTATION_START_TIME = time.time()
-
-        if self.multi_objective:
-            # solve again with minimizing travel time
-            req_vars = [f"q_{x.id}" for x in self.requests]
-            value = sum(self.model.solution.get_values(req_vars))
-            self.model.linear_constraints.add(
-                lin_expr=[cplex.SparsePair(ind=req_vars, val=[1] * len(self.requests))],
-                senses=["G"],
-                rhs=[value * 0.99999]
-            )
-
-            self.model.parameters.mip.tolerances.mipgap.set(0.0)
-            self.model.parameters.timelimit.set(900 - int(Global.COMPUTATION_TIME_SOLVING_FIRST))
+        if self.model.solution.is_primal_feasible():
+            print("Objective Value: " + str(self.model.solution.get_objective_value()))
+        else:
+            print("No solution found")
+        self.metrics.SOLUTION_STATUS_FIRST = self.model.solution.get_status_string()
+        self.metrics.INTEGRALITY_GAP_FIRST = self.get_relative_gap()
+        self.metrics.NUMBER_OF_NODES_FIRST = self.model.solution.progress.get_num_nodes_processed()
+
+        self.metrics.COMPUTATION_TIME_SOLVING_FIRST = round(time.time() - self.metrics.COMPUTATION_START_TIME, 4)
+        print(f"Solved model after {self.metrics.COMPUTATION_TIME_SOLVING_FIRST} seconds")
+        self.metrics.COMPUTATION_START_TIME = time.time()
+
+        if self.multi_objective and self.model.solution.is_primal_feasible():
+            # solve again with minimizing travel time, keep incumbent of first stage as start
+            value = sum(self.model.solution.get_values(self.request_vars))
+            incumbent = self.model.solution.get_values()
+            self.model.MIP_starts.add(cplex.SparsePair(ind=list(range(len(incumbent))), val=incumbent),
+                                      self.model.MIP_starts.effort_level.check_feasibility, "first_stage")
+
+            self.set_stage_objective(self.model, 2, value)
+            self.model.parameters.timelimit.set(
+                get_timelimit(max(1, parameters["timelimit"] - self.metrics.COMPUTATION_TIME_SOLVING_FIRST), deadline))
 
             # self.model.parameters.mip.strategy.nodeselect.set(2)
             # self.model.parameters.mip.strategy.lbheur.set(1)
@@ -343,40 +608,70 @@ class CplexSolver:
             # self.model.parameters.mip.cuts.gomory.set(2)
             # self.model.parameters.mip.cuts.flowcovers.set(2)
 
-            self.model.objective.set_sense(self.model.objective.sense.minimize)
-            # reset obj function
-            self.model.objective.set_linear([(f"q_{x.id}", 0) for x in self.requests])
-            obj_pairs = []
-            for first_event in self.event_graph.edge_dict.keys():
-                for second_event in self.event_graph.edge_dict[first_event][1]:
-                    obj_pairs += [(f"x_{first_event.id},{second_event.id}",
-                                   first_event.location.calc_distance(second_event.location))]
-
-            self.model.objective.set_linear(obj_pairs)
             self.model.solve()
 
-            Global.INTEGRALITY_GAP_SECOND = int(self.model.solution.MIP.get_mip_relative_gap() * 100)
+            self.metrics.INTEGRALITY_GAP_SECOND = self.get_relative_gap()
+            self.metrics.NUMBER_OF_NODES_SECOND = self.model.solution.progress.get_num_nodes_processed()
+        else:
+            self.metrics.INTEGRALITY_GAP_SECOND = 0
+            self.metrics.NUMBER_OF_NODES_SECOND = 0
+
+        if self.model.solution.is_primal_feasible():
+            self.last_solution = dict(zip(self.model.variables.get_names(), self.model.solution.get_values()))
+
+        self.metrics.COMPUTATION_TIME_SOLVING_SECOND = round(time.time() - self.metrics.COMPUTATION_START_TIME, 4)
+        print(f"Solved model after {self.metrics.COMPUTATION_TIME_SOLVING_SECOND} seconds")
+        self.metrics.COMPUTATION_START_TIME = time.time()
+
+    def has_solution(self):
+        """
+        :return: True if the solver or the fallback heuristic found a solution
+        """
+        return self.fallback_values is not None or self.model.solution.is_primal_feasible()
 
-        Global.COMPUTATION_TIME_SOLVING_SECOND = round(time.time() - Global.COMPUTATION_START_TIME, 4)
-        print(f"Solved model after {Global.COMPUTATION_TIME_SOLVING_SECOND} seconds")
-        Global.COMPUTATION_START_TIME = time.time()
+    def get_solution(self):
+        """
+        :return: solution of the model, or of the fallback heuristic if set
+        """
+        if self.fallback_values is not None:
+            return FixedSolution(self.fallback_values)
+        return self.model.solution
 
+    def get_path_times(self):
+        """
+        :return: dictionary of B_e variable values of all split actions on the bus paths of the solution
+        """
+        solution = self.get_solution()
+        names = {f"B_{x.first.split_id}{'+' if isinstance(x, PickUpEvent) else '-'}" for path in self.bus_paths.values()
+                 for x in path if not isinstance(x, (IdleEvent, StartEvent))}
+        names = sorted(names)
+        return dict(zip(names, solution.get_values(names)))
+
+    @Global.in_run
+    @Instrumentation.traced("convert_to_plan")
     def convert_to_plan(self):
         """
         Retrieves Cplex Solution values and builds Bus routes.
         Postprocessing required to disregard unnecessarily selected events.
         :return: list of bus routes
         """
+        solution = self.get_solution()
+        self.bus_paths = {}
         # for every bus -> start at idle_event and walk along path
         processed_pick_up: Set[SplitRequest] = set()
         processed_drop_off: Set[SplitRequest] = set()
         request_order = list(self.requests)
         # arc_names = []
-        solution_ints = self.model.solution.get_values([f"q_{x.id}" for x in request_order])
+        solution_ints = solution.get_values([f"q_{x.id}" for x in request_order])
         combi = []
         for i in range(len(request_order)):
             combi.append(f"Request: {request_order[i].id} has value {solution_ints[i]}")
 
+        # store selected route option of every request (None if rejected)
+        for req in request_order:
+            z_vals = solution.get_values([f"z_{req.id},{x}" for x in req.split_requests])
+            req.route_int = next(iter(key for key, val in zip(req.split_requests, z_vals) if round(val) == 1), None)
+
         line_set: Set[Line] = {x.line for x in self.buses}
         line_bus_dict: Dict[Line, List[Bus]] = {x: [y for y in self.buses if y.line == x] for x in line_set}
         all_plans: List[Route] = []
@@ -386,51 +681,65 @@ class CplexSolver:
             idle_event: IdleEvent = next(
                 iter(x for x in self.event_graph.edge_dict.keys() if isinstance(x, IdleEvent) and x.line == line))
             sub_names = [f"x_{idle_event.id},{x.id}" for x in self.event_graph.edge_dict[idle_event][1]]
-            edge_vals = self.model.solution.get_values(sub_names)
+            edge_vals = solution.get_values(sub_names)
             round_edge_vals = [round(x) for x in edge_vals]
 
             # for each bus on line
-            for i in range(len(line_bus_dict[line])):
-                bus = line_bus_dict[line][i]
+            i = -1  # index of bus among buses starting at idle event
+            for bus in line_bus_dict[line]:
+                used: bool = True
                 bus_plan = Route(bus)
+                start_stop: RouteStop | None = None  # current position of a bus already on its tour
 
-                # loop over edge_val with j, for every bus 1 found incr. counter, until counter == i
-                counter = -1  # counter for amount of 1s already found
-                j = -1  # j iterates over edge values
-                while counter < i and j < len(round_edge_vals) - 1:  # if
-                    j += 1
-                    if round_edge_vals[j] == 1:
-                        counter += 1
-                # if counter is smaller then i => no 1 found so bus just stays in place
-                if counter < i:
+                if bus in self.event_graph.start_events:
+                    first_event = self.event_graph.start_events[bus]
+                    start_stop = RouteStop(first_event.location, first_event.earl_depart, first_event.earl_depart, bus)
+                else:
+                    first_event = idle_event
+                    i += 1
+                    # loop over edge_val with j, for every bus 1 found incr. counter, until counter == i
+                    counter = -1  # counter for amount of 1s already found
+                    j = -1  # j iterates over edge values
+                    while counter < i and j < len(round_edge_vals) - 1:  # if
+                        j += 1
+                        if round_edge_vals[j] == 1:
+                            counter += 1
+                    # if counter is smaller then i => no 1 found so bus just stays in place
+                    used = counter >= i
+                if not used:
                     bus_plan.stop_list.append(
                         RouteStop(idle_event.location, bus.line.start_time, bus.line.end_time, bus))
                 else:
-                    curr_route_stop = RouteStop(idle_event.location, bus.line.start_time,
-                                                bus.line.start_time, bus)
+                    if start_stop is not None:
+                        curr_route_stop = start_stop
+                    else:
+                        curr_route_stop = RouteStop(idle_event.location, bus.line.start_time,
+                                                    bus.line.start_time, bus)
                     bus_plan.stop_list.append(curr_route_stop)
 
-                    next_event = get_next_event(idle_event, self.event_graph.edge_dict, self.model.solution,
+                    next_event = get_next_event(first_event, self.event_graph.edge_dict, solution,
                                                 prev_visited)
+                    self.bus_paths[bus] = [first_event]
 
                     while next_event is not idle_event:
+                        self.bus_paths[bus].append(next_event)
                         # check selected option for request -> if event fits with option:
                         z_options = list(next_event.first.parent.split_requests.keys())
-                        z_options_vals = self.model.solution.get_values(
+                        z_options_vals = solution.get_values(
                             [f"z_{next_event.first.id},{x}" for x in z_options])
                         z_options_vals_round = [round(x) for x in z_options_vals]
 
                         if 1 in z_options_vals_round and next_event.first in next_event.first.parent.split_requests[
                             z_options[z_options_vals_round.index(1)]]:
 
-                            if next_event.location != curr_route_stop.stop:
+                            # actions after the start of a bus form a new stop, start stop was already executed
+                            if next_event.location != curr_route_stop.stop or curr_route_stop is start_stop:
 
-                                duration = Timer.calc_time(
-                                    curr_route_stop.stop.calc_distance(next_event.location))
+                                duration = self.event_graph.travel(curr_route_stop.stop, next_event.location)
                                 if isinstance(next_event, PickUpEvent):
                                     if next_event.first not in processed_pick_up:
                                         time_var = round(
-                                            self.model.solution.get_values(f"B_{next_event.first.split_id}+"))
+                                            solution.get_values(f"B_{next_event.first.split_id}+"))
                                         curr_route_stop = RouteStop(next_event.location,
                                                                     curr_route_stop.depart_time.add_seconds(duration),
                                                                     Timer.create_time_object(
@@ -444,7 +753,7 @@ class CplexSolver:
                                 else:
                                     if next_event.first not in processed_drop_off:
                                         time_var = round(
-                                            self.model.solution.get_values(f"B_{next_event.first.split_id}-"))
+                                            solution.get_values(f"B_{next_event.first.split_id}-"))
                                         curr_route_stop = RouteStop(next_event.location,
                                                                     curr_route_stop.depart_time.add_seconds(duration),
                                                                     Timer.create_time_object(time_var
@@ -459,7 +768,7 @@ class CplexSolver:
                                 if isinstance(next_event, PickUpEvent):
                                     if next_event.first not in processed_pick_up:
                                         time_var = (round(
-                                            self.model.solution.get_values(f"B_{next_event.first.split_id}+"))
+                                            solution.get_values(f"B_{next_event.first.split_id}+"))
                                                     + next_event.first.earl_start_time.get_in_seconds())
                                         curr_route_stop.pick_up.add(next_event.first.parent)
                                         processed_pick_up.add(next_event.first)
@@ -467,7 +776,7 @@ class CplexSolver:
                                         print(f"Double serviced request removed: {next_event}")
                                 else:
                                     if next_event.first not in processed_drop_off:
-                                        time_var = (self.model.solution.get_values(f"B_{next_event.first.split_id}-")
+                                        time_var = (solution.get_values(f"B_{next_event.first.split_id}-")
                                                     + next_event.first.earl_arr_time.get_in_seconds())
                                         curr_route_stop.drop_off.add(next_event.first.parent)
                                         processed_drop_off.add(next_event.first)
@@ -478,26 +787,59 @@ class CplexSolver:
                         else:
                             print(f"Unnecessary event removed: {next_event}")
 
-                        next_event = get_next_event(next_event, self.event_graph.edge_dict, self.model.solution,
+                        next_event = get_next_event(next_event, self.event_graph.edge_dict, solution,
                                                     prev_visited)
 
                     # handle final idle_event stop
                     if curr_route_stop.stop == bus.line.depot:
                         curr_route_stop.depart_time = bus.line.end_time
                     else:
-                        duration = Timer.calc_time(curr_route_stop.stop.calc_distance(next_event.location))
+                        duration = self.event_graph.travel(curr_route_stop.stop, next_event.location)
                         bus_plan.stop_list.append(
                             RouteStop(next_event.location, curr_route_stop.depart_time.add_seconds(duration),
                                       bus.line.end_time, bus))
                     if len(bus_plan.stop_list) > 1:
-                        duration = Timer.create_time_object(Timer.calc_time(
-                            bus_plan.stop_list[0].stop.calc_distance(bus_plan.stop_list[1].stop)))
+                        duration = Timer.create_time_object(
+                            self.event_graph.travel(bus_plan.stop_list[0].stop, bus_plan.stop_list[1].stop))
                         bus_plan.stop_list[0].depart_time = (bus_plan.stop_list[1].arriv_time - duration)
                 all_plans.append(bus_plan)
 
         return all_plans
 
 
+class FixedSolution:
+    """
+    Solution given by variable values (e.g. of the fallback heuristic), read like a Cplex solution.
+    Variables without value are 0.
+    """
+    def __init__(self, values: Dict[str, float]):
+        self.values = values
+
+    def get_values(self, names):
+        if isinstance(names, str):
+            return self.values.get(names, 0)
+        return [self.values.get(x, 0) for x in names]
+
+
+def get_timelimit(limit: float, deadline: float | None):
+    """
+    :param limit: configured time limit of a solve (in seconds)
+    :param deadline: wall-clock time (as time.time()) the solve has to finish, None for no deadline
+    :return: time limit cut to the time left until the deadline
+    """
+    if deadline is None:
+        return limit
+    return max(0.1, min(limit, deadline - time.time()))
+
+
+def get_row_key(row: Tuple[List[str], List[float], str, float]):
+    """
+    :param row: tuple (variable names, coefficients, sense, right hand side)
+    :return: hashable content of row
+    """
+    return tuple(row[0]), tuple(row[1]), row[2], row[3]
+
+
 def get_next_event(prev_event: Event, edge_dict: dict, solution, prev_visited: dict):
     """
     Find next event from current event and activated edges.
@@ -527,14 +869,22 @@ def get_next_event(prev_event: Event, edge_dict: dict, solution, prev_visited: d
     return next_event
 
 
-def calc_total_network_size(line_set: Set[Line]):
+def calc_total_network_size(line_set: Set[Line], km_per_unit: float):
     total_sum = 0
     for line in line_set:
         for i in range(len(line.stops) - 1):
-            total_sum += line.stops[i].calc_distance(line.stops[i + 1])
+            total_sum += line.stops[i].calc_distance(line.stops[i + 1], km_per_unit)
 
     return total_sum
 
 
-def get_big_m(pred_up_bound: float, suc_low_bound: float, duration: float):
-    return pred_up_bound - suc_low_bound + duration + Global.TRANSFER_SECONDS
+def get_big_m(pred_up_bound: float, suc_low_bound: float, duration: float, transfer_seconds: int):
+    """
+    Smallest big-M for timing constraint between two actions, such that it is redundant if no edge between them is used.
+    :param pred_up_bound: latest time of preceding action
+    :param suc_low_bound: earliest time of succeeding action
+    :param duration: travel time between both actions
+    :param transfer_seconds: service time at a stop
+    :return: big-M value (not positive if constraint is always satisfied)
+    """
+    return pred_up_bound - suc_low_bound + duration + transfer_seconds * int(bool(duration))
@@ -0,0 +1,45 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: DecompositionMILP.py
+Description: Builds the same event graph as the EventBasedMILP,
+            but solves it by decomposition into routing subproblems per line (see DecompositionModel).
+"""
+import time
+from typing import Set
+from utils import Instrumentation
+from main.plan.DecompositionModel import DecompositionSolver
+from main.plan.EventBasedMILP import EventBasedMILP
+from models.Demand import Request
+
+
+class DecompositionMILP(EventBasedMILP):
+    """
+    Implements Planner Interface, event graph is solved with a Lagrangian decomposition over the lines.
+    """
+
+    def solve_event_graph(self, all_active_requests: Set[Request], deadline: float = None):
+        """
+        Builds the line subproblems and the monolithic model for recovery, solves and converts to routes.
+        :param all_active_requests: set of all requests active in the graph
+        :param deadline: wall-clock time (as time.time()) a plan has to be returned, None for no deadline
+        :return: list of bus routes
+        """
+        with Instrumentation.span("model_build"):
+            decomp_model: DecompositionSolver = DecompositionSolver(self.event_graph, all_active_requests,
+                                                                    self.bus_list)
+
+        self.metrics.COMPUTATION_TIME_BUILDING_CPLEX = round(time.time() - self.metrics.COMPUTATION_START_TIME, 4)
+        print(f"Build the decomposition after {self.metrics.COMPUTATION_TIME_BUILDING_CPLEX} seconds")
+        self.metrics.COMPUTATION_START_TIME = time.time()
+
+        with Instrumentation.span("solve"):
+            decomp_model.solve_model(deadline)
+        return self.convert_solution(decomp_model)
@@ -0,0 +1,289 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: DecompositionModel.py
+Description: Lagrangian decomposition of the event based model into routing subproblems per line.
+            Lines only interact over the route option selection (z, q) and the timing of subsequent splits,
+            these linking constraints are relaxed and coordinated by subgradient updates of their multipliers.
+"""
+import time
+try:
+    import cplex
+except ImportError:
+    cplex = None  # CplexSolver raises when a model is built
+from concurrent.futures import ThreadPoolExecutor
+from typing import Set, List, Tuple, Dict
+from utils import Global
+from main.plan import SolverParameters
+from main.plan.CplexModel import CplexSolver, get_timelimit
+from models.Demand import Request
+from utils.EventGraph import EventGraph, IdleEvent, Event, get_event_line
+from models.Network import Bus, Line
+
+
+class DecompositionSolver(CplexSolver):
+    """
+    Solves the Lagrangian dual of the event based model with one routing subproblem per line (solved in parallel)
+    and a master problem over the route options (solved in closed form).
+    The monolithic model is kept for primal recovery, restricted to the route options chosen by the master.
+    """
+
+    def __init__(self, event_graph: EventGraph, requests: Set[Request], bus_list: List[Bus]):
+        super().__init__(event_graph, requests, bus_list)
+        self.lines: List[Line] = sorted({x.line for x in self.buses}, key=lambda l: l.id)
+        self.var_owner: Dict[str, Line] = {}  # line of every subproblem variable, q_r and z_i belong to the master
+        self.local_rows: Dict[Line, List[Tuple[List[str], List[float], str, float]]] = {x: [] for x in self.lines}
+        self.linking_rows: List[Tuple[List[str], List[float], float]] = []  # in form: sum coeffs * vars <= rhs
+        self.multipliers: List[float] = []
+        self.subproblems: Dict[Line, cplex.Cplex] = {}
+        self.sub_vars: Dict[Line, List[str]] = {x: [] for x in self.lines}
+        self.lower_bound: float | None = None
+        self.master_choice: Dict[Request, object] = {}  # selected route option for every accepted request
+        self.sub_values: Dict[str, float] = {}
+        self.deadline: float | None = None  # wall-clock time of the current solve, cuts every subproblem solve
+        self.build_subproblems()
+
+    def build_subproblems(self):
+        """
+        Assigns variables to lines, splits the constraints in local rows of one line and linking rows,
+        then builds a Cplex model per line from its local rows.
+        """
+        for split_req in self.event_graph.request_dict:
+            self.var_owner[f"B_{split_req.split_id}+"] = split_req.line
+            self.var_owner[f"B_{split_req.split_id}-"] = split_req.line
+        for first in self.event_graph.edge_dict:
+            for second in self.event_graph.edge_dict[first][1]:
+                self.var_owner[f"x_{first.id},{second.id}"] = get_event_line(first)
+
+        # initial multipliers of route option rows share half the penalty of a request among the splits of an option,
+        # so the master starts with accepting all requests
+        option_length = {f"z_{x.id},{key}": len(x.split_requests[key]) for x in self.requests
+                         for key in x.split_requests}
+        option_rows = self.get_option_constraints()
+        other_rows = (self.get_flow_constraints() + self.get_idle_constraints() + self.get_timing_constraints()
+                      + self.get_request_constraints())
+
+        for is_option, rows in ((True, option_rows), (False, other_rows)):
+            for row in rows:
+                var_names, coeffs, sense, rhs = row
+                owners = {self.var_owner.get(x) for x in var_names}
+                if len(owners) == 0 or owners == {None}:
+                    # rows only over q_r and z_i are solved by the master
+                    continue
+                if len(owners) == 1:
+                    self.local_rows[owners.pop()].append(row)
+                else:
+                    if sense == "E":
+                        raise ValueError("equality constraints can not be relaxed in the decomposition")
+                    if sense == "G":
+                        coeffs = [-x for x in coeffs]
+                        rhs = -rhs
+                    self.linking_rows.append((var_names, coeffs, rhs))
+                    if is_option:
+                        self.multipliers.append(self.penalty / (2 * option_length[var_names[-1]]))
+                    else:
+                        self.multipliers.append(0)
+
+        line_vars: Dict[Line, List[Tuple[str, str, float, float]]] = {x: [] for x in self.lines}
+        for variable in self.get_variables():
+            if variable[0] in self.var_owner:
+                line_vars[self.var_owner[variable[0]]].append(variable)
+        # lines without any split have nothing to route
+        self.lines = [x for x in self.lines if len(line_vars[x]) > 0]
+        threads = max(1, self.parameters["threads"] // max(1, len(self.lines)))
+
+        for line in self.lines:
+            model = cplex.Cplex()
+            model.set_log_stream(None)
+            model.set_results_stream(None)
+            model.set_warning_stream(None)
+            var_names, var_types, var_low, var_up = zip(*line_vars[line])
+            model.variables.add(names=list(var_names), types=list(var_types), lb=list(var_low), ub=list(var_up))
+            rows = self.local_rows[line]
+            model.linear_constraints.add(
+                lin_expr=[cplex.SparsePair(ind=x[0], val=x[1]) for x in rows],
+                senses=[x[2] for x in rows],
+                rhs=[x[3] for x in rows]
+            )
+            model.objective.set_sense(model.objective.sense.minimize)
+            SolverParameters.apply_parameters(model, self.parameters)
+            model.parameters.threads.set(threads)
+            model.parameters.timelimit.set(self.parameters["subproblemTimelimit"])
+            self.subproblems[line] = model
+            self.sub_vars[line] = list(var_names)
+
+    @Global.in_run
+    def solve_subproblem(self, line: Line, obj_coeffs: Dict[str, float]):
+        """
+        Solves the routing subproblem of a line with the current Lagrangian objective.
+        :param line: Line of subproblem
+        :param obj_coeffs: objective coefficients of all variables (missing ones are 0)
+        :return: lower bound of subproblem and dictionary of variable values (None if no solution found)
+        """
+        model = self.subproblems[line]
+        model.objective.set_linear([(x, obj_coeffs.get(x, 0)) for x in self.sub_vars[line]])
+        model.parameters.timelimit.set(get_timelimit(self.parameters["subproblemTimelimit"], self.deadline))
+        model.solve()
+        if not model.solution.is_primal_feasible():
+            return None, None
+        values = model.solution.get_values(self.sub_vars[line])
+        return model.solution.MIP.get_best_objective(), dict(zip(self.sub_vars[line], values))
+
+    def solve_master(self, obj_coeffs: Dict[str, float]):
+        """
+        Selects the cheapest route option for every request, accepts it if cheaper than the penalty of rejection.
+        :param obj_coeffs: objective coefficients of the z_i variables
+        :return: objective value of master and dictionary of variable values
+        """
+        value = 0
+        values: Dict[str, float] = {}
+        self.master_choice = {}
+        for req in self.requests:
+            options = self.usable_options[req]
+            if req in self.started_requests:
+                options = [req.route_int]
+            for option in req.split_requests:
+                values[f"z_{req.id},{option}"] = 0
+            values[f"q_{req.id}"] = 0
+            if len(options) == 0:
+                continue
+            costs = [obj_coeffs.get(f"z_{req.id},{x}", 0) for x in options]
+            best_idx = costs.index(min(costs))
+            accept = costs[best_idx] - self.penalty < 0 or req in self.accepted_requests
+            if accept:
+                values[f"z_{req.id},{options[best_idx]}"] = 1
+                values[f"q_{req.id}"] = 1
+                value += costs[best_idx] - self.penalty
+                self.master_choice[req] = options[best_idx]
+        return value, values
+
+    def solve_dual(self):
+        """
+        Subgradient optimization of the multipliers of the linking rows, step size after Polyak.
+        Rejecting all (not yet accepted) requests is feasible, so 0 is used as estimate of the upper bound for the step size.
+        """
+        start_time = time.time()
+        base_costs: Dict[str, float] = dict(self.distance_costs)
+        theta = 2.0
+        no_improvement = 0
+        iteration = 0
+        best_choice: Dict[Request, object] = {}
+        best_values: Dict[str, float] = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, len(self.lines))) as pool:
+            while (iteration < self.parameters["decompositionIterations"]
+                   and time.time() - start_time < self.parameters["decompositionTimelimit"]):
+                iteration += 1
+                obj_coeffs = base_costs.copy()
+                constant = 0
+                for idx, (var_names, coeffs, rhs) in enumerate(self.linking_rows):
+                    if self.multipliers[idx] == 0:
+                        continue
+                    for name, coeff in zip(var_names, coeffs):
+                        obj_coeffs[name] = obj_coeffs.get(name, 0) + self.multipliers[idx] * coeff
+                    constant -= self.multipliers[idx] * rhs
+
+                master_value, values = self.solve_master(obj_coeffs)
+                results = list(pool.map(lambda l: self.solve_subproblem(l, obj_coeffs), self.lines))
+                if any(x[1] is None for x in results):
+                    print("Subproblem without solution, decomposition stopped")
+                    break
+                for sub_bound, sub_values in results:
+                    values |= sub_values
+
+                dual_value = sum(x[0] for x in results) + master_value + constant
+                if self.lower_bound is None or dual_value > self.lower_bound + 1e-6:
+                    self.lower_bound = dual_value
+                    best_choice, best_values = self.master_choice, values
+                    no_improvement = 0
+                else:
+                    no_improvement += 1
+                    if no_improvement >= 5:
+                        theta /= 2
+                        no_improvement = 0
+
+                subgradient = [sum(c * values[n] for n, c in zip(var_names, coeffs)) - rhs
+                               for var_names, coeffs, rhs in self.linking_rows]
+                # rows that are satisfied with a multiplier of 0 do not move
+                norm = sum(g ** 2 for g, m in zip(subgradient, self.multipliers) if g > 0 or m > 0)
+                if norm == 0 or theta < 1e-3:
+                    break
+                step = theta * abs(0 - dual_value) / norm
+                self.multipliers = [max(0.0, m + step * g) for m, g in zip(self.multipliers, subgradient)]
+                print(f"Decomposition iteration {iteration}: dual value {round(dual_value, 4)}, "
+                      f"best bound {round(self.lower_bound, 4)}")
+
+        # primal recovery starts from the iteration with the best bound
+        self.master_choice, self.sub_values = best_choice, best_values
+        self.metrics.DECOMPOSITION_ITERATIONS = iteration
+        self.metrics.DECOMPOSITION_BOUND = None if self.lower_bound is None else round(self.lower_bound, 4)
+        self.metrics.COMPUTATION_TIME_DECOMPOSITION = round(time.time() - start_time, 4)
+
+    def restrict_model(self):
+        """
+        Restricts the monolithic model to the route options selected by the master:
+        other route options and all edges to or from events with splits of other options are fixed to 0.
+        The last subproblem solution is added as start, to be repaired by Cplex.
+        """
+        allowed: Set[int] = set()
+        fixed: List[str] = []
+        for req in self.requests:
+            for key in req.split_requests:
+                if self.master_choice.get(req) == key:
+                    allowed |= {x.split_id for x in req.split_requests[key]}
+                else:
+                    fixed.append(f"z_{req.id},{key}")
+
+        for first in self.event_graph.edge_dict:
+            for second in self.event_graph.edge_dict[first][1]:
+                if not (check_event_allowed(first, allowed) and check_event_allowed(second, allowed)):
+                    fixed.append(f"x_{first.id},{second.id}")
+
+        if len(fixed) > 0:
+            self.model.variables.set_upper_bounds([(x, 0) for x in fixed])
+
+        fixed_set = set(fixed)
+        start = [(x, y) for x, y in self.sub_values.items() if x not in fixed_set]
+        if len(start) > 0:
+            self.model.MIP_starts.add(cplex.SparsePair(ind=[x[0] for x in start], val=[x[1] for x in start]),
+                                      self.model.MIP_starts.effort_level.repair, "decomposition")
+
+    @Global.in_run
+    def solve_model(self, deadline: float = None):
+        """
+        Solves the Lagrangian dual, then the restricted monolithic model within the remaining time budget.
+        Without a route option selected by the master (no iteration with solutions of all subproblems or no request
+        accepted), the monolithic model is solved without restriction.
+        :param deadline: wall-clock time (as time.time()) the solve has to finish, None for no deadline
+        """
+        self.deadline = deadline
+        if deadline is not None:
+            self.parameters = self.parameters | {"decompositionTimelimit": min(
+                self.parameters["decompositionTimelimit"], max(0.0, deadline - time.time()))}
+        self.solve_dual()
+        if len(self.master_choice) > 0:
+            self.restrict_model()
+        else:
+            print("No route options selected by the decomposition, solving the unrestricted model")
+        self.parameters = self.parameters | {
+            "timelimit": max(1, self.parameters["timelimit"] - self.metrics.COMPUTATION_TIME_DECOMPOSITION)}
+        super().solve_model(deadline)
+
+
+def check_event_allowed(event: Event, allowed: Set[int]):
+    """
+    Checks if all splits of an event (acting and in vehicle) belong to the selected route options.
+    :param event: Event
+    :param allowed: set of split ids of selected route options
+    :return: bool
+    """
+    if isinstance(event, IdleEvent):
+        return True
+    return event.first.split_id in allowed and event.remaining_split_id <= allowed
@@ -14,12 +14,14 @@ Description: Build the event graph from all requests and their route options.
 """
 import time
 from typing import List, Set, Dict, Tuple
-from utils import Global, Timer
+from utils import Global, Timer, Instrumentation
 from main.plan.CplexModel import CplexSolver
+from main.plan.InsertionHeuristic import build_fallback_solution
 from main.plan.Planner import Planner
 from models.Demand import SplitRequest, Request
-from utils.EventGraph import EventGraph, Event, PickUpEvent, DropOffEvent, IdleEvent
+from utils.EventGraph import EventGraph, Event, PickUpEvent, DropOffEvent, IdleEvent, StartEvent, get_event_line
 from utils.LineGraph import LineGraph
+from utils.Global import RunConfig
 from utils.Timer import TimeImpl
 from models.Network import Bus, Stop, Line
 
@@ -46,6 +48,7 @@ def check_on_route(split: SplitRequest, search_loc: Stop):
     return False
 
 
+@Instrumentation.timed("sweep_line_local")
 def sweep_line_local(splits_in_dir: Set[SplitRequest], line: Line, direction: int):
     """
     Sweep-Line-Algorithm; for splitRequest find candidates of splitRequests to be in vehicle
@@ -100,6 +103,7 @@ def sweep_line_local(splits_in_dir: Set[SplitRequest], line: Line, direction: in
     return output_dict
 
 
+@Instrumentation.timed("sweep_line_time")
 def sweep_line_time(splits_on_line: Set[SplitRequest]):
     """
     Sweep-Line-Algorithm; for splitRequests of line find candidates of splitRequests to be in vehicle
@@ -174,7 +178,12 @@ class EventBasedMILP(Planner):
     def __init__(self, bus_list: List[Bus], network_graph: LineGraph):
         super().__init__(bus_list, network_graph)
         self.event_graph = None
+        self.cplex_model: CplexSolver | None = None
+        # previous plan, continued by the fallback heuristic
+        self.bus_paths: Dict[Bus, List[Event]] = {}
+        self.path_times: Dict[str, float] = {}
 
+    @Instrumentation.timed("get_combinations")
     def get_combinations(self, event_user: SplitRequest, cand_list: List[SplitRequest], curr_combi: Set[SplitRequest],
                          index: int, event_type: bool) -> Set[Event]:
         """
@@ -201,7 +210,7 @@ class EventBasedMILP(Planner):
                 # if max length exceeded stop
                 if (sum(x.number_of_passengers for x in
                         next_permut) + event_user.number_of_passengers) <= event_user.line.capacity:
-                    earl_time, lat_time = get_event_window(event_user, next_permut, event_type)
+                    earl_time, lat_time = get_event_window(event_user, next_permut, event_type, self.config)
                     if earl_time is not None and lat_time is not None:
                         event: Event
                         if event_type:
@@ -213,38 +222,89 @@ class EventBasedMILP(Planner):
             index += 1
         return return_set
 
+    @Instrumentation.traced("line_events")
+    def get_line_events(self, splits_in_dir: Set[SplitRequest], line: Line, direction: int,
+                        new_splits: Set[SplitRequest] = None):
+        """
+        Builds pick-up and drop-off events of the splitRequests on a line and direction from their candidate sets.
+        :param splits_in_dir: set of SplitRequests on the line and direction
+        :param line: line of SplitRequests
+        :param direction: direction of SplitRequests
+        :param new_splits: only events with at least one of these splits are built (others are already in the graph),
+                            None builds all events
+        :return: set of events
+        """
+        # local_cand_map generate pick_up candidates and drop off candidates
+        local_cand_dict: Dict[SplitRequest, Tuple[Set[SplitRequest], Set[SplitRequest]]] = \
+            sweep_line_local(splits_in_dir, line, direction)
+
+        time_cand_dict: Dict[SplitRequest, Tuple[Set[SplitRequest], Set[SplitRequest]]] = sweep_line_time(
+            splits_in_dir)
+
+        agg_cand_dict: Dict[SplitRequest, Tuple[Set[SplitRequest], Set[SplitRequest]]] = {}
+        for split_req in local_cand_dict.keys():
+            agg_cand_dict[split_req] = (local_cand_dict[split_req][0] & time_cand_dict[split_req][0],
+                                        local_cand_dict[split_req][1] & time_cand_dict[split_req][1])
+
+        permutations: Set[Event] = set()
+        for event_user in agg_cand_dict.keys():
+            for event_type in (True, False):
+                # splits seated in a bus only need drop-off events
+                if event_type and (event_user, True) in self.event_graph.fixed_times:
+                    continue
+                cand_list = list(agg_cand_dict[event_user][int(not event_type)])
+
+                if new_splits is None or event_user in new_splits:
+                    if event_type:
+                        permutations.add(
+                            PickUpEvent(event_user, set(), event_user.earl_start_time, event_user.latest_start_time))
+                    else:
+                        permutations.add(
+                            DropOffEvent(event_user, set(), event_user.earl_arr_time, event_user.latest_arr_time))
+                    permutations |= self.get_combinations(event_user, cand_list, set(), 0, event_type)
+                else:
+                    # combinations with new candidates, each built from the first new candidate it contains
+                    seeds = [x for x in cand_list if x in new_splits]
+                    for idx, seed in enumerate(seeds):
+                        seed_events = self.get_combinations(event_user, [seed], set(), 0, event_type)
+                        if len(seed_events) > 0:
+                            others = [x for x in cand_list if x not in seeds[:idx + 1]]
+                            permutations |= seed_events | self.get_combinations(event_user, others, {seed}, 0,
+                                                                                 event_type)
+        return permutations
+
     def walk_route(self, req: Request, bus_user_dict: Dict[Bus, Set[Request]], next_bus_locations: Dict[Bus, Stop]):
         """
-        For usage in dynamic context: finds future splitRequests of an already picked-up Requests selected route option.
+        For usage in dynamic context: finds future splitRequests of an already started Requests selected route option.
+        Times of executed actions (reported by the Executor) are fixed in the event graph.
         :param req: a Request that is already planned
         :param bus_user_dict: current requests seated in buses
         :param next_bus_locations: dictionary of next bus stops according to plan
-        :return: current active splitRequest and following of route option
+        :return: current active splitRequest (if seated in bus) and following of route option
         """
-        # find current position -> walk among selected route to position -> return all future splits
-        bus: Bus = next(k for k, v in bus_user_dict if req in v)
-
-        curr_location: Stop = next_bus_locations[bus]
+        bus: Bus | None = next(iter(k for k, v in bus_user_dict.items() if req in v), None)
 
-        result = {}
-        found: bool = False
+        result: Set[SplitRequest] = set()
         for split in req.split_requests[req.route_int]:
-            if not found:
-                if split.line == bus.line:
-                    split.in_action = True
-                    if check_on_route(split, curr_location):
-                        found = True
-                        result += split
+            if split.act_start_time is not None:
+                split.in_action = True
+                self.event_graph.fixed_times[(split, True)] = split.act_start_time.get_in_seconds()
+                if split.act_end_time is not None:
+                    self.event_graph.fixed_times[(split, False)] = split.act_end_time.get_in_seconds()
                 else:
-                    split.in_action = True
+                    # currently seated, bus has to be on line of split and on its route
+                    if bus is None or split.line != bus.line or not check_on_route(split, next_bus_locations[bus]):
+                        raise ValueError(f"Request {req.id} is not seated in a bus of its current split")
+                    result.add(split)
             else:
-                result += split
+                result.add(split)
 
         return result
 
+    @Global.in_run
     def make_plan(self, new_requests: Set[Request], next_bus_locations: Dict[Bus, Stop],
                   bus_user_dict: Dict[Bus, Set[Request]], wait_user_locations: Dict[Request, Stop],
-                  bus_delay: Dict[Bus, float]):
+                  bus_delay: Dict[Bus, float], time_now: TimeImpl = None, deadline: float = None):
         """
         Creates a plan based on new incoming requests and previously known requests.
         Builds candidate sets for splitRequest actions, then events and graph.
@@ -254,21 +314,64 @@ class EventBasedMILP(Planner):
         :param bus_user_dict: dictionary of request allocations in buses
         :param wait_user_locations: dictionary of request locations still waiting
         :param bus_delay: dictionary of time until bus reaches next stop
+        :param time_now: current time in a dynamic context, None plans the whole day from the depots
+        :param deadline: wall-clock time (as time.time()) a plan has to be returned, None for no deadline
         """
+        with Instrumentation.span("event_graph"):
+            all_active_requests = self.build_event_graph(new_requests, next_bus_locations, bus_user_dict,
+                                                         wait_user_locations, bus_delay, time_now)
 
-        self.event_graph = EventGraph()
+        self.metrics.COMPUTATION_TIME_BUILDING = round(time.time() - self.metrics.COMPUTATION_START_TIME, 4)
+        print(f"Created EventGraph after {self.metrics.COMPUTATION_TIME_BUILDING} seconds")
+        print(self.event_graph.data_in_string())
+        self.metrics.EVENT_GRAPH_NODES = len(self.event_graph.edge_dict.keys())
+        self.metrics.EVENT_GRAPH_EDGES = self.event_graph.get_number_of_edges()
+        self.metrics.NUMBER_OF_SPLITS = len(self.event_graph.request_dict.keys())
+        self.metrics.COMPUTATION_START_TIME = time.time()
+
+        self.curr_routes = self.solve_event_graph(all_active_requests, deadline)
+
+    def build_event_graph(self, new_requests: Set[Request], next_bus_locations: Dict[Bus, Stop],
+                          bus_user_dict: Dict[Bus, Set[Request]], wait_user_locations: Dict[Request, Stop],
+                          bus_delay: Dict[Bus, float] = None, time_now: TimeImpl = None):
+        """
+        Builds candidate sets for splitRequest actions, then events and graph (stored in self.event_graph).
+        In a dynamic context (time_now given) every bus starts at its current location with its passengers,
+        the graph of the previous call is kept and only updated for new and obsolete splits.
+        :param new_requests: additional requests to be planned
+        :param next_bus_locations: dictionary of next bus stops, according to current plan
+        :param bus_user_dict: dictionary of request allocations in buses
+        :param wait_user_locations: dictionary of request locations still waiting
+        :param bus_delay: dictionary of time until bus is available at next stop (in seconds)
+        :param time_now: current time, None for static context
+        :return: set of all requests active in the graph
+        """
+        # in a dynamic context the graph of the previous call is updated, otherwise built from scratch
+        incremental: bool = time_now is not None and self.event_graph is not None \
+                            and self.event_graph.time_now is not None
+        if not incremental:
+            self.event_graph = EventGraph(self.config)
+        if time_now is not None:
+            self.event_graph.time_now = time_now.get_in_seconds()
+        self.event_graph.fixed_times = {}
         all_active_requests: Set[Request] = set()
         all_active_requests |= new_requests | wait_user_locations.keys()
 
-        all_follow_splits: Set[SplitRequest] = set()
-        for req in all_active_requests:
-            for opt in req.split_requests.keys():
-                all_follow_splits |= set(req.split_requests[opt])
-
         curr_passengers: Set[Request] = set().union(*bus_user_dict.values())
         all_active_requests |= curr_passengers
 
-        for req in curr_passengers:
+        # requests with executed actions (seated or waiting at a transfer) stay on their route option
+        started_requests: Set[Request] = {x for x in all_active_requests if x.route_int is not None and any(
+            y.act_start_time is not None for y in x.split_requests[x.route_int])}
+
+        all_follow_splits: Set[SplitRequest] = set()
+        for req in all_active_requests - started_requests:
+            for opt in req.split_requests.keys():
+                # route options that can not be started anymore are left out
+                if time_now is None or req.split_requests[opt][0].latest_start_time >= time_now:
+                    all_follow_splits |= set(req.split_requests[opt])
+
+        for req in started_requests:
             all_follow_splits |= self.walk_route(req, bus_user_dict, next_bus_locations)
 
         # build candidate sets for lines and directions
@@ -280,77 +383,141 @@ class EventBasedMILP(Planner):
 
         sort_lines = sorted(line_dir_dict.keys(), key=lambda l: l.id)
 
+        added_events = 0
+        removed_events = 0
+        committed_ids: Set[int] = {x.id for x in all_active_requests if x.route_int is not None}
+        if incremental:
+            # connectivity is checked on the graph before propagation, as for a new graph
+            self.event_graph.restore_pruned_edges()
         for line in sort_lines:
             permutations: Set[Event] = set()
-            idle_event = IdleEvent(line)
-            permutations.add(idle_event)
+            new_splits: Set[SplitRequest] | None = None  # None builds all events of the line
+
+            if incremental:
+                # remove events of finished, rejected or passed splits, pick-ups of boarded splits and old bus starts
+                line_splits = line_dir_dict[line][0] | line_dir_dict[line][1]
+                old_splits = {x for x in self.event_graph.request_dict if x.line == line}
+                removed_ids = {x.split_id for x in old_splits - line_splits}
+                new_splits = line_splits - old_splits
+                obsolete: Set[Event] = {x for x in self.event_graph.edge_dict if get_event_line(x) == line and (
+                    isinstance(x, StartEvent) or len(x.remaining_split_id & removed_ids) > 0
+                    or (x.first is not None and (x.first.split_id in removed_ids or (
+                        isinstance(x, PickUpEvent) and (x.first, True) in self.event_graph.fixed_times))))}
+                self.event_graph.remove_events(obsolete)
+                removed_events += len(obsolete)
+                idle_event = self.event_graph.idle_events[line]
+            else:
+                idle_event = IdleEvent(line)
+                permutations.add(idle_event)
+
+            if time_now is not None:
+                for bus in self.bus_list:
+                    if bus.line == line:
+                        onboard = {x for x in all_follow_splits if x.line == line and x.parent in bus_user_dict[bus]
+                                   and (x, True) in self.event_graph.fixed_times}
+                        avail_time = max(time_now.add_seconds(bus_delay[bus]), line.start_time)
+                        permutations.add(StartEvent(bus, next_bus_locations[bus], avail_time, onboard))
 
             for direction in range(2):
                 # direction 0 is normal, 1 is reverse
-                # local_cand_map generate pick_up candidates and drop off candidates
-                users_here = line_dir_dict[line][direction]
-                local_cand_dict: Dict[SplitRequest, Tuple[Set[SplitRequest], Set[SplitRequest]]] = \
-                    sweep_line_local(users_here, line, direction)
-
-                time_cand_dict: Dict[SplitRequest, Tuple[Set[SplitRequest], Set[SplitRequest]]] = sweep_line_time(
-                    line_dir_dict[line][direction])
-
-                agg_cand_dict: Dict[SplitRequest, Tuple[Set[SplitRequest], Set[SplitRequest]]] = {}
-                for split_req in local_cand_dict.keys():
-                    agg_cand_dict[split_req] = (local_cand_dict[split_req][0] & time_cand_dict[split_req][0],
-                                                local_cand_dict[split_req][1] & time_cand_dict[split_req][1])
-
-                for event_user in agg_cand_dict.keys():
-                    permutations |= {
-                        PickUpEvent(event_user, set(), event_user.earl_start_time, event_user.latest_start_time)}
-
-                    hold = self.get_combinations(event_user, list(agg_cand_dict[event_user][0]), set(), 0, True)
-                    permutations |= hold
-
-                    permutations |= {
-                        DropOffEvent(event_user, set(), event_user.earl_arr_time, event_user.latest_arr_time)}
-                    hold = self.get_combinations(event_user, list(agg_cand_dict[event_user][1]), set(), 0, False)
-                    permutations |= hold
+                if new_splits is None or len(new_splits & line_dir_dict[line][direction]) > 0:
+                    permutations |= self.get_line_events(line_dir_dict[line][direction], line, direction, new_splits)
 
             self.event_graph.add_events(permutations)
+            added_events += len(permutations)
+            if incremental:
+                # kept events can lose all paths, e.g. if they need passengers on board that boarded another bus
+                unconnected = self.remove_unconnected(idle_event, committed_ids)
+                removed_events += len(unconnected)
             # check if event graph is fully connected, else throws error
             self.event_graph.check_connectivity(idle_event)
 
-        Global.COMPUTATION_TIME_BUILDING = round(time.time() - Global.COMPUTATION_START_TIME, 4)
-        print(f"Created EventGraph after {Global.COMPUTATION_TIME_BUILDING} seconds")
-        print(self.event_graph.data_in_string())
-        Global.EVENT_GRAPH_NODES = len(self.event_graph.edge_dict.keys())
-        Global.EVENT_GRAPH_EDGES = self.event_graph.get_number_of_edges()
-        Global.NUMBER_OF_SPLITS = len(self.event_graph.request_dict.keys())
-        Global.COMPUTATION_START_TIME = time.time()
+        if incremental:
+            print(f"Updated EventGraph: {added_events} events added, {removed_events} events removed")
+        Instrumentation.count("events_added", added_events)
+        Instrumentation.count("events_removed", removed_events)
 
-        # build lin. model
-        cplex_model: CplexSolver = CplexSolver(self.event_graph, all_active_requests, self.bus_list)
+        # tighten event windows along the graph, removes edges that can not be used
+        self.event_graph.propagate_time_windows()
 
-        Global.COMPUTATION_TIME_BUILDING_CPLEX = round(time.time() - Global.COMPUTATION_START_TIME, 4)
-        print(f"Build the Cplex-Model after {Global.COMPUTATION_TIME_BUILDING_CPLEX} seconds")
-        Global.COMPUTATION_START_TIME = time.time()
+        return all_active_requests
+
+    def remove_unconnected(self, idle_event: IdleEvent, committed_ids: Set[int]):
+        """
+        Removes events of the line without a path from a start of a bus or to the depot (dynamic context).
+        Start events are kept (connectivity check fails). Removed events with splits of accepted or started requests
+        are printed, as they were possible in the previous plan.
+        :param idle_event: IdleEvent of the line
+        :param committed_ids: ids of accepted (and started) requests
+        :return: set of removed events
+        """
+        unconnected = {x for x in self.event_graph.find_unconnected(idle_event) if not isinstance(x, StartEvent)}
+        for event in sorted(unconnected, key=lambda x: x.id):
+            request_ids = event.remaining_id | {event.first.id}
+            if len(request_ids & committed_ids) > 0:
+                print(f"Removed unconnected event {event!r} of accepted requests {sorted(request_ids & committed_ids)}")
+        self.event_graph.remove_events(unconnected)
+        return unconnected
+
+    def solve_event_graph(self, all_active_requests: Set[Request], deadline: float = None):
+        """
+        Builds the Cplex model over the event graph, solves it and converts the solution to routes.
+        :param all_active_requests: set of all requests active in the graph
+        :param deadline: wall-clock time (as time.time()) a plan has to be returned, None for no deadline
+        :return: list of bus routes
+        """
+        # build lin. model, in a dynamic context the model of the previous call is updated with the event graph
+        with Instrumentation.span("model_build"):
+            if self.cplex_model is not None and self.cplex_model.event_graph is self.event_graph:
+                self.cplex_model.update_model(self.event_graph, all_active_requests)
+            else:
+                self.cplex_model = CplexSolver(self.event_graph, all_active_requests, self.bus_list)
+        cplex_model: CplexSolver = self.cplex_model
+
+        self.metrics.COMPUTATION_TIME_BUILDING_CPLEX = round(time.time() - self.metrics.COMPUTATION_START_TIME, 4)
+        print(f"Build the Cplex-Model after {self.metrics.COMPUTATION_TIME_BUILDING_CPLEX} seconds")
+        self.metrics.COMPUTATION_START_TIME = time.time()
 
         # solve model
-        cplex_model.solve_model()
+        with Instrumentation.span("solve"):
+            cplex_model.solve_model(deadline)
         # convert to route solution
-        self.curr_routes = cplex_model.convert_to_plan()
-
+        return self.convert_solution(cplex_model)
 
-def get_event_window(event_user: SplitRequest, other_users: Set[SplitRequest], event_type: bool) -> (
-        TimeImpl, TimeImpl):
+    def convert_solution(self, cplex_model: CplexSolver):
+        """
+        Converts the solution of the model to routes, uses the fallback heuristic if the solver found no solution
+        (e.g. within the replanning deadline). Stores the plan for the fallback of the next call.
+        :param cplex_model: solved CplexSolver
+        :return: list of bus routes
+        """
+        if not cplex_model.has_solution():
+            print("No solution found by solver, using fallback heuristic")
+            self.metrics.FALLBACK_PLANS += 1
+            cplex_model.fallback_values = build_fallback_solution(cplex_model, self.bus_paths, self.path_times)
+        routes = cplex_model.convert_to_plan()
+        self.bus_paths = cplex_model.bus_paths
+        self.path_times = cplex_model.get_path_times()
+        return routes
+
+
+def get_event_window(event_user: SplitRequest, other_users: Set[SplitRequest], event_type: bool,
+                     config: RunConfig) -> (TimeImpl, TimeImpl):
     """
     Checks if combination of event_user and candidates is possible based on time constraints.
     Then returns time window of this event.
     :param event_user: SplitRequest
     :param other_users: set of candidates for action
     :param event_type: type of action pick-up/drop-off
+    :param config: configuration of the run (travel and transfer times)
     :return: Time Window for the ensuing event, empty if impossible
     """
     curr_time: TimeImpl
     curr_stop: Stop
     earl_time: TimeImpl
     latest_time: TimeImpl
+    transfer_seconds = config.TRANSFER_SECONDS
+    km_per_unit, average_kmh = config.KM_PER_UNIT, config.AVERAGE_KMH
 
     all_users = other_users | {event_user}
     stops: Set[Stop] = {x.drop_off_location for x in all_users}
@@ -383,7 +550,7 @@ def get_event_window(event_user: SplitRequest, other_users: Set[SplitRequest], e
     for key in key_list_pick:
         if key in cand_dict:
             pick_up_users: Set[SplitRequest] = cand_dict[key]
-            duration: int = Timer.calc_time(curr_stop.calc_distance(key))
+            duration: int = Timer.calc_time(curr_stop.calc_distance(key, km_per_unit), average_kmh)
             curr_time = curr_time.add_seconds(duration)
             for user in pick_up_users:
                 if curr_time < user.earl_start_time:
@@ -392,19 +559,19 @@ def get_event_window(event_user: SplitRequest, other_users: Set[SplitRequest], e
                 if curr_time > user.latest_start_time:
                     return None, None
             curr_stop = key
-            curr_time = curr_time.add_seconds(Global.TRANSFER_SECONDS)
+            curr_time = curr_time.add_seconds(transfer_seconds)
 
     if event_type:
         rem_travel_time: int = 0
-        earl_time = curr_time.sub_seconds(Global.TRANSFER_SECONDS)
+        earl_time = curr_time.sub_seconds(transfer_seconds)
 
         for user in cand_dict[event_user.pick_up_location]:
             poss_time = user.latest_start_time
             if latest_time > poss_time:
                 latest_time = poss_time
     else:
-        duration = Timer.calc_time(curr_stop.calc_distance(event_user.drop_off_location))
-        rem_travel_time = -duration - Global.TRANSFER_SECONDS
+        duration = Timer.calc_time(curr_stop.calc_distance(event_user.drop_off_location, km_per_unit), average_kmh)
+        rem_travel_time = -duration - transfer_seconds
         earl_time = curr_time.add_seconds(duration)
 
     # need to check for all remaining if latest_arr time is satisfied,
@@ -413,20 +580,20 @@ def get_event_window(event_user: SplitRequest, other_users: Set[SplitRequest], e
     for key in key_list_drop:
         if key in cand_dict:
             drop_off_users: Set[SplitRequest] = cand_dict[key]
-            duration: int = Timer.calc_time(curr_stop.calc_distance(key))
+            duration: int = Timer.calc_time(curr_stop.calc_distance(key, km_per_unit), average_kmh)
 
             rem_travel_time += duration
             curr_time = curr_time.add_seconds(duration)
             for user in drop_off_users:
-                poss_time = user.latest_arr_time.sub_seconds(rem_travel_time + Global.TRANSFER_SECONDS)
+                poss_time = user.latest_arr_time.sub_seconds(rem_travel_time + transfer_seconds)
                 if poss_time < latest_time:
                     latest_time = poss_time
 
                 if curr_time > user.latest_arr_time:
                     return None, None
             curr_stop = key
-            curr_time = curr_time.add_seconds(Global.TRANSFER_SECONDS)
-            rem_travel_time += Global.TRANSFER_SECONDS
+            curr_time = curr_time.add_seconds(transfer_seconds)
+            rem_travel_time += transfer_seconds
 
     if earl_time > latest_time:
         return None, None
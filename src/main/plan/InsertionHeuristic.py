@@ -0,0 +1,191 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: InsertionHeuristic.py
+Description: Fast fallback if the solver finds no solution within the replanning budget.
+            Every bus continues its previous plan, new requests are inserted at the end of bus plans.
+"""
+from typing import Dict, List, Set, Tuple
+from main.plan.CplexModel import CplexSolver
+from models.Demand import Request
+from utils.EventGraph import EventGraph, Event, IdleEvent, StartEvent, PickUpEvent, DropOffEvent
+from models.Network import Bus, Stop
+
+
+def get_var_name(event: Event):
+    """
+    :param event: PickUpEvent or DropOffEvent
+    :return: name of B_e variable of the action of the event
+    """
+    return f"B_{event.first.split_id}{'+' if isinstance(event, PickUpEvent) else '-'}"
+
+
+def get_offset(event: Event):
+    """
+    :param event: PickUpEvent or DropOffEvent
+    :return: offset of B_e variable, B_e + offset is the departure time (in seconds)
+    """
+    if isinstance(event, PickUpEvent):
+        return event.first.earl_start_time.get_in_seconds()
+    return event.first.earl_arr_time.get_in_seconds()
+
+
+def get_depart(graph: EventGraph, prev_event: Event, prev_depart: int, location: Stop):
+    """
+    Earliest departure after an action at location, when coming from the previous event of the bus.
+    :param graph: EventGraph (travel and transfer times of the run)
+    :param prev_event: previous event of bus
+    :param prev_depart: departure time at previous event (in seconds)
+    :param location: stop of the action
+    :return: earliest departure time (in seconds)
+    """
+    duration = graph.travel(prev_event.location, location)
+    if isinstance(prev_event, (IdleEvent, StartEvent)):
+        return prev_depart + duration + graph.transfer_seconds
+    return prev_depart + duration + graph.transfer_seconds * int(bool(duration))
+
+
+def find_direct_event(events: Set[Event]):
+    """
+    :param events: pick-up or drop-off events of a split request
+    :return: event with no one else in the vehicle, None if not in graph
+    """
+    return next(iter(x for x in events if len(x.remaining_split_id) == 0), None)
+
+
+def drop_off_onboard(solver: CplexSolver, bus: Bus, paths: Dict[Bus, List[Event]],
+                     tails: Dict[Bus, Tuple[Event, int]], values: Dict[str, float]):
+    """
+    Continues the path of the bus from its last event with drop-offs only, until no one is in the vehicle.
+    The earliest drop-off within its time window is chosen, if there is none the earliest drop-off.
+    :param solver: CplexSolver (with event graph and requests)
+    :param bus: Bus with passengers on board at the end of its path
+    :param paths: events of every bus, path of bus is extended
+    :param tails: last event and departure time (in seconds) of every bus, updated for bus
+    :param values: variable values, departure times of the drop-offs are added
+    """
+    graph = solver.event_graph
+    tail, tail_depart = tails[bus]
+    while len(tail.set_after_event()) > 0:
+        options: List[Tuple[bool, int, int, Event]] = []
+        for event in graph.edge_dict[tail][1]:
+            if not isinstance(event, DropOffEvent):
+                continue
+            drop_low, drop_up = solver.get_time_bounds(event.first, False)
+            depart = max(drop_low + graph.transfer_seconds, get_depart(graph, tail, tail_depart, event.location))
+            options.append((depart > drop_up + graph.transfer_seconds, depart, event.id, event))
+        if len(options) == 0:
+            print(f"Fallback could not drop off the passengers on board of bus {bus.id}")
+            break
+        _, tail_depart, _, tail = min(options)
+        paths[bus].append(tail)
+        values[get_var_name(tail)] = tail_depart - get_offset(tail)
+    tails[bus] = (tail, tail_depart)
+
+
+def build_fallback_solution(solver: CplexSolver, previous_paths: Dict[Bus, List[Event]],
+                            previous_times: Dict[str, float]):
+    """
+    Builds a solution of the model without solving it.
+    First every bus continues the events of its previous plan still in the event graph (at the previous times),
+    passengers still on board where the previous plan breaks off are dropped off (see drop_off_onboard), then requests not yet accepted are inserted greedily (by earliest pick-up) with a direct route option
+    at the end of a bus plan, if the bus is empty there.
+    :param solver: CplexSolver (with event graph and requests)
+    :param previous_paths: events visited by every bus in the previous plan
+    :param previous_times: B_e variable values of the previous plan
+    :return: dictionary of variable values
+    """
+    graph = solver.event_graph
+    transfer_seconds = graph.transfer_seconds
+    values: Dict[str, float] = {}
+    served: Dict[Request, int] = {}
+    # last event and departure time (in seconds) of every bus
+    tails: Dict[Bus, Tuple[Event, int]] = {}
+    paths: Dict[Bus, List[Event]] = {}
+
+    for bus in solver.buses:
+        start_event: Event = graph.start_events.get(bus, graph.idle_events[bus.line])
+        if isinstance(start_event, StartEvent):
+            depart = start_event.earl_depart.get_in_seconds()
+        else:
+            depart = bus.line.start_time.get_in_seconds()
+            if graph.time_now is not None:
+                depart = max(depart, graph.time_now)
+        paths[bus] = [start_event]
+        tails[bus] = (start_event, depart)
+
+        for event in previous_paths.get(bus, []):
+            if isinstance(event, (IdleEvent, StartEvent)) or event not in graph.edge_dict:
+                continue
+            if event not in graph.edge_dict[tails[bus][0]][1] or get_var_name(event) not in previous_times:
+                break
+            paths[bus].append(event)
+            depart = round(previous_times[get_var_name(event)]) + get_offset(event)
+            tails[bus] = (event, depart)
+            values[get_var_name(event)] = previous_times[get_var_name(event)]
+            if event.first.parent.route_int is not None:
+                served[event.first.parent] = event.first.parent.route_int
+
+        if len(tails[bus][0].set_after_event()) > 0:
+            # previous plan breaks off with passengers on board, they are dropped off first
+            drop_off_onboard(solver, bus, paths, tails, values)
+
+    new_requests = sorted((x for x in solver.requests if x not in solver.accepted_requests),
+                          key=lambda x: (x.earl_start_time, x.id))
+    for req in new_requests:
+        for option in solver.usable_options[req]:
+            if len(req.split_requests[option]) != 1 or req in served:
+                continue
+            split_req = req.split_requests[option][0]
+            pick_event = find_direct_event(graph.request_dict[split_req][0])
+            drop_event = find_direct_event(graph.request_dict[split_req][1])
+            if pick_event is None or drop_event is None or drop_event not in graph.edge_dict[pick_event][1]:
+                continue
+            pick_low, pick_up = solver.get_time_bounds(split_req, True)
+            drop_low, drop_up = solver.get_time_bounds(split_req, False)
+            max_ride_time = (req.latest_arr_time - req.latest_start_time).get_in_seconds()
+
+            for bus in sorted((x for x in solver.buses if x.line == split_req.line), key=lambda x: tails[x][1]):
+                tail, tail_depart = tails[bus]
+                idle_event = graph.idle_events[bus.line]
+                if pick_event not in graph.edge_dict[tail][1] or idle_event not in graph.edge_dict[drop_event][1]:
+                    continue
+                pick_depart = max(pick_low + transfer_seconds,
+                                  get_depart(graph, tail, tail_depart, pick_event.location))
+                drop_depart = max(drop_low + transfer_seconds,
+                                  get_depart(graph, pick_event, pick_depart, drop_event.location))
+                return_time = drop_depart + graph.travel(drop_event.location, idle_event.location)
+                if (pick_depart <= pick_up + transfer_seconds and drop_depart <= drop_up + transfer_seconds
+                        and drop_depart - pick_depart <= max_ride_time
+                        and return_time <= bus.line.end_time.get_in_seconds()):
+                    paths[bus] += [pick_event, drop_event]
+                    tails[bus] = (drop_event, drop_depart)
+                    values[get_var_name(pick_event)] = pick_depart - get_offset(pick_event)
+                    values[get_var_name(drop_event)] = drop_depart - get_offset(drop_event)
+                    served[req] = option
+                    break
+
+    for bus, path in paths.items():
+        if len(path[-1].set_after_event()) > 0:
+            # passengers can not be dropped off, the path is not closed at the depot
+            continue
+        if len(path) == 1 and isinstance(path[0], IdleEvent):
+            continue
+        path = path + [graph.idle_events[bus.line]]
+        for first, second in zip(path[:-1], path[1:]):
+            values[f"x_{first.id},{second.id}"] = 1
+
+    for req, option in served.items():
+        values[f"q_{req.id}"] = 1
+        values[f"z_{req.id},{option}"] = 1
+    for req in solver.accepted_requests - served.keys():
+        print(f"Fallback could not keep request {req.id} in the plan")
+
+    return values
@@ -16,14 +16,20 @@ from models.Demand import Request
 from models.Plan import Route
 from utils.LineGraph import LineGraph
 from models.Network import Bus, Stop
+from utils import Global
+from utils.Timer import TimeImpl
 
 
 class Planner:
     """
     Interface for a solving strategy of liDARPT instances. Needs to implement make_plan.
+    The planner belongs to the run it is created in (configuration and metrics, see Global.Run).
     """
 
     def __init__(self, bus_list: List[Bus], network_graph: LineGraph):
+        self.run: Global.Run = Global.current_run()
+        self.config: Global.RunConfig = self.run.config
+        self.metrics: Global.RunMetrics = self.run.metrics
         self.bus_list: List[Bus] = bus_list
         self.network_graph: LineGraph = network_graph
         self.requests: Set[Route] = set()
@@ -31,5 +37,5 @@ class Planner:
 
     def make_plan(self, new_requests: Set[Request], curr_bus_locations: Dict[Bus, Stop],
                   user_bus_dict: Dict[Bus, Set[Request]], user_locations: Dict[Request, Stop],
-                  bus_delay: Dict[Bus, float]):
+                  bus_delay: Dict[Bus, float], time_now: TimeImpl = None, deadline: float = None):
         pass
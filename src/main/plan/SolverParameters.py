@@ -0,0 +1,86 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: SolverParameters.py
+Description: Resolves solver parameter profiles from the configuration file
+            and maps them onto the parameters of the CPLEX backend.
+"""
+from typing import Dict, Any
+
+# parameters used if nothing else is configured (previous hard-coded values)
+DEFAULT_PARAMETERS: Dict[str, Any] = {
+    "multiObjective": False,
+    "timelimit": 900,
+    "firstStageTimelimit": 600,
+    "threads": 31,
+    "workmem": 27000,
+    "mip.tolerances.mipgap": 0.0,
+    "mip.strategy.nodeselect": 2,
+    "mip.strategy.variableselect": 0,
+    "mip.strategy.lbheur": 0,
+    "mip.strategy.heuristicfreq": 0,
+    "mip.strategy.rinsheur": 0,
+    "preprocessing.presolve": 1,
+    "preprocessing.numpass": -1,
+    "mip.cuts.gomory": 2,
+    "mip.display": 3,
+    "decompositionIterations": 50,
+    "decompositionTimelimit": 300,
+    "subproblemTimelimit": 30
+}
+
+# keys handled by the solver itself, not passed on to the backend
+STAGE_KEYS = {"multiObjective", "firstStageTimelimit", "decompositionIterations", "decompositionTimelimit",
+              "subproblemTimelimit"}
+
+
+def resolve_parameters(solver_config: dict | None, network_name: str, number_requests: int):
+    """
+    Merges the parameter profiles of the 'solverParameters' config section.
+    Order of precedence (lowest first): defaults, 'default' profile, network profile, size profile.
+    :param solver_config: 'solverParameters' section of config file (can be None)
+    :param network_name: name of network file without ending, e.g. sw-schlee_full
+    :param number_requests: number of requests of the instance
+    :return: dictionary of parameter name to value
+    """
+    parameters: Dict[str, Any] = DEFAULT_PARAMETERS.copy()
+    if solver_config is None:
+        return parameters
+
+    parameters |= solver_config.get("default", {})
+    parameters |= solver_config.get("networks", {}).get(network_name, {})
+
+    # size profiles are sorted by upper bound on number of requests, first fitting is chosen
+    size_profiles = sorted(solver_config.get("sizes", []), key=lambda x: x["maxRequests"])
+    for profile in size_profiles:
+        if number_requests <= profile["maxRequests"]:
+            parameters |= profile.get("parameters", {})
+            break
+
+    return parameters
+
+
+def apply_parameters(model, parameters: Dict[str, Any]):
+    """
+    Sets all backend parameters on the cplex model, keys are the dotted parameter paths
+    of the python API, e.g. 'mip.strategy.nodeselect' -> model.parameters.mip.strategy.nodeselect
+    :param model: python cplex class
+    :param parameters: dictionary of parameter name to value
+    """
+    for key, value in parameters.items():
+        if key in STAGE_KEYS:
+            continue
+        param = model.parameters
+        for attr in key.split("."):
+            try:
+                param = getattr(param, attr)
+            except AttributeError:
+                raise ValueError(f"the solver parameter {key} is not known to the backend")
+        param.set(value)
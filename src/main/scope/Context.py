@@ -12,53 +12,105 @@ File: Context.py
 Description: Handles control flow of execution,
             Can simulate different contexts(dynamic, static, etc.) based on implementation
 """
-from typing import Set, Dict
+import heapq
+import time
+from collections import deque
+from typing import Set, Dict, List, NamedTuple, Tuple, Iterator, Deque
+from utils import Global, Timer, Instrumentation
 from main.plan.Planner import Planner
 from main.scope.Executor import Executor
+from main.scope.Snapshot import ExecutorSnapshot
 from models.Demand import Request
 from utils.Timer import TimeImpl
-from models.Network import Bus, Stop
+from models.Network import Stop
+
+
+class Batch(NamedTuple):
+    """
+    Requests planned together, ordered by their deadline (time of replanning) in the time table.
+    """
+    deadline: int  # seconds
+    order: int  # order of creation, for equal deadline
+    time: TimeImpl
+    requests: Set[Request]
 
 
 class Context:
     """
-    Abstract class to handle control flow, holds timetable for dynamic incoming requests.
+    Abstract class to handle control flow, holds timetable (priority queue of batches) for dynamic incoming requests.
     Reference to Planner(to solve instance based on current info),
     and Executor (to validate current plan and report current situation)
     """
+    dynamic: bool = False  # plans start from current state of network, not from the depots
+
     def __init__(self, requests: Set[Request], executor: Executor, planner: Planner):
-        self.time_table: Dict[TimeImpl, Set[Request]] = self.create_time_table(requests)
+        self.run: Global.Run = Global.current_run()
+        self.config: Global.RunConfig = self.run.config
+        self.metrics: Global.RunMetrics = self.run.metrics
+        self.time_table: List[Batch] = []
+        self.batch_counter: int = 0
+        for trigger_time, batch_requests in self.create_time_table(requests):
+            self.push_batch(trigger_time, batch_requests)
         self.executor: Executor = executor
         self.planner: Planner = planner
+        self.metrics.REPLANNING_LATENCIES = []
+        self.metrics.FALLBACK_PLANS = 0
+        self.metrics.ADMISSION_RECORDS = []
 
-    def create_time_table(self, requests: Set[Request]):
+    def create_time_table(self, requests: Set[Request]) -> List[Tuple[TimeImpl, Set[Request]]]:
         NotImplementedError("instantiated abstract context class")
 
-    def start_context(self):
+    def push_batch(self, trigger_time: TimeImpl, requests: Set[Request]):
         """
-        traverses time table and triggers update, no real-time time limit imposed on solve
+        Adds a batch of requests to the time table, planned at trigger_time.
         """
-        key_list = list(self.time_table.keys())
-        for t in range(len(key_list) - 1):
-            self.trigger_event(key_list[t], key_list[t + 1])
+        self.batch_counter += 1
+        heapq.heappush(self.time_table, Batch(trigger_time.get_in_seconds(), self.batch_counter, trigger_time, requests))
 
-        self.trigger_event(key_list[len(key_list) - 1])
+    def pop_batch(self):
+        """
+        :return: batch with earliest deadline and the time of the next batch (None if last)
+        """
+        batch = heapq.heappop(self.time_table)
+        return batch, (self.time_table[0].time if len(self.time_table) > 0 else None)
 
+    @Global.in_run
+    def start_context(self):
+        """
+        traverses time table and triggers update,
+        every solve is limited by the replanning budget (if configured)
+        """
+        while len(self.time_table) > 0:
+            batch, time_next = self.pop_batch()
+            self.trigger_event(batch.time, batch.requests, time_next)
 
-    def trigger_event(self, time_now: TimeImpl, time_next=None):
+    def trigger_event(self, time_now: TimeImpl, new_requests: Set[Request], time_next=None):
         """
         Gets new incoming requests and situation in the network and starts solve,
         then executes the plan up to next interrupt.
+        Requests that are not yet assigned are planned together with the accepted and not finished requests.
         :param time_now: current time
+        :param new_requests: requests of the batch
         :param time_next: time of next interrupt
         """
-        curr_requests: Set[Request] = self.time_table[time_now]
-        curr_bus_locations: Dict[Bus, Stop] = self.executor.bus_locations.copy()
-        curr_user_locations: Dict[Request, Stop] = self.executor.user_locations.copy()
-        curr_bus_delay: Dict[Bus, int] = self.executor.bus_delay.copy()
-        bus_user_dict: Dict[Bus, Set[Request]] = self.executor.passengers.copy()
+        curr_requests: Set[Request] = {x for x in new_requests if x.route_int is None}
+        # read-only state of the last execution, no copies needed
+        snapshot: ExecutorSnapshot = self.executor.snapshot
+        curr_user_locations: Dict[Request, Stop] = {x: y for x, y in snapshot.user_locations.items()
+                                                    if x.route_int is not None}
 
-        self.planner.make_plan(curr_requests, curr_bus_locations, bus_user_dict, curr_user_locations, curr_bus_delay)
+        start_time = time.time()
+        # the solver stops at the replanning budget or the time limit of the instance, whichever is first
+        deadline = self.config.INSTANCE_DEADLINE
+        if self.config.REPLANNING_BUDGET_SECONDS is not None:
+            budget_deadline = start_time + self.config.REPLANNING_BUDGET_SECONDS
+            deadline = budget_deadline if deadline is None else min(deadline, budget_deadline)
+        with Instrumentation.span("replanning"):
+            self.planner.make_plan(curr_requests, snapshot.bus_locations, snapshot.passengers, curr_user_locations,
+                                   snapshot.bus_delay,
+                                   time_now if self.dynamic else None, deadline)
+        self.metrics.REPLANNING_LATENCIES.append(round(time.time() - start_time, 4))
+        print(f"Replanned at {time_now} in {self.metrics.REPLANNING_LATENCIES[-1]} seconds")
 
         self.executor.execute_plan(self.planner.curr_routes, curr_requests, time_next)
 
@@ -71,4 +123,214 @@ class Static(Context):
         super().__init__(requests, executor, planner)
 
     def create_time_table(self, requests: Set[Request]):
-        return {TimeImpl(0, 0): requests}
+        return [(TimeImpl(0, 0), requests)]
+
+
+class RollingHorizon(Context):
+    """
+    Partitions the requests by earliest start time into overlapping windows, solved one after the other.
+    The plan is executed up to the start of the next window, the executed part stays fixed (with bus positions
+    and passengers on board), requests accepted before stay accepted. Requests rejected in the overlap are tried again.
+    """
+    dynamic = True
+
+    def __init__(self, requests: Set[Request], executor: Executor, planner: Planner):
+        self.window_seconds: int = planner.config.HORIZON_WINDOW_SECONDS
+        self.step_seconds: int = planner.config.HORIZON_WINDOW_SECONDS - planner.config.HORIZON_OVERLAP_SECONDS
+        if self.step_seconds <= 0:
+            raise ValueError("the overlap of the planning horizon has to be smaller than its window")
+        super().__init__(requests, executor, planner)
+
+    def create_time_table(self, requests: Set[Request]):
+        """
+        Creates one entry per window, keyed by start of window, with all requests starting in the window.
+        Without requests there is no window.
+        """
+        if len(requests) == 0:
+            return []
+        first = min(x.earl_start_time.get_in_seconds() for x in requests)
+        last = max(x.earl_start_time.get_in_seconds() for x in requests)
+        time_table: Dict[TimeImpl, Set[Request]] = {}
+        window_start = first
+        while window_start <= last:
+            time_table[Timer.create_time_object(window_start)] = {
+                x for x in requests if window_start <= x.earl_start_time.get_in_seconds() < window_start + self.window_seconds}
+            window_start += self.step_seconds
+        return list(time_table.items())
+
+
+class StreamingHorizon(RollingHorizon):
+    """
+    Rolling horizon over a stream of requests in order of earliest start time (see IOHandler.stream_requests).
+    Requests are only taken from the stream when their window is reached, so route options and splits
+    of later requests are not computed (and held in memory) before. Same windows as RollingHorizon.
+    """
+
+    def __init__(self, request_stream: Iterator[Request], requests: Set[Request], executor: Executor,
+                 planner: Planner):
+        """
+        :param request_stream: requests sorted by earliest start time
+        :param requests: set filled with all requests taken from the stream (e.g. for output)
+        """
+        self.request_stream: Iterator[Request] = request_stream
+        self.requests: Set[Request] = requests
+        # requests taken from the stream, not yet behind the current window
+        self.buffer: Deque[Request] = deque()
+        super().__init__(requests, executor, planner)
+
+    def create_time_table(self, requests: Set[Request]):
+        return []
+
+    def fill_buffer(self, until_seconds: int):
+        """
+        Takes requests from the stream until one starts at or after until_seconds (kept in buffer).
+        :return: False if the stream is exhausted
+        """
+        while len(self.buffer) == 0 or self.buffer[-1].earl_start_time.get_in_seconds() < until_seconds:
+            request = next(self.request_stream, None)
+            if request is None:
+                return False
+            self.requests.add(request)
+            self.buffer.append(request)
+        return True
+
+    @Global.in_run
+    def start_context(self):
+        """
+        Triggers one update per window, requests of a window are taken from the stream before.
+        """
+        if not self.fill_buffer(0):
+            return
+        window_start = self.buffer[0].earl_start_time.get_in_seconds()
+        while True:
+            has_more = self.fill_buffer(window_start + self.window_seconds)
+            window_requests = {x for x in self.buffer
+                               if x.earl_start_time.get_in_seconds() < window_start + self.window_seconds}
+            next_start = window_start + self.step_seconds
+            # requests of the next windows are in the buffer or the stream
+            last_window = not has_more and all(x.earl_start_time.get_in_seconds() < next_start for x in self.buffer)
+            self.trigger_event(Timer.create_time_object(window_start), window_requests,
+                               None if last_window else Timer.create_time_object(next_start))
+            if last_window:
+                return
+            while len(self.buffer) > 0 and self.buffer[0].earl_start_time.get_in_seconds() < next_start:
+                self.buffer.popleft()
+            window_start = next_start
+
+
+class Dynamic(Context):
+    """
+    Dynamic implementation, replans whenever requests are registered.
+    Requests registered within the batch window (after the first request of the batch) are collected and planned
+    together, a batch is closed early when it reaches the maximum batch size.
+    The plan is executed up to the next batch, executed stops and passengers on board stay fixed.
+    """
+    dynamic = True
+
+    def __init__(self, requests: Set[Request], executor: Executor, planner: Planner):
+        self.batch_window_seconds: int = planner.config.BATCH_WINDOW_SECONDS
+        self.batch_max_size: int | None = planner.config.BATCH_MAX_SIZE
+        if self.batch_window_seconds < 0 or (self.batch_max_size is not None and self.batch_max_size <= 0):
+            raise ValueError("the batch window can not be negative and the maximum batch size has to be positive")
+        super().__init__(requests, executor, planner)
+
+    def create_time_table(self, requests: Set[Request]):
+        """
+        Creates one entry per batch, keyed by deadline of the batch (end of window or time it got full).
+        Without window, there is one batch per register time.
+        """
+        time_table: List[Tuple[TimeImpl, Set[Request]]] = []
+        batch: Set[Request] = set()
+        batch_end = 0
+        for request in sorted(requests, key=lambda x: (x.register_time, x.id)):
+            register_seconds = request.register_time.get_in_seconds()
+            if len(batch) > 0 and register_seconds > batch_end:
+                time_table.append((Timer.create_time_object(batch_end), batch))
+                batch = set()
+            if len(batch) == 0:
+                batch_end = min(register_seconds + self.batch_window_seconds, 86399)
+            batch.add(request)
+            if self.batch_max_size is not None and len(batch) >= self.batch_max_size:
+                time_table.append((request.register_time, batch))
+                batch = set()
+        if len(batch) > 0:
+            time_table.append((Timer.create_time_object(batch_end), batch))
+        return time_table
+
+    def trigger_event(self, time_now: TimeImpl, new_requests: Set[Request], time_next=None):
+        """
+        Replans for the batch and records the admission latency of its requests
+        (waiting for the batch plus replanning) against the batch size.
+        """
+        super().trigger_event(time_now, new_requests, time_next)
+        for request in new_requests:
+            self.metrics.ADMISSION_RECORDS.append((len(new_requests),
+                                             (time_now - request.register_time).get_in_seconds(),
+                                             self.metrics.REPLANNING_LATENCIES[-1]))
+
+
+class ReplayRecord(NamedTuple):
+    """
+    Statistics of one replanning trigger of a replay.
+    """
+    sim_time: TimeImpl
+    new_requests: int
+    processed_requests: int
+    accepted_requests: int
+    latency: float  # seconds of replanning
+    lag: float  # seconds the trigger started behind the simulated clock
+    wall_time: float  # seconds since start of replay
+
+
+class Replay(Dynamic):
+    """
+    Replays the requests by register time on a simulated clock and replans every cadence
+    with all requests registered since the last trigger.
+    With a speedup, the simulated day runs at speedup times wall-clock speed; if replanning is slower,
+    the replay falls behind (lag). Records throughput, acceptance rate and replanning latency per trigger.
+    """
+
+    def __init__(self, requests: Set[Request], executor: Executor, planner: Planner):
+        self.cadence_seconds: int = planner.config.REPLAY_CADENCE_SECONDS
+        self.speedup: float | None = planner.config.REPLAY_SPEEDUP
+        if self.cadence_seconds <= 0:
+            raise ValueError("the replanning cadence of the replay has to be positive")
+        self.replay_log: List[ReplayRecord] = []
+        super().__init__(requests, executor, planner)
+
+    def create_time_table(self, requests: Set[Request]):
+        """
+        Creates one entry per trigger (multiple of cadence) with all requests registered since the previous trigger.
+        """
+        time_table: Dict[TimeImpl, Set[Request]] = {}
+        for request in sorted(requests, key=lambda x: x.register_time):
+            trigger_seconds = -(-request.register_time.get_in_seconds() // self.cadence_seconds) * self.cadence_seconds
+            time_table.setdefault(Timer.create_time_object(min(trigger_seconds, 86399)), set()).add(request)
+        return list(time_table.items())
+
+    @Global.in_run
+    def start_context(self):
+        """
+        traverses time table on the simulated clock (paced by speedup, if given) and records every trigger,
+        without requests nothing is replayed
+        """
+        if len(self.time_table) == 0:
+            return
+        first_seconds = self.time_table[0].deadline
+        start_wall = time.time()
+        processed_requests: List[Request] = []
+        while len(self.time_table) > 0:
+            batch, time_next = self.pop_batch()
+            lag = 0.0
+            if self.speedup is not None:
+                scheduled = start_wall + (batch.deadline - first_seconds) / self.speedup
+                lag = max(0.0, time.time() - scheduled)
+                time.sleep(max(0.0, scheduled - time.time()))
+
+            self.trigger_event(batch.time, batch.requests, time_next)
+
+            processed_requests += batch.requests
+            self.replay_log.append(ReplayRecord(batch.time, len(batch.requests), len(processed_requests),
+                                                sum(1 for x in processed_requests if x.route_int is not None),
+                                                self.metrics.REPLANNING_LATENCIES[-1], round(lag, 4),
+                                                round(time.time() - start_wall, 4)))
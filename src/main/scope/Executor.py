@@ -11,14 +11,25 @@ License: https://creativecommons.org/licenses/by-nc-sa/4.0/
 File: Executor.py
 Description: Traverses through given plan, up to a certain time,
             Stores information on bus and request locations.
-NOTE: also intended for use in a dynamic setting, however still lacks some logic required
 """
-from typing import Set, Dict, List
-from utils import Global, Timer
+import heapq
+from array import array
+from typing import Set, Dict, List, NamedTuple
+from utils import Global, Timer, Instrumentation
 from models.Demand import Request
 from utils.Timer import TimeImpl
-from models.Network import Bus, Stop
+from models.Network import Bus, Stop, Line
 from models.Plan import RouteStop, Route
+from main.scope.Snapshot import ExecutorSnapshot, take_snapshot
+
+
+class WaitRecord(NamedTuple):
+    """
+    Bus waiting at a route stop, ordered by departure (in seconds) in the event queue.
+    """
+    depart: int
+    order: int  # later waiting stops first, for equal departure
+    r_stop: RouteStop
 
 
 class Executor:
@@ -28,48 +39,65 @@ class Executor:
     """
 
     def __init__(self, busses: List[Bus], requests: Set[Request]):
+        self.run: Global.Run = Global.current_run()
+        self.config: Global.RunConfig = self.run.config
+        self.metrics: Global.RunMetrics = self.run.metrics
         self.user_locations: Dict[Request, Stop] = {x: x.pick_up_location for x in requests}  # for waiting users
         self.passengers: Dict[Bus, Set[Request]] = {x: set() for x in busses}
         self.bus_locations: Dict[Bus, Stop] = {x: x.line.depot for x in
                                                busses}  # locations of bus (or next location bus is arriving at)
-        self.bus_delay: Dict[Bus, int] = {x: 0 for x in busses}  # time of bus to arriving at next stop
+        self.bus_delay: Dict[Bus, int] = {x: 0 for x in busses}  # time until bus is available at its location
         self.routes = [Route(x) for x in busses]
         self.requests = requests
+        self.max_occ_bus: Dict[Bus, int] = {x: 0 for x in busses}
+        # occupancy in passengers, time series of every change (time in seconds, change of the occupancy)
+        self.bus_load: Dict[Bus, int] = {x: 0 for x in busses}
+        self.occupancy_times: Dict[Bus, array] = {x: array('l') for x in busses}
+        self.occupancy_deltas: Dict[Bus, array] = {x: array('h') for x in busses}
 
         self.routes.sort(key=lambda x: x.bus.id)
+        # read-only view on the state, published after every execution with the buses and users changed since
+        self.snapshot: ExecutorSnapshot = take_snapshot(None, self.bus_locations, self.bus_delay, self.passengers,
+                                                        self.user_locations)
+        self.changed_buses: Set[Bus] = set()
+        self.changed_users: Set[Request] = set()
+
+    def publish_snapshot(self, time: TimeImpl = None):
+        """
+        Creates the read-only view on the current state, handed to the planner.
+        Only entries of buses and users changed since the last snapshot are copied.
+        :param time: time executed up to
+        :return: ExecutorSnapshot
+        """
+        self.snapshot = take_snapshot(self.snapshot, self.bus_locations, self.bus_delay, self.passengers,
+                                      self.user_locations, self.changed_buses, self.changed_users, time)
+        self.changed_buses = set()
+        self.changed_users = set()
+        return self.snapshot
 
     def check_plan(self, done_r_stops: List[RouteStop], final_time: TimeImpl = None):
         """
         Validates the current plan, for example pick-up and drop-off locations and time windows of requests.
         Updates location of buses and requests. Throws error if invalid.
-        :param done_r_stops: list of all Routestops, sorted by arrival time
+        :param done_r_stops: list of all Routestops, sorted by arrival time (n stops, validated in O(n log n))
         :param final_time: executes plan up to this time
         """
-        waiting_bus_stops: List[RouteStop] = []
-        max_occ_bus: Dict[Bus, int] = {x.bus: 0 for x in self.routes}
-        curr_time: TimeImpl
-        for r_stop in done_r_stops:
-            curr_time = r_stop.arriv_time
-
-            still_waiting = []
-            for wait_stop in waiting_bus_stops:
-                if wait_stop.depart_time <= curr_time:
-                    for u_picked in wait_stop.pick_up:
-                        if u_picked not in self.user_locations.keys():
-                            print_out_route(done_r_stops)
-                            raise ValueError(f"User {u_picked.id} not marked as waiting")
-                        this_stop = self.user_locations.pop(u_picked)
-                        if this_stop is not wait_stop.stop:
-                            raise ValueError("Missmatch between expected pick-up stop and actual")
-                        self.passengers[wait_stop.bus].add(u_picked)
-                        max_occ_bus[wait_stop.bus] = max(len(self.passengers[wait_stop.bus]), max_occ_bus[wait_stop.bus])
-                        if wait_stop.stop is u_picked.pick_up_location:
-                            u_picked.act_start_time = wait_stop.depart_time.sub_seconds(Global.TRANSFER_SECONDS)
-                else:
-                    still_waiting.append(wait_stop)
+        # event queue of waiting buses, pick-ups happen at departure
+        waiting_bus_stops: List[WaitRecord] = []
+        curr_time: int
+        for count, r_stop in enumerate(done_r_stops):
+            curr_time = r_stop.arriv_time.get_in_seconds()
+
+            while len(waiting_bus_stops) > 0 and waiting_bus_stops[0].depart <= curr_time:
+                wait_stop = heapq.heappop(waiting_bus_stops).r_stop
+                for u_picked in wait_stop.pick_up:
+                    if u_picked not in self.user_locations.keys():
+                        print_out_route(done_r_stops)
+                        raise ValueError(f"User {u_picked.id} not marked as waiting")
+                    self.board_user(wait_stop, u_picked)
 
-            waiting_bus_stops = still_waiting
             self.bus_locations[r_stop.bus] = r_stop.stop
+            self.changed_buses.add(r_stop.bus)
 
             for u_dropped in r_stop.drop_off:
                 if u_dropped not in self.passengers[r_stop.bus]:
@@ -78,38 +106,98 @@ class Executor:
                     raise ValueError(f"User {u_dropped.id} not supposed to be in bus")
                 else:
                     self.passengers[r_stop.bus].remove(u_dropped)
+                self.change_load(r_stop.bus, r_stop.arriv_time, -u_dropped.number_of_passengers, r_stop.stop)
+                record_drop_off(r_stop, u_dropped)
                 if r_stop.stop is not u_dropped.drop_off_location:
                     self.user_locations[u_dropped] = r_stop.stop
+                    self.changed_users.add(u_dropped)
                 else:
                     u_dropped.act_end_time = r_stop.arriv_time
 
-            insert_sorted(waiting_bus_stops, r_stop)
+            heapq.heappush(waiting_bus_stops, WaitRecord(r_stop.depart_time.get_in_seconds(), -count, r_stop))
 
+        remaining_stops: List[RouteStop] = [heapq.heappop(waiting_bus_stops).r_stop
+                                            for _ in range(len(waiting_bus_stops))]
         # DYNAMIC CASE: for waiting_bus_events change depart_time and empty pick-up set if not finished
         if final_time is not None:
-            for wait_event in waiting_bus_stops:
-                if wait_event.depart_time <= final_time:
+            for wait_event in remaining_stops:
+                # boarding already started
+                if len(wait_event.pick_up) > 0 and wait_event.depart_time.sub_seconds(self.config.TRANSFER_SECONDS) <= final_time:
                     for u_picked in wait_event.pick_up:
-                        this_stop = self.user_locations.pop(u_picked)
-                        if this_stop is not wait_event.stop:
-                            raise ValueError("Missmatch between expected pick-up stop and actual")
-                        self.passengers[wait_event.bus].add(u_picked)
-                        if u_picked.pick_up_location is wait_event.stop:
-                            u_picked.act_start_time = wait_event.depart_time.sub_seconds(Global.TRANSFER_SECONDS)
+                        self.board_user(wait_event, u_picked)
                 else:
-                    wait_event.depart_time = final_time
+                    # bus is available at stop from now on (or when arriving), pick-ups are replanned
+                    wait_event.depart_time = max(final_time, wait_event.arriv_time)
                     wait_event.pick_up.clear()
         else:
-            for wait_event in waiting_bus_stops:
+            for wait_event in remaining_stops:
                 for u_picked in wait_event.pick_up:
-                    this_stop = self.user_locations.pop(u_picked)
-                    if this_stop is not wait_event.stop:
-                        raise ValueError("Missmatch between expected pick-up stop and actual")
-                    self.passengers[wait_event.bus].add(u_picked)
-                    if u_picked.pick_up_location is wait_event.stop:
-                        u_picked.act_start_time = wait_event.depart_time.sub_seconds(Global.TRANSFER_SECONDS)
-
-        # check accepted users are taken care of (valid start and end times) -> max ride time
+                    self.board_user(wait_event, u_picked)
+
+        self.metrics.MAX_OCCUPANCY = max(self.max_occ_bus.values())
+        self.metrics.AVG_MAX_OCCUPANCY = sum(self.max_occ_bus.values()) / len(self.max_occ_bus.keys())
+
+        if final_time is None:
+            self.check_requests()
+
+    def board_user(self, r_stop: RouteStop, user: Request):
+        """
+        User enters the bus at the route stop (when boarding starts). Throws error if not waiting there.
+        :param r_stop: route stop of pick-up
+        :param user: Request
+        """
+        this_stop = self.user_locations.pop(user)
+        if this_stop is not r_stop.stop:
+            raise ValueError("Missmatch between expected pick-up stop and actual")
+        self.passengers[r_stop.bus].add(user)
+        self.changed_buses.add(r_stop.bus)
+        self.changed_users.add(user)
+        self.change_load(r_stop.bus, r_stop.depart_time.sub_seconds(self.config.TRANSFER_SECONDS),
+                         user.number_of_passengers, r_stop.stop)
+        record_pick_up(r_stop, user, self.config.TRANSFER_SECONDS)
+
+    def change_load(self, bus: Bus, time: TimeImpl, number_of_passengers: int, stop: Stop):
+        """
+        Records the occupancy of the bus (in passengers) after users enter or leave. Throws error if over capacity.
+        :param bus: Bus
+        :param time: time of change
+        :param number_of_passengers: change of passengers in bus (negative if leaving)
+        :param stop: stop of change
+        """
+        self.bus_load[bus] += number_of_passengers
+        if self.bus_load[bus] > bus.line.capacity:
+            raise ValueError(
+                f"Capacity of bus {bus.id} exceeded at stop {stop.id}; Occupancy: {self.bus_load[bus]}, Capacity: {bus.line.capacity}")
+        self.max_occ_bus[bus] = max(self.bus_load[bus], self.max_occ_bus[bus])
+        self.occupancy_times[bus].append(time.get_in_seconds())
+        self.occupancy_deltas[bus].append(number_of_passengers)
+
+    def get_utilization(self):
+        """
+        Histogram of occupancy over the service time of every line, summed over the buses of the line.
+        :return: dictionary of line to seconds spent with 0, 1, ..., capacity passengers
+        """
+        utilization: Dict[Line, List[int]] = {}
+        for bus in self.max_occ_bus.keys():
+            histogram = utilization.setdefault(bus.line, [0] * (bus.line.capacity + 1))
+            # changes are recorded in order of execution, not of time: loads are accumulated after sorting
+            changes = sorted(zip(self.occupancy_times[bus], self.occupancy_deltas[bus]), key=lambda x: x[0])
+            prev_time, load = bus.line.start_time.get_in_seconds(), 0
+            # changes at the same time are summed up before the next interval is counted
+            for change_time, delta in changes:
+                if change_time > prev_time:
+                    histogram[load] += change_time - prev_time
+                    prev_time = change_time
+                load += delta
+            histogram[load] += max(0, bus.line.end_time.get_in_seconds() - prev_time)
+        return utilization
+
+    @Global.in_run
+    def check_requests(self):
+        """
+        Checks accepted users are taken care of (valid start and end times and maximum travel time).
+        Throws error if invalid.
+        """
         for request in self.requests:
             if request.act_start_time is not None:
                 if not (request.earl_start_time <= request.act_start_time <= request.latest_start_time):
@@ -126,17 +214,21 @@ class Executor:
                     raise ValueError(
                         f"Maximum travel time of request {request.id} not respected; Time travelled: {time_travelled}, Maximum Time: {max_travel_time}")
 
-        Global.MAX_OCCUPANCY = max(max_occ_bus.values())
-        Global.AVG_MAX_OCCUPANCY = sum(max_occ_bus.values()) / len(max_occ_bus.keys())
-
+    @Global.in_run
+    @Instrumentation.traced("execution")
     def execute_plan(self, curr_routes: List[Route], new_requests: Set[Request], time_next: TimeImpl):
         """
         Executes the plan, triggered by context.
+        Plans of later calls continue the executed routes, their first stop is the current location of the bus.
+        With time_next, stops are executed if the bus departs to them before time_next,
+        pick-ups after time_next are left for the next plan.
         :param curr_routes: list of bus routes
         :param new_requests: newly added requests
-        :param time_next: executes plan up to this time
+        :param time_next: executes plan up to this time (None for whole plan)
         """
-        self.user_locations |= {x: x.pick_up_location for x in new_requests if x.route_int is not None}
+        accepted_requests = {x: x.pick_up_location for x in new_requests if x.route_int is not None}
+        self.user_locations |= accepted_requests
+        self.changed_users |= accepted_requests.keys()
 
         curr_routes.sort(key=lambda x: x.bus.id)
 
@@ -144,7 +236,8 @@ class Executor:
         for route in curr_routes:
             for i in range(0, len(route.stop_list) - 1):
                 travel_time_min = Timer.calc_time(
-                    route.stop_list[i].stop.calc_distance(route.stop_list[i + 1].stop))
+                    route.stop_list[i].stop.calc_distance(route.stop_list[i + 1].stop, self.config.KM_PER_UNIT),
+                    self.config.AVERAGE_KMH)
                 if route.stop_list[i + 1].arriv_time <= route.stop_list[i].depart_time:
                     print_out_route(route.stop_list)
                 needed_time = (route.stop_list[i + 1].arriv_time - route.stop_list[i].depart_time).get_in_seconds()
@@ -152,39 +245,43 @@ class Executor:
                     raise ValueError(
                         f"Travel times are not respected in solution; Minimum Time: {travel_time_min / 60}, Needed time: {needed_time / 60}")
 
-        if time_next is None:
-            for route_count in range(len(curr_routes)):
-                self.routes[route_count].stop_list += curr_routes[route_count].stop_list
+        done_by_route: List[List[RouteStop]] = []
+        for route_count in range(len(curr_routes)):
+            route = curr_routes[route_count]
+            history = self.routes[route_count].stop_list
+            if len(route.stop_list) == 0:
+                raise ValueError("Route can not be empty")
+            counter = 0
+            if len(history) > 0:
+                # first stop of plan is current location of bus, bus stays there if nothing is picked up
+                if len(history[-1].pick_up) == 0 and history[-1].depart_time < route.stop_list[0].depart_time:
+                    history[-1].depart_time = route.stop_list[0].depart_time
+                counter = 1
 
-            all_r_stops: List[RouteStop] = []
-            for route in curr_routes:
-                all_r_stops += route.stop_list
+            # a stop is executed, when the bus departs from its previous stop before time_next
+            done_route: List[RouteStop] = []
+            while counter < len(route.stop_list) and check_departed(history, route.stop_list[counter], time_next):
+                done_route.append(route.stop_list[counter])
+                history.append(route.stop_list[counter])
+                counter += 1
+            done_by_route.append(done_route)
 
-            all_r_stops.sort(key=lambda x: x.arriv_time)
-            self.check_plan(all_r_stops)
+            if counter == 1 and time_next is not None and len(history[-1].pick_up) == 0 and history[-1].depart_time > time_next:
+                # bus is still waiting at its location, available for the next plan
+                history[-1].depart_time = max(time_next, history[-1].arriv_time)
 
-        else:
-            done_r_stops = []
-            for route_count in range(len(curr_routes)):
-                time_count: TimeImpl
-                if len(curr_routes[route_count].stop_list) > 0:
-                    time_count = curr_routes[route_count].stop_list[0].arriv_time
-                else:
-                    raise ValueError("Route can not be empty")
-                counter = 0
-                while counter < len(curr_routes[route_count].stop_list) and time_count < time_next:
-                    done_r_stops.append(curr_routes[route_count].stop_list[counter])
-                    self.routes[route_count].stop_list.append(curr_routes[route_count].stop_list[counter])
-
-                    counter += 1
-                    time_count = curr_routes[route_count].stop_list[counter].arriv_time
+        # stops of every route are sorted by arrival, merge keeps order of routes for equal arrival
+        done_r_stops: List[RouteStop] = list(heapq.merge(*done_by_route, key=lambda x: x.arriv_time.get_in_seconds()))
+        self.check_plan(done_r_stops, time_next)
 
-                # could lead to inconsistencies in dynamic case: not finished stop_events are counted as fully processed, but are cut short(pick-ups not done)
-                if counter < len(curr_routes[route_count].stop_list):
-                    self.bus_delay[curr_routes[route_count].bus] = (time_count - time_next).get_in_seconds()
+        if time_next is not None:
+            for route in self.routes:
+                if len(route.stop_list) > 0:
+                    self.bus_locations[route.bus] = route.stop_list[-1].stop
+                    self.bus_delay[route.bus] = max(0, (route.stop_list[-1].depart_time - time_next).get_in_seconds())
+                    self.changed_buses.add(route.bus)
 
-            done_r_stops.sort(key=lambda x: x.arriv_time)
-            self.check_plan(done_r_stops)
+        self.publish_snapshot(time_next)
 
 
 def print_out_route(route: List[RouteStop]):
@@ -192,8 +289,46 @@ def print_out_route(route: List[RouteStop]):
         print(str(stopr) + " arrival time: " + str(stopr.arriv_time) + " depart time: " + str(stopr.depart_time))
 
 
-def insert_sorted(waiting_bus_stops: List[RouteStop], r_stop: RouteStop):
-    i = 0
-    while i < len(waiting_bus_stops) and waiting_bus_stops[i].depart_time < r_stop.depart_time:
-        i += 1
-    waiting_bus_stops.insert(i, r_stop)
+def check_departed(history: List[RouteStop], r_stop: RouteStop, time_next: TimeImpl):
+    """
+    Checks if bus is on its way to the route stop at time_next (or has already arrived).
+    :param history: executed route stops of bus
+    :param r_stop: next route stop of plan
+    :param time_next: executes plan up to this time (None for whole plan)
+    :return: bool
+    """
+    if time_next is None:
+        return True
+    if len(history) == 0:
+        # first stop is the start location of the bus
+        return r_stop.arriv_time < time_next
+    return history[-1].depart_time < time_next
+
+
+def record_pick_up(r_stop: RouteStop, user: Request, transfer_seconds: int):
+    """
+    Stores time of pick-up for the request and for its split request on the line of the bus.
+    :param r_stop: route stop, where user is picked up
+    :param user: Request
+    :param transfer_seconds: boarding time before departure
+    """
+    act_time = r_stop.depart_time.sub_seconds(transfer_seconds)
+    if r_stop.stop is user.pick_up_location:
+        user.act_start_time = act_time
+    if user.route_int is not None:
+        for split_req in user.split_requests[user.route_int]:
+            if split_req.line == r_stop.bus.line and split_req.pick_up_location is r_stop.stop:
+                split_req.act_start_time = act_time
+
+
+def record_drop_off(r_stop: RouteStop, user: Request):
+    """
+    Stores time of drop-off for the split request of the user on the line of the bus.
+    :param r_stop: route stop, where user is dropped off
+    :param user: Request
+    """
+    if user.route_int is not None:
+        for split_req in user.split_requests[user.route_int]:
+            if split_req.line == r_stop.bus.line and split_req.drop_off_location is r_stop.stop:
+                split_req.act_end_time = r_stop.arriv_time
+
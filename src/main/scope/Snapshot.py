@@ -0,0 +1,130 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: Snapshot.py
+Description: Immutable view on the state of the executor (bus and user locations, passengers),
+            published after every execution and read by the planner.
+            A snapshot only stores the entries changed since the previous one, everything else is shared.
+"""
+from dataclasses import dataclass
+from typing import Mapping, FrozenSet, Dict, Set, Iterable
+from models.Demand import Request
+from utils.Timer import TimeImpl
+from models.Network import Bus, Stop
+
+# number of derived mappings sharing entries, before the chain is flattened into a new dictionary
+MAX_CHAIN_DEPTH: int = 8
+# marks a key removed in a derived mapping
+_REMOVED = object()
+
+
+class SharedMapping(Mapping):
+    """
+    Read-only mapping, derived mappings store their changed entries and look up the others in the mapping
+    they were derived from (chained overlay). Lookups follow at most MAX_CHAIN_DEPTH mappings.
+    """
+
+    def __init__(self, entries: Dict, parent: 'SharedMapping' = None, length: int = None, depth: int = 0):
+        self._entries: Dict = entries
+        self._parent: SharedMapping | None = parent
+        self._length: int = len(entries) if length is None else length
+        self._depth: int = depth
+
+    def __getitem__(self, key):
+        mapping = self
+        while mapping is not None:
+            if key in mapping._entries:
+                value = mapping._entries[key]
+                if value is _REMOVED:
+                    break
+                return value
+            mapping = mapping._parent
+        raise KeyError(key)
+
+    def __iter__(self):
+        seen = set()
+        mapping = self
+        while mapping is not None:
+            for key, value in mapping._entries.items():
+                if key not in seen:
+                    seen.add(key)
+                    if value is not _REMOVED:
+                        yield key
+            mapping = mapping._parent
+
+    def __len__(self):
+        return self._length
+
+    def derive(self, changes: Dict, removed: Iterable = ()):
+        """
+        Creates the mapping with changes applied, costs O(number of changes) (O(n) if the chain is flattened).
+        :param changes: dictionary of changed or added entries
+        :param removed: removed keys
+        :return: SharedMapping (self if nothing changed)
+        """
+        changes = {x: y for x, y in changes.items() if self.get(x, _REMOVED) is not y}
+        removed = {x for x in removed if x in self and x not in changes}
+        if len(changes) == 0 and len(removed) == 0:
+            return self
+
+        if self._depth >= MAX_CHAIN_DEPTH:
+            entries = dict(self.items())
+            entries |= changes
+            for key in removed:
+                del entries[key]
+            return SharedMapping(entries)
+
+        length = self._length + sum(1 for x in changes if x not in self) - len(removed)
+        return SharedMapping(changes | dict.fromkeys(removed, _REMOVED), self, length, self._depth + 1)
+
+
+@dataclass(frozen=True)
+class ExecutorSnapshot:
+    """
+    Read-only state of the executor after an execution up to time (version counts the published snapshots).
+    """
+    version: int
+    time: TimeImpl | None
+    bus_locations: Mapping[Bus, Stop]
+    bus_delay: Mapping[Bus, int]
+    passengers: Mapping[Bus, FrozenSet[Request]]
+    user_locations: Mapping[Request, Stop]
+
+
+def take_snapshot(previous: ExecutorSnapshot | None, bus_locations: Dict[Bus, Stop], bus_delay: Dict[Bus, int],
+                  passengers: Dict[Bus, Set[Request]], user_locations: Dict[Request, Stop],
+                  changed_buses: Set[Bus] = frozenset(), changed_users: Set[Request] = frozenset(),
+                  time: TimeImpl | None = None):
+    """
+    Creates the next snapshot from the (mutable) state of the executor,
+    only entries of changed buses and users are copied, everything else is shared with previous.
+    :param previous: last published snapshot, None for the first (copies everything)
+    :param bus_locations: dictionary of bus to its location
+    :param bus_delay: dictionary of bus to time until available at its location (in seconds)
+    :param passengers: dictionary of bus to its passengers
+    :param user_locations: dictionary of waiting request to its location
+    :param changed_buses: buses with changed location, delay or passengers since previous
+    :param changed_users: requests added to, removed from or moved in user_locations since previous
+    :param time: time executed up to (None for whole plan)
+    :return: ExecutorSnapshot
+    """
+    if previous is None:
+        return ExecutorSnapshot(0, time, SharedMapping(bus_locations.copy()), SharedMapping(bus_delay.copy()),
+                                SharedMapping({x: frozenset(y) for x, y in passengers.items()}),
+                                SharedMapping(user_locations.copy()))
+
+    return ExecutorSnapshot(previous.version + 1, time,
+                            previous.bus_locations.derive({x: bus_locations[x] for x in changed_buses}),
+                            previous.bus_delay.derive({x: bus_delay[x] for x in changed_buses}),
+                            previous.passengers.derive({x: frozenset(passengers[x]) for x in changed_buses
+                                                        if previous.passengers[x] != passengers[x]}),
+                            previous.user_locations.derive({x: user_locations[x] for x in changed_users
+                                                            if x in user_locations},
+                                                           {x for x in changed_users if x not in user_locations}))
@@ -41,7 +41,8 @@ class Request(AbstractRequest):
     """
 
     def __init__(self, request_id: int, number_of_passengers: int, pick_up_location: Stop, drop_off_location: Stop, earl_start_time: TimeImpl,
-                 latest_arr_time: TimeImpl, register_time: TimeImpl, numb_transfer: int, fastest_time: int):
+                 latest_arr_time: TimeImpl, register_time: TimeImpl, numb_transfer: int, fastest_time: int,
+                 time_window_seconds: int):
         self.register_time: TimeImpl = register_time
         self.split_requests: Dict[int, List[SplitRequest]] = {}
         self.numb_transfer: int = numb_transfer      # number of transfers in shortest route
@@ -49,7 +50,7 @@ class Request(AbstractRequest):
 
         self.route_int: int | None = None        # none at first, when solution selected(idx of split_request_dict)
         super().__init__(request_id, number_of_passengers, pick_up_location, drop_off_location, earl_start_time, latest_arr_time)
-        self.latest_start_time: TimeImpl = self.earl_start_time.add_seconds(Global.TIME_WINDOW_SECONDS)
+        self.latest_start_time: TimeImpl = self.earl_start_time.add_seconds(time_window_seconds)
         self.earl_arr_time: TimeImpl = self.earl_start_time.add_seconds(fastest_time)
 
     def __str__(self):
@@ -63,15 +64,12 @@ class SplitRequest(AbstractRequest):
     """
     Modelling a Split of a request travelling along a specific line in one of its route options.
     """
-    id_counter = 0
-
     def __init__(self, parent_req: Request, pick_up_location: Stop, drop_off_location: Stop, used_line: Line,
                  number_of_passengers: int):
         self.line: Line = used_line
         self.parent: Request = parent_req
         self.in_action: bool = False  # declare if split_request already started or finished
-        self.split_id: int = SplitRequest.id_counter
-        SplitRequest.id_counter += 1
+        self.split_id: int = Global.current_run().next_split_id()
         super().__init__(parent_req.id, number_of_passengers, pick_up_location, drop_off_location)
 
     def __repr__(self):
@@ -14,7 +14,6 @@ Description: Models the bus network consisting of stops(with 2d-coordinates), li
 import math
 from typing import List, Tuple
 
-from utils import Global
 from utils.Timer import TimeImpl
 
 
@@ -30,11 +29,11 @@ class Stop:
     def __repr__(self):
         return f"Stop(id: {self.id}, coordinateX: {self.coordinates[0]}, coordinateY: {self.coordinates[1]})"
 
-    def calc_distance(self, other):
+    def calc_distance(self, other, km_per_unit: float):
         assert isinstance(other, Stop)
         unit_dist = math.sqrt(
             (other.coordinates[0] - self.coordinates[0]) ** 2 + (other.coordinates[1] - self.coordinates[1]) ** 2)
-        return unit_dist * Global.KM_PER_UNIT
+        return unit_dist * km_per_unit
 
 
 class Line:
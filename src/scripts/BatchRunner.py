@@ -0,0 +1,225 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: BatchRunner.py
+Description: Solves many instances in a bounded pool of worker processes (or threads), without a new interpreter
+            per instance. Workers read every network once and start a new run (see Global.Run) for every instance.
+            Instances with existing output are skipped, so an interrupted sweep can be resumed.
+            The memory limit (RLIMIT_AS) applies to the whole worker process, i.e. to the instance it currently solves
+            together with the networks it keeps in memory, not to every instance separately.
+            Usage: python scripts/BatchRunner.py <config file> <manifest file | request directory> <output path> [processes]
+"""
+import csv
+import json
+import os
+import resource
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Tuple
+
+from models.Network import Bus
+from scripts.IOHandler import load_config, read_bus_network, solve_instance, create_output, get_output_folder
+from scripts.PlotPlans import render_plans
+from utils import Global, Instrumentation
+from utils.LineGraph import LineGraph
+
+# networks read in by this worker, by path, constants used to read them and thread
+# (the LineGraph is changed while requests are read, threads can not share it)
+NETWORK_CACHE: Dict[Tuple, Tuple[List[Bus], LineGraph]] = {}
+
+
+def reset_state():
+    """
+    Starts a new run (configuration, metrics and id counters) in the current thread,
+    so every instance starts as in a new interpreter.
+    """
+    Global.new_run()
+
+
+def get_network_key(network_path: str, config: Global.RunConfig):
+    """
+    :return: key of the network in NETWORK_CACHE
+    """
+    return network_path, config.CAPACITY_PER_LINE, config.AVERAGE_KMH, config.KM_PER_UNIT, threading.get_ident()
+
+
+def get_network(network_path: str, config: Global.RunConfig):
+    """
+    :param network_path: Path to network file
+    :param config: configuration of the run (capacity, speed and unit distance)
+    :return: buses and LineGraph of the network, read in once per worker
+    """
+    key = get_network_key(network_path, config)
+    if key not in NETWORK_CACHE:
+        buses = read_bus_network(network_path, config.CAPACITY_PER_LINE)
+        NETWORK_CACHE[key] = (buses, LineGraph(buses, config))
+    return NETWORK_CACHE[key]
+
+
+def init_worker(memory_limit_mb: int | None):
+    """
+    Limits the address space of the worker process. The limit is shared by the instance being solved and the
+    networks cached by the worker, it is not a limit per instance.
+    """
+    if memory_limit_mb is not None:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def raise_timeout(signum, frame):
+    raise TimeoutError("time limit of instance reached")
+
+
+def run_instance(path_2_config: str, instance: dict, time_limit: int | None):
+    """
+    Solves a single instance of the manifest and creates its output.
+    :param path_2_config: Path to configuration file
+    :param instance: manifest entry with paths to request/network file, output path and speed/unit distance
+    :param time_limit: seconds until the instance is stopped (None for no limit, only in worker processes)
+    :return: row of batch output
+    """
+    reset_state()
+    start_time = time.time()
+    status = "done"
+    network_key = None
+    if time_limit is not None:
+        signal.signal(signal.SIGALRM, raise_timeout)
+        signal.alarm(time_limit)
+    try:
+        config = load_config(path_2_config)
+        run_config = Global.config()
+        run_config.AVERAGE_KMH = instance.get('averageKmH', config.get('averageKmH'))
+        run_config.KM_PER_UNIT = instance.get('KmPerUnit', config.get('KmPerUnit'))
+        if time_limit is not None:
+            # the signal can not interrupt a running CPLEX solve, its time limit is cut to the time left instead
+            run_config.INSTANCE_DEADLINE = start_time + time_limit
+        Global.metrics().COMPUTATION_START_TIME = time.time()
+
+        network_key = get_network_key(instance['pathNetworkFile'], run_config)
+        shared_network = get_network(instance['pathNetworkFile'], run_config)
+        requests, context = solve_instance(config, instance['pathRequestFile'], instance['pathNetworkFile'],
+                                           shared_network=shared_network)
+        create_output(requests, context.executor.routes, instance['outputPath'], instance['pathRequestFile'],
+                      context.executor.get_utilization())
+        Instrumentation.write_output(get_output_folder(instance['outputPath'], instance['pathRequestFile']))
+    except TimeoutError:
+        status = "time limit"
+    except MemoryError:
+        status = "memory limit"
+    except Exception as e:
+        status = f"error: {e}"
+    finally:
+        if time_limit is not None:
+            signal.alarm(0)
+    if status != "done" and network_key is not None:
+        # an interrupted instance may leave request stops in the cached LineGraph, the network is read in again
+        NETWORK_CACHE.pop(network_key, None)
+
+    # peak memory of the worker so far (in MB)
+    peak_memory = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return [instance['pathRequestFile'], status, round(time.time() - start_time, 4), peak_memory]
+
+
+def is_completed(instance: dict):
+    """
+    :return: True if the output of the instance was already created
+    """
+    output_folder = get_output_folder(instance['outputPath'], instance['pathRequestFile'])
+    return os.path.exists(os.path.join(output_folder, "metrics_out.json"))
+
+
+def manifest_from_directory(request_dir: str, output_root: str, network_dir: str = "../input/bus_networks/real_networks"):
+    """
+    Creates manifest entries for all request files below request_dir,
+    e.g. <requests>/sw-geo_full/long_window/L9-32-20.csv -> output in <output>/sw-geo_full/long (as in TestLoop).
+    :param request_dir: directory of request files
+    :param output_root: root of output tree
+    :param network_dir: directory of network files
+    :return: list of manifest entries
+    """
+    instances: List[dict] = []
+    for root, dirs, files in os.walk(request_dir):
+        for file_name in sorted(x for x in files if x.endswith(".csv")):
+            parts = os.path.normpath(root).split(os.sep)
+            network_name, length_word = parts[-2], parts[-1].split("_")[0]
+            instance = {"pathRequestFile": os.path.join(root, file_name),
+                        "pathNetworkFile": os.path.join(network_dir, f"{network_name}.json"),
+                        "outputPath": os.path.join(output_root, network_name, length_word)}
+            if network_name in Global.NETWORK_UNITS:
+                instance["averageKmH"], instance["KmPerUnit"] = Global.NETWORK_UNITS[network_name]
+            instances.append(instance)
+    return instances
+
+
+def run_batch(path_2_config: str, manifest: dict, output_path: str, processes: int = None):
+    """
+    Solves all instances of the manifest not solved before and writes batch_out.csv.
+    With plotPlans in the configuration the plans of solved instances are drawn afterwards.
+    :param path_2_config: Path to configuration file
+    :param manifest: dictionary with list of 'instances' and optional 'timeLimitSeconds', 'memoryLimitMB'
+            and 'workers' ("processes" or "threads", limits only apply to processes)
+    :param output_path: directory of batch output file
+    :param processes: number of worker processes (None for number of cpus)
+    """
+    plot_plans = load_config(path_2_config).get('plotPlans', False)
+    instances = manifest['instances']
+    open_instances = [x for x in instances if not is_completed(x)]
+    print(f"Skipping {len(instances) - len(open_instances)} completed instances, solving {len(open_instances)}")
+
+    os.makedirs(output_path, exist_ok=True)
+    result_path = f"{output_path}/batch_out.csv"
+    new_file = not os.path.exists(result_path)
+    plot_tasks: List[Tuple[str, str]] = []
+    with open(result_path, mode="a", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        if new_file:
+            writer.writerow(["instance", "status", "time", "peak memory worker"])
+        if manifest.get('workers', "processes") == "threads":
+            # time limit (signal) and memory limit are per process
+            pool = ThreadPoolExecutor(max_workers=processes)
+            time_limit = None
+        else:
+            pool = ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                                       initargs=(manifest.get('memoryLimitMB'),))
+            time_limit = manifest.get('timeLimitSeconds')
+        with pool:
+            futures = [pool.submit(run_instance, path_2_config, x, time_limit) for x in open_instances]
+            for instance, future in zip(open_instances, futures):
+                try:
+                    row = future.result()
+                except Exception as e:
+                    # worker process died (e.g. killed by the system)
+                    row = [instance['pathRequestFile'], f"error: {e}", "-", "-"]
+                writer.writerow(row)
+                file.flush()
+                print(f"Finished {row[0]}: {row[1]}")
+                if row[1] == "done":
+                    plot_tasks.append((get_output_folder(instance['outputPath'], instance['pathRequestFile']),
+                                       instance['pathNetworkFile']))
+
+    # plans are drawn after all instances are solved, from the saved bus plans
+    if plot_plans:
+        print(f"Drew {render_plans(plot_tasks, processes)} plans")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in [4, 5]:
+        if os.path.isdir(sys.argv[2]):
+            batch_manifest = {"instances": manifest_from_directory(sys.argv[2], sys.argv[3])}
+        else:
+            with open(sys.argv[2], 'r') as manifest_file:
+                batch_manifest = json.load(manifest_file)
+        run_batch(sys.argv[1], batch_manifest, sys.argv[3], int(sys.argv[4]) if len(sys.argv) == 5 else None)
+    else:
+        print("Please provide the file path to the config file, manifest file (or request directory), output path "
+              "and optionally the number of processes.")
@@ -0,0 +1,142 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: BinaryInstance.py
+Description: Binary instance format (.npz, uncompressed numpy arrays) holding the network and optionally the requests,
+            times in seconds and ids as integers, so no strings are parsed while loading.
+            IOHandler reads .npz files given as network or request file (the same file can be used for both).
+            Usage: python scripts/BinaryInstance.py <network file> [request file] <output .npz file>
+"""
+import csv
+import json
+import sys
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from models.Network import Bus, Stop, Line
+from utils import Timer
+
+# request values: id, register (arrival) time, earliest start time, pick-up stop, drop-off stop, number of passengers
+RequestValues = Tuple[int, Timer.TimeImpl, Timer.TimeImpl, int, int, int]
+
+
+def convert_instance(network_path: str, request_path: str | None, output_path: str):
+    """
+    Writes network file (json) and request file (csv) as binary instance.
+    :param network_path: Path to network file
+    :param request_path: Path to request file (None for network only)
+    :param output_path: Path to .npz file
+    """
+    with open(network_path, 'r') as network_file:
+        network_dict: dict = json.load(network_file)
+
+    stop_list = network_dict.get('stops')
+    line_list = network_dict.get('lines')
+    bus_list = network_dict.get('buses')
+    line_lengths = [len(x["stops"]) for x in line_list]
+    arrays: Dict[str, np.ndarray] = {
+        "stop_ids": np.array([x["id"] for x in stop_list], dtype=np.int64),
+        "stop_coordinates": np.array([x["coordinates"] for x in stop_list], dtype=np.float64).reshape(-1, 2),
+        "line_ids": np.array([x["id"] for x in line_list], dtype=np.int64),
+        "line_offsets": np.concatenate(([0], np.cumsum(line_lengths))).astype(np.int64),
+        "line_stops": np.array([y for x in line_list for y in x["stops"]], dtype=np.int64),
+        "line_depots": np.array([x["depot"] for x in line_list], dtype=np.float64).reshape(-1, 2),
+        # -1 if the line has no individual capacity
+        "line_capacities": np.array([int(x.get("capacity", -1)) for x in line_list], dtype=np.int64),
+        "line_times": np.array([[Timer.conv_string_2_time(x["startTime"]).get_in_seconds(),
+                                 Timer.conv_string_2_time(x["endTime"]).get_in_seconds()] for x in line_list],
+                               dtype=np.int64).reshape(-1, 2),
+        "bus_ids": np.array([x["id"] for x in bus_list], dtype=np.int64),
+        "bus_lines": np.array([x["line"] for x in bus_list], dtype=np.int64)}
+
+    if request_path is not None:
+        with open(request_path, 'r') as request_file:
+            csv_requests = csv.reader(request_file)
+            next(csv_requests)
+            arrays["requests"] = np.array(
+                [[int(x[0]), Timer.conv_string_2_time(x[1]).get_in_seconds(),
+                  Timer.conv_string_2_time(x[2]).get_in_seconds(), int(x[3]), int(x[4]), int(x[5])]
+                 for x in csv_requests], dtype=np.int64).reshape(-1, 6)
+
+    np.savez(output_path, **arrays)
+
+
+def load_network(instance_path: str, capacity_per_line: int | None):
+    """
+    Creates buses, lines and stops of a binary instance (same as IOHandler.read_bus_network for the json file).
+    :param instance_path: Path to .npz file
+    :param capacity_per_line: capacity of every line, None for the capacities of the instance
+    :return: List of buses (with reference to lines and stops)
+    """
+    with np.load(instance_path) as data:
+        stop_ids = data["stop_ids"].tolist()
+        stop_coordinates = data["stop_coordinates"].tolist()
+        line_ids = data["line_ids"].tolist()
+        line_offsets = data["line_offsets"].tolist()
+        line_stops = data["line_stops"].tolist()
+        line_depots = data["line_depots"].tolist()
+        line_capacities = data["line_capacities"].tolist()
+        line_times = data["line_times"].tolist()
+        bus_ids = data["bus_ids"].tolist()
+        bus_lines = data["bus_lines"].tolist()
+
+    stops: Dict[int, Stop] = {x: Stop(x, tuple(y)) for x, y in zip(stop_ids, stop_coordinates)}
+    max_id: int = max(stop_ids)
+    depot_dict: Dict[Tuple[float, float], Stop] = {x.coordinates: x for x in stops.values()}
+
+    lines: Dict[int, Line] = {}
+    for index, line_id in enumerate(line_ids):
+        depot_coord = tuple(line_depots[index])
+        if depot_coord not in depot_dict:
+            max_id = max_id + 1
+            depot_dict[depot_coord] = Stop(max_id, depot_coord)
+
+        capacity = capacity_per_line
+        if capacity is None:
+            if line_capacities[index] < 0:
+                raise ValueError("No Global Capacity or individual given")
+            capacity = line_capacities[index]
+        stops_of_line: List[Stop] = [stops[x] for x in line_stops[line_offsets[index]:line_offsets[index + 1]]]
+        lines[line_id] = Line(line_id, stops_of_line, depot_dict[depot_coord], capacity,
+                              Timer.create_time_object(line_times[index][0]),
+                              Timer.create_time_object(line_times[index][1]))
+
+    return [Bus(x, lines[y]) for x, y in zip(bus_ids, bus_lines)]
+
+
+def load_request_values(instance_path: str):
+    """
+    :param instance_path: Path to .npz file with requests
+    :return: list of request values (id, register time, earliest start time, pick-up, drop-off, passengers),
+            sorted by earliest start time (and id)
+    """
+    with np.load(instance_path) as data:
+        if "requests" not in data.files:
+            raise ValueError(f"The binary instance {instance_path} holds no requests")
+        requests = data["requests"]
+        rows = requests[np.lexsort((requests[:, 0], requests[:, 2]))].tolist()
+
+    # requests with the same time share one time object
+    time_dict: Dict[int, Timer.TimeImpl] = {}
+    for row in rows:
+        for seconds in row[1:3]:
+            if seconds not in time_dict:
+                time_dict[seconds] = Timer.convert_2_time_from_sec(seconds)
+    return [(x[0], time_dict[x[1]], time_dict[x[2]], x[3], x[4], x[5]) for x in rows]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        convert_instance(sys.argv[1], None, sys.argv[2])
+    elif len(sys.argv) == 4:
+        convert_instance(sys.argv[1], sys.argv[2], sys.argv[3])
+    else:
+        print("Please provide the file path to the network file, optionally the request file, and the output file.")
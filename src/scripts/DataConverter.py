@@ -19,12 +19,13 @@ from typing import List
 
 from scripts.IOHandler import read_bus_network, read_requests
 from utils import Global
+from utils.Global import RunConfig
 from models.Demand import Request
 from utils.LineGraph import LineGraph
 from models.Network import Bus, Stop
 
 
-def createDistanceFile(requests: List[Request], depot: Stop, output_path: str, name: str):
+def createDistanceFile(requests: List[Request], depot: Stop, output_path: str, name: str, km_per_unit: float):
     req_stops_pick = [x.pick_up_location for x in requests]
     req_stops_drop = [x.drop_off_location for x in requests]
 
@@ -34,7 +35,7 @@ def createDistanceFile(requests: List[Request], depot: Stop, output_path: str, n
     for i in range(len(all_stops)):
         output_line = []
         for j in range(len(all_stops)):
-            output_line.append(round(all_stops[i].calc_distance(all_stops[j]), 2))
+            output_line.append(round(all_stops[i].calc_distance(all_stops[j], km_per_unit), 2))
         output_list.append(output_line)
 
     #write file to output
@@ -43,11 +44,11 @@ def createDistanceFile(requests: List[Request], depot: Stop, output_path: str, n
             # Join each sublist's values with a space and write to file
             f.write(" ".join(map(str, sublist)) + "\n")
 
-def createRequestFile(requests: List[Request], network: List[Bus], output_path: str, name: str):
+def createRequestFile(requests: List[Request], network: List[Bus], output_path: str, name: str, config: RunConfig):
     # find time for requests
     number = int(name[1])
     tw_length = (number+5)*60
-    first_out = [len(network), 2*len(requests), tw_length, Global.CAPACITY_PER_LINE, 0]
+    first_out = [len(network), 2*len(requests), tw_length, config.CAPACITY_PER_LINE, 0]
 
     depot_out_first = [0, 0.0, 0, 0.0, tw_length, tw_length]
     depot_out_last = [2*len(requests)+1, 0.0, 0, 0.0, tw_length, tw_length]
@@ -61,7 +62,7 @@ def createRequestFile(requests: List[Request], network: List[Bus], output_path:
         latest = (requests[i].latest_start_time.get_in_seconds() - (conversion_value * 60)) / 60
         max_ride_time = (requests[i].latest_arr_time - requests[i].latest_start_time).get_in_seconds() / 60
 
-        pick_out.append([i + 1, Global.TRANSFER_SECONDS / 60, requests[i].number_of_passengers, round(earliest, 2), round(latest, 2), round(max_ride_time, 2)])
+        pick_out.append([i + 1, config.TRANSFER_SECONDS / 60, requests[i].number_of_passengers, round(earliest, 2), round(latest, 2), round(max_ride_time, 2)])
 
     drop_out = []
     for i in range(len(requests)):
@@ -72,7 +73,7 @@ def createRequestFile(requests: List[Request], network: List[Bus], output_path:
         max_ride_time = (requests[i].latest_arr_time - requests[i].latest_start_time).get_in_seconds() / 60
 
         drop_out.append(
-            [i + 1 + len(requests), Global.TRANSFER_SECONDS / 60, -requests[i].number_of_passengers, round(earliest, 2), round(latest, 2), round(max_ride_time, 2)])
+            [i + 1 + len(requests), config.TRANSFER_SECONDS / 60, -requests[i].number_of_passengers, round(earliest, 2), round(latest, 2), round(max_ride_time, 2)])
 
     all_out = pick_out + drop_out
     all_out.append(depot_out_last)
@@ -90,33 +91,34 @@ def convert(path_to_config):
     with open(path_to_config, 'r') as config_file:
         config: dict = json.load(config_file)
 
-    Global.AVERAGE_KMH = config.get('averageKmH')
-    Global.KM_PER_UNIT = config.get('KmPerUnit')
-    Global.COST_PER_KM = config.get('costPerKM')
-    Global.CO2_PER_KM = config.get('co2PerKM')
-    Global.CAPACITY_PER_LINE = config.get('capacityPerLine')
-    Global.NUMBER_OF_EXTRA_TRANSFERS = config.get('numberOfExtraTransfers')
-    Global.MAX_DELAY_EQUATION = config.get('maxDelayEquation')
-    Global.TRANSFER_SECONDS = config.get('transferMinutes') * 60
-    Global.TIME_WINDOW_SECONDS = config.get('timeWindowMinutes') * 60
-    Global.CPLEX_PATH = config.get('pathCPLEX')
+    run_config = Global.config()
+    run_config.AVERAGE_KMH = config.get('averageKmH')
+    run_config.KM_PER_UNIT = config.get('KmPerUnit')
+    run_config.COST_PER_KM = config.get('costPerKM')
+    run_config.CO2_PER_KM = config.get('co2PerKM')
+    run_config.CAPACITY_PER_LINE = config.get('capacityPerLine')
+    run_config.NUMBER_OF_EXTRA_TRANSFERS = config.get('numberOfExtraTransfers')
+    run_config.MAX_DELAY_EQUATION = config.get('maxDelayEquation')
+    run_config.TRANSFER_SECONDS = config.get('transferMinutes') * 60
+    run_config.TIME_WINDOW_SECONDS = config.get('timeWindowMinutes') * 60
+    run_config.CPLEX_PATH = config.get('pathCPLEX')
 
     request_files_path: str = config.get('pathRequestFile')
     network_path: str = config.get('pathNetworkFile')
     output_path: str = config.get('outputPath')
 
-    network: List[Bus] = read_bus_network(network_path)
+    network: List[Bus] = read_bus_network(network_path, run_config.CAPACITY_PER_LINE)
     lines = list({x.line for x in network})
-    network_graph = LineGraph(network)
+    network_graph = LineGraph(network, run_config)
 
     req_folder = Path(request_files_path)
     for req_file in req_folder.iterdir():
         if req_file.is_file():
             name = req_file.name.split(".")[0]
-            requests: List[Request] = sorted(read_requests(str(req_file), network_graph), key=lambda k: k.id)
+            requests: List[Request] = sorted(read_requests(str(req_file), network_graph, run_config), key=lambda k: k.id)
 
-            createDistanceFile(requests, lines[0].depot, output_path, name)
-            createRequestFile(requests, network, output_path, name)
+            createDistanceFile(requests, lines[0].depot, output_path, name, run_config.KM_PER_UNIT)
+            createRequestFile(requests, network, output_path, name, run_config)
 
 
 convert("../../input/config.json")
\ No newline at end of file
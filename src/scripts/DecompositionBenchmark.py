@@ -0,0 +1,92 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: DecompositionBenchmark.py
+Description: Compares the decomposition planner with the monolithic event based MILP.
+            Solves every request file of a directory with both planners and reports time, accepted requests and km.
+            Usage: python scripts/DecompositionBenchmark.py <config file> <request directory> <network file> <output path>
+"""
+import csv
+import os
+import sys
+import time
+from typing import List
+
+from scripts.IOHandler import load_config, solve_instance
+from utils import Global
+
+SOLVERS = ['eventMILP', 'decompMILP']
+
+
+def run_solver(path_2_config: str, solver_str: str, request_path: str, network_path: str):
+    """
+    Solves a single instance with the given planner.
+    :param path_2_config: Path to configuration file
+    :param solver_str: registered planner string
+    :param request_path: Path to request file
+    :param network_path: Path to network file
+    :return: row of benchmark output
+    """
+    # metrics of the previous solve are not carried over
+    Global.new_run()
+    config = load_config(path_2_config)
+    config['solver'] = solver_str
+    run_config, metrics = Global.config(), Global.metrics()
+    metrics.COMPUTATION_START_TIME = time.time()
+    start_time = time.time()
+
+    requests, context = solve_instance(config, request_path, network_path)
+    total_time = round(time.time() - start_time, 4)
+
+    accepted = sum(1 for x in requests if x.act_start_time is not None)
+    km_travelled = 0
+    for route in context.executor.routes:
+        for i in range(len(route.stop_list) - 1):
+            km_travelled += route.stop_list[i].stop.calc_distance(route.stop_list[i + 1].stop, run_config.KM_PER_UNIT)
+
+    bound = metrics.DECOMPOSITION_BOUND if solver_str == 'decompMILP' else "-"
+    return [os.path.basename(request_path), solver_str, total_time, metrics.COMPUTATION_TIME_SOLVING_FIRST,
+            metrics.SOLUTION_STATUS_FIRST, metrics.INTEGRALITY_GAP_FIRST, accepted, len(requests),
+            round(km_travelled, 2), bound]
+
+
+def benchmark(path_2_config: str, request_dir: str, network_path: str, output_path: str):
+    """
+    Runs both planners on all request files of the directory and writes decomposition_benchmark.csv.
+    :param path_2_config: Path to configuration file
+    :param request_dir: directory of request files
+    :param network_path: Path to network file
+    :param output_path: directory of output file
+    """
+    os.makedirs(output_path, exist_ok=True)
+    csv_out: List[List] = [["instance", "solver", "total time", "solve time", "status", "gap", "accepted requests",
+                            "number requests", "km travelled", "lagrangian bound"]]
+
+    request_files = sorted(x for x in os.listdir(request_dir) if x.endswith(".csv"))
+    for file_name in request_files:
+        for solver_str in SOLVERS:
+            try:
+                csv_out.append(run_solver(path_2_config, solver_str, os.path.join(request_dir, file_name),
+                                          network_path))
+            except Exception as e:
+                print(f"Run failed for {file_name} with {solver_str}: {e}")
+                csv_out.append([file_name, solver_str] + ["error"] * 8)
+            print(f"Finished {file_name} with {solver_str}")
+
+    with open(f"{output_path}/decomposition_benchmark.csv", mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerows(csv_out)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 5:
+        benchmark(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4])
+    else:
+        print("Please provide the file path to the config file, request directory, network file and output path.")
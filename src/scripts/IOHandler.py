@@ -19,18 +19,22 @@ import json
 import sys
 import os
 import time
-import matplotlib.pyplot as plt
 from typing import List, Dict, Tuple, Set
 
 print(os.getcwd())
 
 from models.Plan import Route
-from utils import Global, Timer, RequestPreprocessing
+from utils import Global, Timer, RequestPreprocessing, Instrumentation
 from main.plan.EventBasedMILP import EventBasedMILP
+from main.plan.DecompositionMILP import DecompositionMILP
 from main.plan.Planner import Planner
-from main.scope.Context import Context, Static
+from main.plan.SolverParameters import resolve_parameters
+from main.scope.Context import Context, Static, RollingHorizon, StreamingHorizon, Dynamic, Replay
 from main.scope.Executor import Executor
+from scripts.PlotPlans import render_plans
+from scripts.RunMetrics import config_hash, create_record, write_record, get_instance_id
 from models.Demand import Request, SplitRequest
+from utils.Global import RunConfig
 from utils.LineGraph import LineGraph
 from utils.Timer import TimeImpl
 from models.Network import Bus, Stop, Line
@@ -39,6 +43,8 @@ from models.Network import Bus, Stop, Line
 def find_planner(solver_str: str, network: List[Bus], network_graph: LineGraph):
     if solver_str == 'eventMILP':
         return EventBasedMILP(network, network_graph)
+    elif solver_str == 'decompMILP':
+        return DecompositionMILP(network, network_graph)
     else:
         raise ValueError("the given solver string is not registered in the system")
 
@@ -46,57 +52,145 @@ def find_planner(solver_str: str, network: List[Bus], network_graph: LineGraph):
 def find_context(context_str, requests: Set[Request], executor: Executor, planner: Planner):
     if context_str == 'static':
         return Static(requests, executor, planner)
+    elif context_str == 'rollingHorizon':
+        return RollingHorizon(requests, executor, planner)
+    elif context_str == 'dynamic':
+        return Dynamic(requests, executor, planner)
+    elif context_str == 'replay':
+        return Replay(requests, executor, planner)
     else:
         raise ValueError("the given context string is not registered in the system")
 
 
-def read_requests(request_path, network_graph: LineGraph):
+def read_requests(request_path, network_graph: LineGraph, config: RunConfig):
     """
-    Reads in the request file and creates Request objects with time windows, route options and splits
+    Reads in the request file (csv or binary .npz) and creates Request objects with time windows, route options and splits
     :param request_path: Path to request file
     :param network_graph: Basic LineGraph (only transfer Stop - transfer Stop edges)
+    :param config: configuration of the run
     :return: Set of Request objects
     """
-    request_set: Set[Request] = set()
+    if request_path.endswith(".npz"):
+        from scripts.BinaryInstance import load_request_values
+        return build_requests(load_request_values(request_path), network_graph, config)
 
-    stops: Dict[int, Stop] = {}
-    for stop in network_graph.all_stops:
-        stops[stop.id] = stop
+    with open(request_path, 'r') as request_file:
+        csv_requests = csv.reader(request_file)
+
+        next(csv_requests)
+        return create_requests(csv_requests, network_graph, config)
+
+
+def read_request_values(request_path):
+    """
+    Reads the request file (csv or binary .npz) without creating requests, sorted by earliest start time.
+    :param request_path: Path to request file
+    :return: list of request values (see parse_request_row)
+    """
+    if request_path.endswith(".npz"):
+        from scripts.BinaryInstance import load_request_values
+        return load_request_values(request_path)
 
     with open(request_path, 'r') as request_file:
         csv_requests = csv.reader(request_file)
 
         next(csv_requests)
-        for row in csv_requests:
-            earl_time = Timer.conv_string_2_time(row[2])
-            pick_up: Stop = stops[int(row[3])]
-            drop_off: Stop = stops[int(row[4])]
+        return sort_request_values(parse_request_row(x) for x in csv_requests)
 
-            network_graph.add_request(pick_up, drop_off)
 
-            delay_time, numb_transfers, fastest_time = \
-                RequestPreprocessing.complete_request(pick_up, drop_off, network_graph,int(row[5]))
-            request = Request(int(row[0]), int(row[5]), pick_up, drop_off,
-                              earl_time, earl_time.add_seconds(delay_time + Global.TIME_WINDOW_SECONDS),
-                              Timer.conv_string_2_time(row[1]), numb_transfers, fastest_time)
-            split_lists: List[List[SplitRequest]] = RequestPreprocessing.find_split_requests(request, network_graph)
-            for variation_numb in range(len(split_lists)):
-                request.split_requests[variation_numb] = split_lists[variation_numb]
-                RequestPreprocessing.fill_time_windows(request, split_lists[variation_numb])
+def sort_request_values(values):
+    """
+    :param values: iterable of request values
+    :return: list of request values sorted by earliest start time (and id)
+    """
+    return sorted(values, key=lambda x: (x[2].get_in_seconds(), x[0]))
+
+
+def stream_requests(values: List[Tuple], network_graph: LineGraph, chunk_size: int, config: RunConfig):
+    """
+    Creates requests chunk by chunk, route options and splits of a chunk are only computed when it is reached.
+    :param values: request values (id, register time, earliest start time, pick-up stop id, drop-off stop id,
+                   passengers) sorted by earliest start time (see read_request_values)
+    :param network_graph: Basic LineGraph (only transfer Stop - transfer Stop edges)
+    :param chunk_size: number of requests preprocessed together
+    :param config: configuration of the run
+    :return: generator of Request objects in order of earliest start time
+    """
+    for chunk_start in range(0, len(values), chunk_size):
+        chunk = build_requests(values[chunk_start:chunk_start + chunk_size], network_graph, config)
+        yield from sorted(chunk, key=lambda x: (x.earl_start_time.get_in_seconds(), x.id))
+
 
-            network_graph.delete_request(pick_up, drop_off)
+def parse_request_row(row: List[str]):
+    """
+    :param row: row of a request file (id, arrivalTime, startTime, pickUp, dropOff, amount)
+    :return: request values (id, register time, earliest start time, pick-up stop id, drop-off stop id, passengers)
+    """
+    return (int(row[0]), Timer.conv_string_2_time(row[1]), Timer.conv_string_2_time(row[2]), int(row[3]), int(row[4]),
+            int(row[5]))
 
-            request_set.add(request)
+
+def create_requests(rows, network_graph: LineGraph, config: RunConfig):
+    """
+    Creates Request objects with time windows, route options and splits from rows of a request file
+    (id, arrivalTime, startTime, pickUp, dropOff, amount).
+    :param rows: iterable of rows (list of strings)
+    :param network_graph: Basic LineGraph (only transfer Stop - transfer Stop edges)
+    :param config: configuration of the run
+    :return: Set of Request objects
+    """
+    return build_requests((parse_request_row(x) for x in rows), network_graph, config)
+
+
+def build_requests(values, network_graph: LineGraph, config: RunConfig):
+    """
+    Creates Request objects with time windows, route options and splits from request values.
+    :param values: iterable of request values (see parse_request_row)
+    :param network_graph: Basic LineGraph (only transfer Stop - transfer Stop edges)
+    :param config: configuration of the run (time windows, transfers, maximum delay)
+    :return: Set of Request objects
+    """
+    request_set: Set[Request] = set()
+
+    stops: Dict[int, Stop] = {}
+    for stop in network_graph.all_stops:
+        stops[stop.id] = stop
+
+    for request_id, register_time, earl_time, pick_up_id, drop_off_id, amount in values:
+        pick_up: Stop = stops[pick_up_id]
+        drop_off: Stop = stops[drop_off_id]
+
+        network_graph.add_request(pick_up, drop_off)
+
+        delay_time, numb_transfers, fastest_time = \
+            RequestPreprocessing.complete_request(pick_up, drop_off, network_graph, amount, config)
+        request = Request(request_id, amount, pick_up, drop_off,
+                          earl_time, earl_time.add_seconds(delay_time + config.TIME_WINDOW_SECONDS),
+                          register_time, numb_transfers, fastest_time, config.TIME_WINDOW_SECONDS)
+        split_lists: List[List[SplitRequest]] = RequestPreprocessing.find_split_requests(request, network_graph,
+                                                                                          config)
+        for variation_numb in range(len(split_lists)):
+            request.split_requests[variation_numb] = split_lists[variation_numb]
+            RequestPreprocessing.fill_time_windows(request, split_lists[variation_numb], config)
+
+        network_graph.delete_request(pick_up, drop_off)
+
+        request_set.add(request)
 
     return request_set
 
 
-def read_bus_network(network_path: str):
+def read_bus_network(network_path: str, capacity_per_line: int | None):
     """
-    Reads in bus network file to generate classes
+    Reads in bus network file (json or binary .npz) to generate classes
     :param network_path: Path to network file
+    :param capacity_per_line: capacity of every line, None for the capacities of the network file
     :return: List of buses (with reference to lines and stops)
     """
+    if network_path.endswith(".npz"):
+        from scripts.BinaryInstance import load_network
+        return load_network(network_path, capacity_per_line)
+
     with open(network_path, 'r') as network_file:
         network_dict: dict = json.load(network_file)
 
@@ -125,7 +219,7 @@ def read_bus_network(network_path: str):
         stops_of_line: List[Stop] = []
         for stop_id in line["stops"]:
             stops_of_line.append(stops[stop_id])
-        if Global.CAPACITY_PER_LINE is None:
+        if capacity_per_line is None:
             if "capacity" in line:
                 lines[line["id"]] = Line(line["id"], stops_of_line, depot_stop, int(line["capacity"]),
                                          Timer.conv_string_2_time(line["startTime"]),
@@ -133,7 +227,7 @@ def read_bus_network(network_path: str):
             else:
                 raise ValueError("No Global Capacity or individual given")
         else:
-            lines[line["id"]] = Line(line["id"], stops_of_line, depot_stop, Global.CAPACITY_PER_LINE,
+            lines[line["id"]] = Line(line["id"], stops_of_line, depot_stop, capacity_per_line,
                                      Timer.conv_string_2_time(line["startTime"]),
                                      Timer.conv_string_2_time(line["endTime"]))
 
@@ -146,10 +240,10 @@ def read_bus_network(network_path: str):
     return buses
 
 def read_multi(path_to_req, speed: float, unit_dist: float, output_path_full):
-
-    Global.COMPUTATION_START_TIME = time.time()
-    Global.AVERAGE_KMH = speed
-    Global.KM_PER_UNIT = unit_dist
+    run_config, metrics = Global.config(), Global.metrics()
+    metrics.COMPUTATION_START_TIME = time.time()
+    run_config.AVERAGE_KMH = speed
+    run_config.KM_PER_UNIT = unit_dist
     request_path: str = path_to_req
 
     network_name = path_to_req.split("/")[-3]
@@ -164,9 +258,10 @@ def read_single(path_2_config: str):
     with open(path_2_config, 'r') as config_file:
         config: dict = json.load(config_file)
 
-    Global.COMPUTATION_START_TIME = time.time()
-    Global.AVERAGE_KMH = config.get('averageKmH')
-    Global.KM_PER_UNIT = config.get('KmPerUnit')
+    run_config, metrics = Global.config(), Global.metrics()
+    metrics.COMPUTATION_START_TIME = time.time()
+    run_config.AVERAGE_KMH = config.get('averageKmH')
+    run_config.KM_PER_UNIT = config.get('KmPerUnit')
 
     request_path: str = config.get('pathRequestFile')
     network_path: str = config.get('pathNetworkFile')
@@ -175,48 +270,139 @@ def read_single(path_2_config: str):
     return request_path, network_path, output_path
 
 
-def main(path_2_config: str, request_path: str, network_path: str, output_path: str):
+@Global.run_scoped
+def load_config(path_2_config: str):
     """
-    Starting a solve with information from config file.
+    Reads in configuration file and sets the shared constants of the run.
     :param path_2_config: Path to configuration file
+    :param run: (keyword) run to configure, default is the current run (see Global.run_scoped)
+    :return: dictionary of configuration
     """
     with open(path_2_config, 'r') as config_file:
         config: dict = json.load(config_file)
 
-    Global.COMPUTATION_START_TIME = time.time()
-    Global.COST_PER_KM = config.get('costPerKM')
-    Global.CO2_PER_KM = config.get('co2PerKM')
-    Global.CAPACITY_PER_LINE = config.get('capacityPerLine')
-    Global.NUMBER_OF_EXTRA_TRANSFERS = config.get('numberOfExtraTransfers')
-    Global.MAX_DELAY_EQUATION = config.get('maxDelayEquation')
-    Global.TRANSFER_SECONDS = config.get('transferMinutes') * 60
-    Global.TIME_WINDOW_SECONDS = config.get('timeWindowMinutes') * 60
-
+    run_config = Global.config()
+    run_config.COST_PER_KM = config.get('costPerKM')
+    run_config.CO2_PER_KM = config.get('co2PerKM')
+    run_config.CAPACITY_PER_LINE = config.get('capacityPerLine')
+    run_config.NUMBER_OF_EXTRA_TRANSFERS = config.get('numberOfExtraTransfers')
+    run_config.MAX_DELAY_EQUATION = config.get('maxDelayEquation')
+    run_config.TRANSFER_SECONDS = config.get('transferMinutes') * 60
+    run_config.TIME_WINDOW_SECONDS = config.get('timeWindowMinutes') * 60
+    run_config.HORIZON_WINDOW_SECONDS = config.get('horizonWindowMinutes', 60) * 60
+    run_config.HORIZON_OVERLAP_SECONDS = config.get('horizonOverlapMinutes', 15) * 60
+    run_config.REPLANNING_BUDGET_SECONDS = config.get('replanningBudgetSeconds')
+    run_config.REPLAY_CADENCE_SECONDS = config.get('replayCadenceMinutes', 5) * 60
+    run_config.REPLAY_SPEEDUP = config.get('replaySpeedup')
+    run_config.BATCH_WINDOW_SECONDS = config.get('batchWindowSeconds', 0)
+    run_config.BATCH_MAX_SIZE = config.get('batchMaxSize')
+    run_config.TEXT_METRICS = config.get('textMetrics', True)
+    run_config.PLOT_PLANS = config.get('plotPlans', False)
+    Instrumentation.configure(config.get('instrumentation'))
+
+    return config
+
+
+@Global.run_scoped
+def solve_instance(config: dict, request_path: str, network_path: str, parameter_overrides: dict = None,
+                   request_rows: List[List[str]] = None,
+                   shared_network: Tuple[List[Bus], LineGraph] = None):
+    """
+    Reads in request and network instance, then plans and executes it in the configured context.
+    :param config: dictionary of configuration
+    :param request_path: Path to request file
+    :param network_path: Path to network file
+    :param parameter_overrides: solver parameters replacing the configured profile (used for tuning)
+    :param request_rows: rows of a request file used instead of reading request_path (e.g. generated requests)
+    :param shared_network: buses and LineGraph of network_path read in before (e.g. shared by a batch of instances)
+    :param run: (keyword) run the instance is solved in, default is the current run
+    :return: set of requests and the finished context (bound to the run, see context.run)
+    """
+    run_config, metrics = Global.config(), Global.metrics()
     context_str: str = config.get('context')
     solver_str: str = config.get('solver')
 
-    network: List[Bus] = read_bus_network(network_path)
-    network_graph = LineGraph(network)
-    requests: Set[Request] = read_requests(request_path, network_graph)
+    chunk_size: int = config.get('streamChunkSize')
+
+    with Instrumentation.span("reading"):
+        if shared_network is None:
+            network: List[Bus] = read_bus_network(network_path, run_config.CAPACITY_PER_LINE)
+            network_graph = LineGraph(network, run_config)
+        else:
+            network, network_graph = shared_network
+        if chunk_size is not None:
+            # requests are created while the context runs, filled into the set
+            if request_rows is None:
+                request_values = read_request_values(request_path)
+            else:
+                request_values = sort_request_values(parse_request_row(x) for x in request_rows)
+            requests: Set[Request] = set()
+            number_requests = len(request_values)
+        elif request_rows is None:
+            requests: Set[Request] = read_requests(request_path, network_graph, run_config)
+            number_requests = len(requests)
+        else:
+            requests: Set[Request] = create_requests(request_rows, network_graph, run_config)
+            number_requests = len(requests)
+
+    network_name = os.path.basename(network_path).split(".")[0]
+    metrics.INSTANCE_ID = get_instance_id(network_name, request_path)
+    metrics.CONFIG_HASH = config_hash(config)
+    run_config.SOLVER_PARAMETERS = resolve_parameters(config.get('solverParameters'), network_name, number_requests)
+    if parameter_overrides is not None:
+        run_config.SOLVER_PARAMETERS |= parameter_overrides
 
     plann: Planner = find_planner(solver_str, network, network_graph)
-    context: Context = find_context(context_str, requests, Executor(network, requests), plann)
+    if chunk_size is not None:
+        if context_str != 'rollingHorizon':
+            raise ValueError("streaming of requests is only supported by the rolling horizon context")
+        context: Context = StreamingHorizon(stream_requests(request_values, network_graph, chunk_size, run_config), requests,
+                                            Executor(network, requests), plann)
+    else:
+        context: Context = find_context(context_str, requests, Executor(network, requests), plann)
 
-    Global.COMPUTATION_TIME_READING = round(time.time() - Global.COMPUTATION_START_TIME, 4)
+    metrics.COMPUTATION_TIME_READING = round(time.time() - metrics.COMPUTATION_START_TIME, 4)
     print(
-        f"Done with reading in; finding shortest routes and all route options after {Global.COMPUTATION_TIME_READING} seconds.")
-    Global.COMPUTATION_START_TIME = time.time()
+        f"Done with reading in; finding shortest routes and all route options after {metrics.COMPUTATION_TIME_READING} seconds.")
+    metrics.COMPUTATION_START_TIME = time.time()
 
     #output_network({x.line for x in network})
 
-    context.start_context()
-    create_output(requests, context.executor.routes, output_path, request_path)
+    with Instrumentation.span("context"):
+        context.start_context()
+
+    return requests, context
+
+
+@Global.run_scoped
+def main(path_2_config: str, request_path: str, network_path: str, output_path: str):
+    """
+    Starting a solve with information from config file.
+    :param path_2_config: Path to configuration file
+    """
+    run_config, metrics = Global.config(), Global.metrics()
+    config = load_config(path_2_config)
+    metrics.COMPUTATION_START_TIME = time.time()
+
+    requests, context = solve_instance(config, request_path, network_path)
+    create_output(requests, context.executor.routes, output_path, request_path, context.executor.get_utilization())
+    Instrumentation.write_output(find_output_path(output_path, request_path))
+    if run_config.PLOT_PLANS:
+        # drawn in a worker process, matplotlib is not loaded in the solving process
+        render_plans([(find_output_path(output_path, request_path), network_path)], 1)
 
     print(
-        f"Converted and validated plan; generated output in {round(time.time() - Global.COMPUTATION_START_TIME, 4)} seconds")
+        f"Converted and validated plan; generated output in {round(time.time() - metrics.COMPUTATION_START_TIME, 4)} seconds")
 
 
 def find_output_path(base_output_path: str, request_path: str):
+    result_path = get_output_folder(base_output_path, request_path)
+    os.makedirs(result_path, exist_ok=True)
+
+    return result_path
+
+
+def get_output_folder(base_output_path: str, request_path: str):
     # find number requests and translate length
     buf = request_path.split("/")[-1]
     first = buf.split(".")[0]
@@ -240,10 +426,7 @@ def find_output_path(base_output_path: str, request_path: str):
             pass
     folder_name = f"run_{max_number + 1}"
     """
-    result_path = f"{base_output_path}/{folder_name}"
-    os.makedirs(result_path)
-
-    return result_path
+    return f"{base_output_path}/{folder_name}"
 
 
 def output_network(lines: Set[Line]):
@@ -251,6 +434,8 @@ def output_network(lines: Set[Line]):
     Visualization of network lines and stops in 2d.
     :param lines: set of all lines
     """
+    import matplotlib.pyplot as plt
+
     all_stop_cords: Set[Stop] = set()
     transfer_points = set()
     for line in lines:
@@ -296,16 +481,22 @@ def output_network(lines: Set[Line]):
     plt.show()
 
 
-def create_output(requests: Set[Request], plans: List[Route], base_output_path: str, request_path: str):
+@Global.run_scoped
+@Instrumentation.traced("output")
+def create_output(requests: Set[Request], plans: List[Route], base_output_path: str, request_path: str,
+                  utilization: Dict[Line, List[int]] = None):
     """
     Outputs the plan to number of csv files with key performance indicators.
-    CSV-file for each bus plan, CSV-file for request information, overall output file and visualization of plan
+    CSV-file for each bus plan, CSV-file for request information and metrics (plans are drawn by PlotPlans)
     :param requests: set of all requests
     :param plans: list of bus plans
     :param base_output_path: path to output directory
+    :param utilization: seconds per occupancy level for every line (see Executor.get_utilization), None to skip
     """
+    run_config, metrics = Global.config(), Global.metrics()
+    transfer_seconds = run_config.TRANSFER_SECONDS
+    km_per_unit, average_kmh = run_config.KM_PER_UNIT, run_config.AVERAGE_KMH
     buses = [x.bus for x in plans]
-    lines = {x.line for x in buses}
 
     numb_denied = 0
     km_booked = 0
@@ -322,8 +513,8 @@ def create_output(requests: Set[Request], plans: List[Route], base_output_path:
 
     for req in requests:
         if req.act_start_time is not None:
-            km_booked += req.pick_up_location.calc_distance(req.drop_off_location)
-            km_booked_line += Timer.conv_time_to_dist(req.fastest_time - (Global.TRANSFER_SECONDS * req.numb_transfer))
+            km_booked += req.pick_up_location.calc_distance(req.drop_off_location, km_per_unit)
+            km_booked_line += Timer.conv_time_to_dist(req.fastest_time - (transfer_seconds * req.numb_transfer), average_kmh)
             request_stop_dict[req] = [(req.act_start_time, req.pick_up_location.id, -1)]
         else:
             numb_denied += 1
@@ -338,7 +529,7 @@ def create_output(requests: Set[Request], plans: List[Route], base_output_path:
 
             for curr_stop in plan.stop_list[1:]:
                 csv_out_bus[plan.bus].append([counter] + curr_stop.to_output())
-                km_between = prev_stop.stop.calc_distance(curr_stop.stop)
+                km_between = prev_stop.stop.calc_distance(curr_stop.stop, km_per_unit)
                 bus_overall_km_dict[plan.bus] += km_between
                 if len(passengers) == 0:
                     bus_empty_km_dict[plan.bus] += km_between
@@ -358,59 +549,34 @@ def create_output(requests: Set[Request], plans: List[Route], base_output_path:
 
     count_accepted = 0
     for req in sorted_requests:
-        km_req = Timer.conv_time_to_dist(req.fastest_time - (Global.TRANSFER_SECONDS * req.numb_transfer))
+        km_req = Timer.conv_time_to_dist(req.fastest_time - (transfer_seconds * req.numb_transfer), average_kmh)
         if req.act_start_time is not None:
             count_accepted += 1
-            wait_time = req.act_end_time.get_in_seconds() - req.act_start_time.get_in_seconds() - Timer.calc_time(req_km_dict[req])
+            wait_time = req.act_end_time.get_in_seconds() - req.act_start_time.get_in_seconds() - Timer.calc_time(req_km_dict[req], average_kmh)
             request_stop_dict[req].sort(key=lambda x: x[0])
             csv_out_req.append(
                 [str(req), str([x[2] for x in request_stop_dict[req][1:]]), str([x[1] for x in request_stop_dict[req]]),
-                 str(round(wait_time / 60, 1)), round(Timer.calc_time(req_km_dict[req]) / 60, 2),
-                 round((Timer.calc_time(km_req) + req.numb_transfer * Global.TRANSFER_SECONDS) / 60, 2), req.numb_transfer])
+                 str(round(wait_time / 60, 1)), round(Timer.calc_time(req_km_dict[req], average_kmh) / 60, 2),
+                 round((Timer.calc_time(km_req, average_kmh) + req.numb_transfer * transfer_seconds) / 60, 2), req.numb_transfer])
         else:
-            csv_out_req.append([str(req), "-", "-", "-", "-", round((Timer.calc_time(km_req) + req.numb_transfer * Global.TRANSFER_SECONDS) / 60, 2), req.numb_transfer])
+            csv_out_req.append([str(req), "-", "-", "-", "-", round((Timer.calc_time(km_req, average_kmh) + req.numb_transfer * transfer_seconds) / 60, 2), req.numb_transfer])
 
-    overall_numbers: List[List[str]] = []
     km_travel_total = round(sum(bus_overall_km_dict.values()), 3)
     km_empty_total = round(sum(bus_empty_km_dict.values()), 3)
-    km_used_total = round(km_travel_total - km_empty_total, 3)
-    overall_numbers += [[f"km travelled total: {km_travel_total}"], [f"empty km total: {km_empty_total}"],
-                        [f"used km total: {km_used_total}"]]
     acc_km_req = sum(req_km_dict.values())
-
-    try:
-        overall_numbers.append([f"system efficiency: {round(km_booked / km_travel_total, 3)}"])
-        overall_numbers.append([f"network system efficiency: {round(km_booked_line / km_travel_total, 3)}"])
-        overall_numbers.append([f"deviation factor: {round(acc_km_req / km_booked, 3)}"])
-        overall_numbers.append([f"vehicle utilization: {round(acc_km_req / km_travel_total, 3)}"])
-        overall_numbers.append([f"empty km share: {round(km_empty_total / km_travel_total, 3)}"])
-        overall_numbers.append([f"Number of Requests accepted: {count_accepted}"])
-        overall_numbers.append([f"Max Occupancy: {round(Global.MAX_OCCUPANCY, 3)}"])
-        overall_numbers.append([f"Average Max Occupancy: {round(Global.AVG_MAX_OCCUPANCY, 3)}"])
-    except ZeroDivisionError:
-        pass
-    overall_numbers.append([f"Relative MIP Gap Number Requests: {Global.INTEGRALITY_GAP_FIRST}"])
-    overall_numbers.append([f"Relative MIP Gap KM travelled: {Global.INTEGRALITY_GAP_SECOND}"])
-    overall_numbers.append([f"Number of Constraints: {Global.NUMBER_OF_CONSTRAINTS}"])
-    overall_numbers.append([f"Number of Variables: {Global.NUMBER_OF_VARIABLES}"])
-    overall_numbers.append([f"Number of Split Requests: {Global.NUMBER_OF_SPLITS}"])
-    overall_numbers.append([f"Event Graph Nodes: {Global.EVENT_GRAPH_NODES}"])
-    overall_numbers.append([f"Event Graph Edges: {Global.EVENT_GRAPH_EDGES}"])
-
-    overall_numbers.append(
-        [f"computation time for reading in: {time.strftime('%H:%M:%S', time.gmtime(Global.COMPUTATION_TIME_READING))}"])
-    overall_numbers.append([
-        f"computation time for building event graph: {time.strftime('%H:%M:%S', time.gmtime(Global.COMPUTATION_TIME_BUILDING))}"])
-    overall_numbers.append([
-        f"computation time for building model: {time.strftime('%H:%M:%S', time.gmtime(Global.COMPUTATION_TIME_BUILDING_CPLEX))}"])
-    overall_numbers.append([
-        f"computation time for solving first model: {time.strftime('%H:%M:%S', time.gmtime(Global.COMPUTATION_TIME_SOLVING_FIRST))}"])
-    overall_numbers.append([
-        f"computation time for solving second model: {time.strftime('%H:%M:%S', time.gmtime(Global.COMPUTATION_TIME_SOLVING_SECOND))}"])
+    kpis = {"requests_accepted": count_accepted, "km_travelled_total": km_travel_total,
+            "km_empty_total": km_empty_total, "km_used_total": round(km_travel_total - km_empty_total, 3),
+            "system_efficiency": None, "network_system_efficiency": None, "deviation_factor": None,
+            "vehicle_utilization": None, "empty_km_share": None,
+            "max_occupancy": round(metrics.MAX_OCCUPANCY, 3), "average_max_occupancy": round(metrics.AVG_MAX_OCCUPANCY, 3)}
+    if km_travel_total > 0 and km_booked > 0:
+        kpis["system_efficiency"] = round(km_booked / km_travel_total, 3)
+        kpis["network_system_efficiency"] = round(km_booked_line / km_travel_total, 3)
+        kpis["deviation_factor"] = round(acc_km_req / km_booked, 3)
+        kpis["vehicle_utilization"] = round(acc_km_req / km_travel_total, 3)
+        kpis["empty_km_share"] = round(km_empty_total / km_travel_total, 3)
 
     path_to_output = find_output_path(base_output_path, request_path)
-    fig = visualize_plan(plans, lines)
-    fig.savefig(f"{path_to_output}/plan.png")
 
     for bus in buses:
         with open(f"{path_to_output}/bus_{bus.id}_out.csv", mode="w", newline="", encoding="utf-8") as file:
@@ -421,65 +587,18 @@ def create_output(requests: Set[Request], plans: List[Route], base_output_path:
         writer = csv.writer(file)
         writer.writerows(csv_out_req)
 
-    with open(f"{path_to_output}/overall_out.csv", mode="w", newline="", encoding="utf-8") as file:
-        writer = csv.writer(file)
-        writer.writerows(overall_numbers)
-
-
-def visualize_plan(plan: List[Route], lines: Set[Line]):
-    """
-    Creates plot to visualize plan, draws route of buses.
-    :param plan: list of routes
-    :param lines: set of all lines
-    """
-    segment_dict: Dict[frozenset[Stop], list] = {}  # dictionary for segment in network, count occurence
-    km_overall: float = 0
-
-    # count occurence of each segment -> calc overall km and normalize
-    color_set = ['red', 'green', 'blue', 'purple', 'pink', 'brown', 'orange'] * 3
-    color_iter = iter(color_set)
-    color_dict: Dict[Line, str] = {}
-    for line in lines:
-        color_dict[line] = next(color_iter)
-
-    for route in plan:
-        for i in range(len(route.stop_list) - 1):
-            stop1 = route.stop_list[i].stop
-            stop2 = route.stop_list[i + 1].stop
-            stop_set: frozenset = frozenset({stop1, stop2})
-            km_needed = Timer.calc_time(stop1.calc_distance(stop2))
-            km_overall += km_needed
-
-            if len(stop_set) == 2:
-                if stop_set not in segment_dict:
-                    segment_dict[stop_set] = [km_needed, route.bus.line]
-                else:
-                    segment_dict[stop_set][0] += km_needed
-
-    fig, ax = plt.subplots()
+    write_record(create_record(kpis, len(requests), metrics), path_to_output, run_config.TEXT_METRICS)
 
-    max_thickness = 10.0
-    sorted_seg = sorted(list(segment_dict.keys()), key=lambda u: segment_dict[u][0], reverse=True)
-
-    for stop_set in sorted_seg:
-        stop_set_iter = iter(stop_set)
-        x1, y1 = next(stop_set_iter).coordinates
-        x2, y2 = next(stop_set_iter).coordinates
-        ax.plot([x1, x2], [y1, y2], color=color_dict[segment_dict[stop_set][1]],
-                 lw=max_thickness * (segment_dict[stop_set][0] / km_overall))
-
-    # build pyplot graph
-    all_stop_cords: Set[Stop] = set()
-    for line in lines:
-        all_stop_cords |= set(line.stops)
-    all_stop_cords_list = list(all_stop_cords)
-
-    x = [i.coordinates[0] for i in all_stop_cords_list]
-    y = [i.coordinates[1] for i in all_stop_cords_list]
-
-    ax.plot(x, y, 'ko')
-
-    return fig
+    if utilization is not None:
+        csv_out_util: List[List] = [["line ID", "occupancy", "seconds", "share of service time"]]
+        for line in sorted(utilization.keys(), key=lambda x: x.id):
+            total_seconds = sum(utilization[line])
+            for occupancy, seconds in enumerate(utilization[line]):
+                csv_out_util.append([line.id, occupancy, seconds,
+                                     round(seconds / total_seconds, 4) if total_seconds > 0 else 0])
+        with open(f"{path_to_output}/utilization_out.csv", mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerows(csv_out_util)
 
 
 if __name__ == "__main__":
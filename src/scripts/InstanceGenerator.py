@@ -0,0 +1,236 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: InstanceGenerator.py
+Description: Seeded generator of synthetic instances for benchmarking: request files for a network
+            (number of requests, window length, passengers, hotspot stops, lead time) and grid or radial line networks.
+            Request files are written as <output>/<network>/<length>_window/L<window>-<number stops>-<number requests>.csv.
+            Usage: python scripts/InstanceGenerator.py <generator file>
+"""
+import csv
+import json
+import math
+import os
+import random
+import sys
+from typing import List, Dict, Tuple
+
+from utils import Global, Timer
+
+# minutes between two possible times of generated requests
+TIME_GRID_MINUTES: int = 5
+
+
+def read_network_stops(network_path: str):
+    """
+    :param network_path: Path to network file
+    :return: number of stops of the network, stop ids served by lines, start of service in seconds
+    """
+    with open(network_path, 'r') as network_file:
+        network_dict: dict = json.load(network_file)
+
+    stop_ids = sorted({y for x in network_dict.get('lines') for y in x["stops"]})
+    service_start = min(Timer.conv_string_2_time(x["startTime"]).get_in_seconds() for x in network_dict.get('lines'))
+    return len(network_dict.get('stops')), stop_ids, service_start
+
+
+def get_stop_weights(stop_ids: List[int], hotspots: Dict[int, float] | None):
+    """
+    :param stop_ids: stop ids served by lines
+    :param hotspots: dictionary of stop id to weight (stops not given have weight 1)
+    :return: list of weights in order of stop_ids
+    """
+    hotspots = hotspots or {}
+    return [float(hotspots.get(x, 1.0)) for x in stop_ids]
+
+
+def generate_requests(network_path: str, number_requests: int, window_hours: int, seed: int | str = 0,
+                      first_start: str = "08:00:00", passenger_weights: Tuple[float, ...] = (0.8, 0.18, 0.02),
+                      pick_up_hotspots: Dict[int, float] = None, drop_off_hotspots: Dict[int, float] = None,
+                      lead_minutes: Tuple[int, int] = (60, 360)):
+    """
+    Generates rows of a request file, earliest pick-up times are uniform in the window,
+    bookings are made lead_minutes before (not before start of service), all times on a 5 minute grid.
+    :param network_path: Path to network file
+    :param number_requests: number of requests
+    :param window_hours: length of window of earliest pick-up times (hours)
+    :param seed: seed of random generator (int or string)
+    :param first_start: start of window
+    :param passenger_weights: weights of 1, 2, 3, ... passengers per request
+    :param pick_up_hotspots: dictionary of stop id to weight for pick-up
+    :param drop_off_hotspots: dictionary of stop id to weight for drop-off
+    :param lead_minutes: range of minutes between booking (arrivalTime) and earliest pick-up (startTime)
+    :return: list of rows (id, arrivalTime, startTime, pickUp, dropOff, amount)
+    """
+    rng = random.Random(seed)
+    number_stops, stop_ids, service_start = read_network_stops(network_path)
+    pick_up_weights = get_stop_weights(stop_ids, pick_up_hotspots)
+    drop_off_weights = get_stop_weights(stop_ids, drop_off_hotspots)
+    window_start = Timer.conv_string_2_time(first_start).get_in_seconds()
+    grid = TIME_GRID_MINUTES * 60
+    slots = window_hours * 3600 // grid
+
+    rows: List[List[str]] = []
+    for request_id in range(number_requests):
+        start = window_start + rng.randint(0, slots) * grid
+        lead = rng.randint(lead_minutes[0] // TIME_GRID_MINUTES, lead_minutes[1] // TIME_GRID_MINUTES) * grid
+        arrival = max(service_start, start - lead)
+
+        pick_up = rng.choices(stop_ids, pick_up_weights)[0]
+        other_weights = [0 if x == pick_up else y for x, y in zip(stop_ids, drop_off_weights)]
+        if not any(other_weights):
+            raise ValueError(f"No drop-off stop with weight other than pick-up stop {pick_up}")
+        drop_off = rng.choices(stop_ids, other_weights)[0]
+        amount = rng.choices(range(1, len(passenger_weights) + 1), passenger_weights)[0]
+
+        rows.append([str(request_id), str(Timer.create_time_object(arrival)), str(Timer.create_time_object(start)),
+                     str(pick_up), str(drop_off), str(amount)])
+    return rows
+
+
+def write_requests(rows: List[List[str]], network_path: str, output_root: str, window_hours: int):
+    """
+    Writes a request file with the naming scheme of the shipped instances.
+    :param rows: rows of generate_requests
+    :param network_path: Path to network file
+    :param output_root: root of request tree
+    :param window_hours: length of window of earliest pick-up times (hours)
+    :return: path to request file
+    """
+    network_name = os.path.splitext(os.path.basename(network_path))[0]
+    number_stops = read_network_stops(network_path)[0]
+    folder = os.path.join(output_root, network_name, Global.WINDOW_FOLDERS.get(window_hours, f"{window_hours}h_window"))
+    os.makedirs(folder, exist_ok=True)
+
+    request_path = os.path.join(folder, f"L{window_hours}-{number_stops}-{len(rows)}.csv")
+    with open(request_path, mode="w", newline="", encoding="utf-8") as file:
+        file.write("id, arrivalTime, startTime, pickUp, dropOff, amount\n")
+        csv.writer(file).writerows(rows)
+    return request_path
+
+
+def create_network(stops: List[Tuple[float, float]], lines: List[Tuple[List[int], int]], buses_per_line: int,
+                   capacity: int | None):
+    """
+    :param stops: coordinates of stops (index is stop id)
+    :param lines: list of stop ids of line and stop id of depot
+    :param buses_per_line: number of buses on every line
+    :param capacity: capacity of every line (None for capacity of configuration)
+    :return: dictionary of network file
+    """
+    line_list: List[dict] = []
+    for line_id, (stop_ids, depot_id) in enumerate(lines):
+        line = {"id": line_id, "stops": stop_ids, "depot": list(stops[depot_id]),
+                "startTime": "07:00:00", "endTime": "19:00:00"}
+        if capacity is not None:
+            line["capacity"] = capacity
+        line_list.append(line)
+
+    return {"stops": [{"id": x, "coordinates": list(y)} for x, y in enumerate(stops)],
+            "lines": line_list,
+            "buses": [{"id": x, "line": x // buses_per_line} for x in range(len(lines) * buses_per_line)]}
+
+
+def grid_network(rows: int, columns: int, spacing: float = 1.0, buses_per_line: int = 2, capacity: int = None):
+    """
+    Grid of stops with a line along every row and every column, lines cross at transfer points.
+    Depot of a line is its middle stop.
+    :param rows: number of rows of stops
+    :param columns: number of columns of stops
+    :param spacing: distance between neighbouring stops (units)
+    :param buses_per_line: number of buses on every line
+    :param capacity: capacity of every line (None for capacity of configuration)
+    :return: dictionary of network file
+    """
+    stops = [(column * spacing, row * spacing) for row in range(rows) for column in range(columns)]
+    line_stops = [[row * columns + x for x in range(columns)] for row in range(rows)]
+    line_stops += [[x * columns + column for x in range(rows)] for column in range(columns)]
+    return create_network(stops, [(x, x[len(x) // 2]) for x in line_stops], buses_per_line, capacity)
+
+
+def radial_network(spokes: int, stops_per_spoke: int, spacing: float = 1.0, ring: bool = True,
+                   buses_per_line: int = 2, capacity: int = None):
+    """
+    Hub stop (id 0) with a line along every spoke starting at the hub (depot at the hub)
+    and optionally a ring line through the middle stops of the spokes.
+    :param spokes: number of spokes
+    :param stops_per_spoke: number of stops of a spoke (without hub)
+    :param spacing: distance between neighbouring stops of a spoke (units)
+    :param ring: add ring line
+    :param buses_per_line: number of buses on every line
+    :param capacity: capacity of every line (None for capacity of configuration)
+    :return: dictionary of network file
+    """
+    stops: List[Tuple[float, float]] = [(0.0, 0.0)]
+    lines: List[Tuple[List[int], int]] = []
+    for spoke in range(spokes):
+        angle = 2 * math.pi * spoke / spokes
+        first_id = len(stops)
+        stops += [(round(x * spacing * math.cos(angle), 3), round(x * spacing * math.sin(angle), 3))
+                  for x in range(1, stops_per_spoke + 1)]
+        lines.append(([0] + list(range(first_id, len(stops))), 0))
+
+    if ring and spokes > 2:
+        ring_index = (stops_per_spoke + 1) // 2
+        ring_stops = [1 + x * stops_per_spoke + ring_index - 1 for x in range(spokes)]
+        lines.append((ring_stops, ring_stops[0]))
+    return create_network(stops, lines, buses_per_line, capacity)
+
+
+def generate(spec: dict):
+    """
+    Generates the instances of a generator file.
+    :param spec: dictionary with 'outputPath', optional 'network' (type 'grid' or 'radial' and its parameters, written
+            to 'pathNetworkFile') or 'pathNetworkFile' of an existing network, 'numberRequests' and 'windowHours' (lists),
+            optional 'seed', 'firstStart', 'passengerWeights', 'leadMinutes', 'hotspots' (stop id to weight)
+            or 'pickUpHotspots' and 'dropOffHotspots'
+    :return: list of paths to request files
+    """
+    network_path = spec['pathNetworkFile']
+    network_spec = spec.get('network')
+    if network_spec is not None:
+        parameters = {x: y for x, y in network_spec.items() if x != "type"}
+        if network_spec['type'] == "grid":
+            network_dict = grid_network(**parameters)
+        elif network_spec['type'] == "radial":
+            network_dict = radial_network(**parameters)
+        else:
+            raise ValueError(f"Unknown network type {network_spec['type']}")
+        os.makedirs(os.path.dirname(network_path) or ".", exist_ok=True)
+        with open(network_path, mode="w", encoding="utf-8") as file:
+            json.dump(network_dict, file, indent=1)
+
+    hotspots = {int(x): y for x, y in spec.get('hotspots', {}).items()}
+    pick_up_hotspots = {int(x): y for x, y in spec.get('pickUpHotspots', hotspots).items()}
+    drop_off_hotspots = {int(x): y for x, y in spec.get('dropOffHotspots', hotspots).items()}
+    seed = spec.get('seed', 0)
+
+    request_paths: List[str] = []
+    for window_hours in spec['windowHours']:
+        for number_requests in spec['numberRequests']:
+            # every file has its own generator, so adding files does not change the others
+            rows = generate_requests(network_path, number_requests, window_hours,
+                                     seed=f"{seed}-{window_hours}-{number_requests}",
+                                     first_start=spec.get('firstStart', "08:00:00"),
+                                     passenger_weights=tuple(spec.get('passengerWeights', (0.8, 0.18, 0.02))),
+                                     pick_up_hotspots=pick_up_hotspots, drop_off_hotspots=drop_off_hotspots,
+                                     lead_minutes=tuple(spec.get('leadMinutes', (60, 360))))
+            request_paths.append(write_requests(rows, network_path, spec['outputPath'], window_hours))
+    return request_paths
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        with open(sys.argv[1], 'r') as spec_file:
+            generator_spec = json.load(spec_file)
+        for path in generate(generator_spec):
+            print(f"Wrote {path}")
+    else:
+        print("Please provide the file path to the generator file.")
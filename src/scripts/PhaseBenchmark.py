@@ -0,0 +1,212 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: PhaseBenchmark.py
+Description: Benchmark suite timing the phases of a static solve separately (reading, route enumeration,
+            event graph, model building, solving, execution and output) on a fixed set of instances.
+            Without CPLEX (or with "solve": false) the suite stops before building the model.
+            Results are written as JSON and compared to a baseline with a relative tolerance.
+            Usage: python scripts/PhaseBenchmark.py <config file> <benchmark file> [update]
+"""
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sys
+import time
+from typing import List, Dict
+
+from scripts.BatchRunner import reset_state
+from scripts.IOHandler import load_config, read_bus_network, read_request_values, build_requests, find_planner, \
+    create_output
+from scripts.RunMetrics import get_instance_id
+from main.plan.SolverParameters import resolve_parameters
+from main.scope.Executor import Executor
+from utils import Global
+from utils.LineGraph import LineGraph
+
+# increased when phases or fields of the result change
+BENCHMARK_VERSION: int = 1
+
+PHASES: List[str] = ["reading", "route_enumeration", "event_graph", "model_build", "solve", "output"]
+
+# phases faster than this (seconds) in the baseline are not compared, their timing is mostly noise
+MIN_COMPARED_SECONDS: float = 0.05
+
+
+def solver_available():
+    """
+    :return: True if CPLEX can be imported
+    """
+    return importlib.util.find_spec("cplex") is not None
+
+
+def time_instance(path_2_config: str, instance: dict, solve: bool, output_path: str):
+    """
+    Runs the phases of a static solve of an instance once.
+    :param path_2_config: Path to configuration file
+    :param instance: benchmark entry with paths to request/network file and speed/unit distance
+    :param solve: build and solve the model, then execute the plan and create the output
+    :param output_path: output path of the instance
+    :return: dictionary of phase to seconds (None for phases not run) and dictionary of sizes of the instance
+    """
+    reset_state()
+    # objects of the previous run are not collected while timing
+    gc.collect()
+    config = load_config(path_2_config)
+    run_config, metrics = Global.config(), Global.metrics()
+    run_config.AVERAGE_KMH = instance.get('averageKmH', config.get('averageKmH'))
+    run_config.KM_PER_UNIT = instance.get('KmPerUnit', config.get('KmPerUnit'))
+    seconds: Dict[str, float | None] = dict.fromkeys(PHASES)
+
+    start_time = time.perf_counter()
+    network = read_bus_network(instance['pathNetworkFile'], run_config.CAPACITY_PER_LINE)
+    network_graph = LineGraph(network, run_config)
+    request_values = read_request_values(instance['pathRequestFile'])
+    seconds["reading"] = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    requests = build_requests(request_values, network_graph, run_config)
+    seconds["route_enumeration"] = time.perf_counter() - start_time
+
+    network_name = os.path.basename(instance['pathNetworkFile']).split(".")[0]
+    run_config.SOLVER_PARAMETERS = resolve_parameters(config.get('solverParameters'), network_name, len(requests))
+    planner = find_planner(config.get('solver'), network, network_graph)
+    executor = Executor(network, requests)
+    snapshot = executor.snapshot
+
+    start_time = time.perf_counter()
+    all_active_requests = planner.build_event_graph(requests, snapshot.bus_locations, snapshot.passengers, {},
+                                                    snapshot.bus_delay)
+    seconds["event_graph"] = time.perf_counter() - start_time
+    sizes = {"number_requests": len(requests),
+             "split_requests": len(planner.event_graph.request_dict.keys()),
+             "event_graph_nodes": len(planner.event_graph.edge_dict.keys()),
+             "event_graph_edges": planner.event_graph.get_number_of_edges()}
+
+    if solve:
+        # the planner measures the model building from COMPUTATION_START_TIME
+        metrics.COMPUTATION_START_TIME = time.time()
+        start_time = time.perf_counter()
+        planner.curr_routes = planner.solve_event_graph(all_active_requests)
+        seconds["model_build"] = metrics.COMPUTATION_TIME_BUILDING_CPLEX
+        seconds["solve"] = time.perf_counter() - start_time - metrics.COMPUTATION_TIME_BUILDING_CPLEX
+
+        metrics.EVENT_GRAPH_NODES = sizes["event_graph_nodes"]
+        metrics.EVENT_GRAPH_EDGES = sizes["event_graph_edges"]
+        metrics.NUMBER_OF_SPLITS = sizes["split_requests"]
+        start_time = time.perf_counter()
+        executor.execute_plan(planner.curr_routes, requests, None)
+        create_output(requests, executor.routes, output_path, instance['pathRequestFile'], executor.get_utilization())
+        seconds["output"] = time.perf_counter() - start_time
+        sizes["requests_accepted"] = sum(1 for x in requests if x.act_start_time is not None)
+
+    return seconds, sizes
+
+
+def run_suite(path_2_config: str, suite: dict):
+    """
+    Runs every instance of the suite 'repeats' times, the fastest time of every phase is reported
+    (noise of the machine only adds time).
+    :param path_2_config: Path to configuration file
+    :param suite: dictionary of benchmark file
+    :return: benchmark result
+    """
+    solve = suite.get('solve', True) and solver_available()
+    if not solve:
+        print("Benchmark stops before building the model (no solver)")
+    repeats = suite.get('repeats', 5)
+
+    instances: Dict[str, dict] = {}
+    for instance in suite['instances']:
+        network_name = os.path.basename(instance['pathNetworkFile']).split(".")[0]
+        instance_id = get_instance_id(network_name, instance['pathRequestFile'])
+        runs = [time_instance(path_2_config, instance, solve, os.path.join(suite['outputPath'], network_name))
+                for _ in range(repeats)]
+
+        fastest = {x: round(min(y[0][x] for y in runs), 4) if runs[0][0][x] is not None else None for x in PHASES}
+        instances[instance_id] = {"seconds": fastest, "sizes": runs[0][1]}
+        print(f"Finished {instance_id}: {fastest}")
+
+    return {"schema_version": BENCHMARK_VERSION, "solve": solve, "repeats": repeats,
+            "python": platform.python_version(), "machine": platform.machine(),
+            "created": time.strftime("%Y-%m-%d %H:%M:%S"), "instances": instances}
+
+
+def compare_results(result: dict, baseline: dict, tolerance: float):
+    """
+    Compares phase timings of a result with the baseline.
+    A phase regresses if it takes more than (1 + tolerance) times its baseline,
+    an instance changed if its sizes (event graph, accepted requests) differ from the baseline.
+    :param result: benchmark result of run_suite
+    :param baseline: benchmark result used as baseline
+    :param tolerance: relative tolerance, e.g. 0.25
+    :return: list of regressions and changes (as text)
+    """
+    findings: List[str] = []
+    for instance_id, entry in result["instances"].items():
+        base_entry = baseline["instances"].get(instance_id)
+        if base_entry is None:
+            continue
+        for key, value in entry["sizes"].items():
+            if key in base_entry["sizes"] and base_entry["sizes"][key] != value:
+                findings.append(f"{instance_id}: {key} changed from {base_entry['sizes'][key]} to {value}")
+        for phase in PHASES:
+            value = entry["seconds"][phase]
+            base_value = base_entry["seconds"].get(phase)
+            if value is None or base_value is None or base_value < MIN_COMPARED_SECONDS:
+                continue
+            if value > base_value * (1 + tolerance):
+                findings.append(f"{instance_id}: {phase} took {value} seconds, baseline {base_value} seconds "
+                                f"(+{round((value / base_value - 1) * 100, 1)}%)")
+    return findings
+
+
+def benchmark(path_2_config: str, path_2_benchmark: str, update_baseline: bool = False):
+    """
+    Runs the suite, writes benchmark_out.json and compares it to the baseline (or replaces the baseline).
+    :param path_2_config: Path to configuration file
+    :param path_2_benchmark: Path to benchmark file with 'instances', 'outputPath', 'pathBaseline'
+            and optional 'repeats', 'tolerance' and 'solve'
+    :param update_baseline: write the result as new baseline
+    :return: list of regressions and changes
+    """
+    with open(path_2_benchmark, 'r') as benchmark_file:
+        suite: dict = json.load(benchmark_file)
+
+    result = run_suite(path_2_config, suite)
+    os.makedirs(suite['outputPath'], exist_ok=True)
+    with open(os.path.join(suite['outputPath'], "benchmark_out.json"), mode="w", encoding="utf-8") as file:
+        json.dump(result, file, indent=1)
+
+    baseline_path = suite['pathBaseline']
+    if update_baseline or not os.path.exists(baseline_path):
+        with open(baseline_path, mode="w", encoding="utf-8") as file:
+            json.dump(result, file, indent=1)
+        print(f"Wrote baseline {baseline_path}")
+        return []
+
+    with open(baseline_path, 'r', encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    findings = compare_results(result, baseline, suite.get('tolerance', 0.25))
+    for finding in findings:
+        print(finding)
+    print(f"{len(findings)} regressions or changes compared to the baseline")
+    return findings
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 or (len(sys.argv) == 4 and sys.argv[3] == "update"):
+        if len(benchmark(sys.argv[1], sys.argv[2], len(sys.argv) == 4)) > 0:
+            sys.exit(1)
+    else:
+        print("Please provide the file path to the config file, the benchmark file and optionally 'update' "
+              "to replace the baseline.")
@@ -0,0 +1,289 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: PlanValidator.py
+Description: Validates stored plans (bus_*_out.csv files of create_output) without solving again.
+            Checks travel times, lines, capacities, time windows and maximum ride times.
+            Whole output trees are validated in parallel, one process per output directory.
+            Usage: python scripts/PlanValidator.py <config file> <output directory> <request directory> <network directory> [processes]
+"""
+import ast
+import csv
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Set, NamedTuple
+
+from models.Demand import Request
+from models.Network import Bus, Stop
+from scripts.IOHandler import load_config, read_bus_network, read_requests
+from scripts.RunMetrics import find_request_file
+from utils import Global, Timer
+from utils.Global import RunConfig
+from utils.LineGraph import LineGraph
+
+class PlanStop(NamedTuple):
+    """
+    Stop of a stored bus plan, times in seconds and users by id.
+    """
+    stop: Stop
+    arrival: int
+    depart: int
+    pick_up: List[int]
+    drop_off: List[int]
+
+
+class UserAction(NamedTuple):
+    """
+    Pick-up (at departure minus transfer time) or drop-off (at arrival) of a user.
+    """
+    time: int
+    is_pick_up: bool
+    bus: Bus
+    stop: Stop
+
+
+def read_bus_plan(path: str, stops: Dict[int, Stop]):
+    """
+    Reads a bus_*_out.csv file.
+    :param path: path to bus plan file
+    :param stops: dictionary of stop id to Stop
+    :return: list of PlanStops
+    """
+    plan: List[PlanStop] = []
+    with open(path, 'r') as plan_file:
+        csv_plan = csv.reader(plan_file)
+        next(csv_plan)
+        for row in csv_plan:
+            plan.append(PlanStop(stops[int(row[1])], Timer.conv_string_2_time(row[2]).get_in_seconds(),
+                                 Timer.conv_string_2_time(row[3]).get_in_seconds(),
+                                 [int(x) for x in ast.literal_eval(row[4])],
+                                 [int(x) for x in ast.literal_eval(row[5])]))
+    return plan
+
+
+def read_accepted(path: str):
+    """
+    Reads the ids of the accepted requests from requests_out.csv.
+    :param path: path to request output file
+    :return: set of request ids
+    """
+    with open(path, 'r') as request_file:
+        csv_requests = csv.reader(request_file)
+        next(csv_requests)
+        return {int(row[0]) for row in csv_requests if row[1] != "-"}
+
+
+def validate_plan(plans: Dict[Bus, List[PlanStop]], requests: Set[Request], config: RunConfig,
+                  accepted: Set[int] = None):
+    """
+    Validates bus plans against network and requests, does not change any of them.
+    :param plans: dictionary of bus to its list of PlanStops
+    :param requests: set of all requests
+    :param config: configuration of the run (travel and transfer times)
+    :param accepted: ids of requests reported as accepted (None to skip the check)
+    :return: list of error messages, empty if valid
+    """
+    errors: List[str] = []
+    request_dict: Dict[int, Request] = {x.id: x for x in requests}
+    actions: Dict[int, List[UserAction]] = {}
+    km_per_unit, average_kmh = config.KM_PER_UNIT, config.AVERAGE_KMH
+
+    for bus, plan in sorted(plans.items(), key=lambda x: x[0].id):
+        passengers: Set[int] = set()
+        for i, plan_stop in enumerate(plan):
+            if plan_stop.stop not in bus.line.stops and plan_stop.stop is not bus.line.depot:
+                errors.append(f"Stop {plan_stop.stop.id} not on line {bus.line.id} of bus {bus.id}")
+            # departure at last stop has no meaning (bus stays at depot)
+            if i < len(plan) - 1 and plan_stop.depart < plan_stop.arrival:
+                errors.append(f"Bus {bus.id} departs before arriving at stop {plan_stop.stop.id}")
+            if i > 0:
+                travel_time_min = Timer.calc_time(plan[i - 1].stop.calc_distance(plan_stop.stop, km_per_unit), average_kmh)
+                needed_time = plan_stop.arrival - plan[i - 1].depart
+                if (travel_time_min - 0.1) > needed_time:
+                    errors.append(
+                        f"Travel times are not respected in solution; Minimum Time: {travel_time_min / 60}, Needed time: {needed_time / 60}")
+
+            for user in plan_stop.drop_off:
+                if user not in passengers:
+                    errors.append(f"User {user} not supposed to be in bus")
+                passengers.discard(user)
+                actions.setdefault(user, []).append(UserAction(plan_stop.arrival, False, bus, plan_stop.stop))
+            for user in plan_stop.pick_up:
+                if user not in request_dict:
+                    errors.append(f"User {user} not marked as waiting")
+                    continue
+                passengers.add(user)
+                actions.setdefault(user, []).append(
+                    UserAction(plan_stop.depart - config.TRANSFER_SECONDS, True, bus, plan_stop.stop))
+
+            occupancy = sum(request_dict[x].number_of_passengers for x in passengers)
+            if occupancy > bus.line.capacity:
+                errors.append(f"Capacity of bus {bus.id} exceeded at stop {plan_stop.stop.id}; Occupancy: {occupancy}, Capacity: {bus.line.capacity}")
+
+        for user in sorted(passengers):
+            errors.append(f"Request {user} was picked up but not delivered")
+
+    for user, user_actions in sorted(actions.items()):
+        if user in request_dict:
+            errors += validate_request(request_dict[user], user_actions)
+
+    if accepted is not None:
+        for user in sorted(accepted - actions.keys()):
+            errors.append(f"Request {user} accepted but not served by any bus")
+
+    return errors
+
+
+def validate_request(request: Request, user_actions: List[UserAction]):
+    """
+    Follows the user through its pick-ups and drop-offs (in time), then checks time windows and maximum ride time.
+    :param request: Request
+    :param user_actions: pick-ups and drop-offs of the user
+    :return: list of error messages
+    """
+    # drop-off before pick-up at the same time, the user has to leave one bus before entering the next
+    user_actions = sorted(user_actions, key=lambda x: (x.time, x.is_pick_up))
+    errors: List[str] = []
+    location: Stop = request.pick_up_location
+    on_board = False
+    for action in user_actions:
+        if action.is_pick_up:
+            if on_board:
+                errors.append(f"User {request.id} not marked as waiting")
+            elif action.stop is not location:
+                errors.append("Missmatch between expected pick-up stop and actual")
+            on_board = True
+        else:
+            if not on_board:
+                errors.append(f"User {request.id} not supposed to be in bus")
+            on_board = False
+            location = action.stop
+    if len(errors) > 0:
+        return errors
+
+    picks = [x for x in user_actions if x.is_pick_up]
+    act_start_time = Timer.convert_2_time_from_sec(picks[0].time)
+    if picks[0].stop is not request.pick_up_location:
+        return ["Missmatch between expected pick-up stop and actual"]
+    if not (request.earl_start_time <= act_start_time <= request.latest_start_time):
+        errors.append(
+            f"The pick-up time window of request {request.id} not respected; Window: [{request.earl_start_time} : {request.latest_start_time}], actual time: {act_start_time}")
+    if location is not request.drop_off_location:
+        errors.append(f"Request {request.id} was picked up but not delivered")
+        return errors
+    act_end_time = Timer.convert_2_time_from_sec(user_actions[-1].time)
+    if not (request.earl_arr_time <= act_end_time <= request.latest_arr_time):
+        errors.append(
+            f"The drop-off time window of request {request.id} not respected; Window: [{request.earl_arr_time} : {request.latest_arr_time}], actual time: {act_end_time}")
+    time_travelled = (act_end_time - act_start_time).get_in_seconds()
+    max_travel_time = (request.latest_arr_time - request.latest_start_time).get_in_seconds()
+    if time_travelled > (max_travel_time + 0.1):
+        errors.append(
+            f"Maximum travel time of request {request.id} not respected; Time travelled: {time_travelled}, Maximum Time: {max_travel_time}")
+    return errors
+
+
+def validate_output(path_2_config: str, request_path: str, network_path: str, output_dir: str):
+    """
+    Validates one output directory of create_output, reads in network and requests again.
+    :param path_2_config: Path to configuration file
+    :param request_path: Path to request file of the instance
+    :param network_path: Path to network file of the instance
+    :param output_dir: directory with bus_*_out.csv and requests_out.csv
+    :return: output directory and list of error messages
+    """
+    config = load_config(path_2_config)
+    run_config = Global.config()
+    network_name = os.path.basename(network_path).split(".")[0]
+    run_config.AVERAGE_KMH, run_config.KM_PER_UNIT = Global.NETWORK_UNITS.get(
+        network_name, (config.get('averageKmH'), config.get('KmPerUnit')))
+
+    buses: List[Bus] = read_bus_network(network_path, run_config.CAPACITY_PER_LINE)
+    network_graph = LineGraph(buses, run_config)
+    requests: Set[Request] = read_requests(request_path, network_graph, run_config)
+    stops: Dict[int, Stop] = {x.id: x for x in network_graph.all_stops} | {x.line.depot.id: x.line.depot for x in buses}
+
+    plans: Dict[Bus, List[PlanStop]] = {}
+    for bus in buses:
+        plan_path = os.path.join(output_dir, f"bus_{bus.id}_out.csv")
+        if os.path.exists(plan_path):
+            plans[bus] = read_bus_plan(plan_path, stops)
+
+    accepted = None
+    if os.path.exists(os.path.join(output_dir, "requests_out.csv")):
+        accepted = read_accepted(os.path.join(output_dir, "requests_out.csv"))
+
+    return output_dir, validate_plan(plans, requests, run_config, accepted)
+
+
+def find_instance(output_dir: str, request_root: str, network_dir: str):
+    """
+    Finds request and network file of an output directory,
+    e.g. <output>/sw-schlee_full/long/L9-20 -> <requests>/sw-schlee_full/long_window/L9-*-20.csv
+    :param output_dir: output directory of one instance
+    :param request_root: directory of request files (per network and window length)
+    :param network_dir: directory of network files
+    :return: path to request file (None if not found) and path to network file
+    """
+    network_name = os.path.normpath(output_dir).split(os.sep)[-3]
+    return find_request_file(output_dir, request_root), os.path.join(network_dir, f"{network_name}.json")
+
+
+def validate_tree(path_2_config: str, output_root: str, request_root: str, network_dir: str, processes: int = None):
+    """
+    Validates all output directories below output_root in parallel and writes validation_out.csv to output_root.
+    :param path_2_config: Path to configuration file
+    :param output_root: root of output tree
+    :param request_root: directory of request files (per network and window length)
+    :param network_dir: directory of network files
+    :param processes: number of worker processes (None for number of cpus)
+    :return: dictionary of output directory to list of error messages
+    """
+    results: Dict[str, List[str]] = {}
+    tasks = []
+    for root, dirs, files in os.walk(output_root):
+        if "requests_out.csv" not in files:
+            continue
+        request_path, network_path = find_instance(root, request_root, network_dir)
+        if request_path is None or not os.path.exists(network_path):
+            results[root] = ["Request or network file of instance not found"]
+        else:
+            tasks.append((path_2_config, request_path, network_path, root))
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(validate_output, *task) for task in tasks]
+        for task, future in zip(tasks, futures):
+            try:
+                output_dir, errors = future.result()
+            except Exception as e:
+                output_dir, errors = task[3], [f"Validation failed: {e}"]
+            results[output_dir] = errors
+
+    csv_out: List[List] = [["output directory", "valid", "number of errors", "first error"]]
+    for output_dir in sorted(results.keys()):
+        errors = results[output_dir]
+        csv_out.append([output_dir, len(errors) == 0, len(errors), errors[0] if len(errors) > 0 else "-"])
+    with open(f"{output_root}/validation_out.csv", mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerows(csv_out)
+
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in [5, 6]:
+        result_dict = validate_tree(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4],
+                                    int(sys.argv[5]) if len(sys.argv) == 6 else None)
+        number_invalid = sum(1 for x in result_dict.values() if len(x) > 0)
+        print(f"Validated {len(result_dict)} plans; {number_invalid} invalid")
+    else:
+        print("Please provide the file path to the config file, output directory, request directory, network directory "
+              "and optionally the number of processes.")
@@ -0,0 +1,175 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: PlotPlans.py
+Description: Optional post-processing stage drawing plans (plan.png) from the saved bus plan files,
+            the route of every bus is drawn with thickness by share of driven distance.
+            matplotlib is only imported when plans are drawn, output directories are drawn in a pool of worker processes.
+            Usage: python scripts/PlotPlans.py <output path> [network directory] [processes]
+"""
+import csv
+import glob
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple
+
+NETWORK_DIR: str = "../input/bus_networks/real_networks"
+PLOT_FILE: str = "plan.png"
+
+
+def read_plot_network(network_path: str):
+    """
+    Reads stops, lines and buses of a network file (without building the network classes).
+    Depots not at a stop get new ids as in IOHandler.read_bus_network.
+    :param network_path: Path to network file
+    :return: dictionary of stop id to coordinates, dictionary of line id to stop ids, dictionary of bus id to line id
+    """
+    with open(network_path, 'r') as network_file:
+        network_dict: dict = json.load(network_file)
+
+    coordinates: Dict[int, Tuple[float, float]] = {x["id"]: tuple(x["coordinates"]) for x in network_dict.get('stops')}
+    depot_dict: Dict[Tuple[float, float], int] = {y: x for x, y in coordinates.items()}
+    max_id = max(coordinates.keys())
+    line_stops: Dict[int, List[int]] = {}
+    for line in network_dict.get('lines'):
+        depot_coord = tuple(line["depot"])
+        if depot_coord not in depot_dict:
+            max_id += 1
+            depot_dict[depot_coord] = max_id
+            coordinates[max_id] = depot_coord
+        line_stops[line["id"]] = line["stops"]
+    bus_lines: Dict[int, int] = {x["id"]: x["line"] for x in network_dict.get('buses')}
+
+    return coordinates, line_stops, bus_lines
+
+
+def read_bus_routes(output_dir: str):
+    """
+    :param output_dir: output directory of an instance
+    :return: dictionary of bus id to list of visited stop ids (from bus_<id>_out.csv)
+    """
+    routes: Dict[int, List[int]] = {}
+    for bus_path in glob.glob(os.path.join(output_dir, "bus_*_out.csv")):
+        bus_id = int(os.path.basename(bus_path).split("_")[1])
+        with open(bus_path, 'r', encoding="utf-8") as bus_file:
+            routes[bus_id] = [int(x[1]) for x in list(csv.reader(bus_file))[1:]]
+    return routes
+
+
+def render_plan(output_dir: str, network_path: str):
+    """
+    Draws the plan of an output directory to plan.png.
+    :param output_dir: output directory of an instance
+    :param network_path: Path to network file of the instance
+    :return: output_dir
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    coordinates, line_stops, bus_lines = read_plot_network(network_path)
+    routes = read_bus_routes(output_dir)
+
+    # count distance driven on each segment -> normalize by overall distance
+    color_set = ['red', 'green', 'blue', 'purple', 'pink', 'brown', 'orange'] * 3
+    color_dict: Dict[int, str] = dict(zip(sorted(line_stops.keys()), color_set))
+    segment_dict: Dict[frozenset, list] = {}
+    dist_overall: float = 0
+    for bus_id in sorted(routes.keys()):
+        stop_ids = routes[bus_id]
+        for i in range(len(stop_ids) - 1):
+            stop_set = frozenset({stop_ids[i], stop_ids[i + 1]})
+            dist = math.dist(coordinates[stop_ids[i]], coordinates[stop_ids[i + 1]])
+            dist_overall += dist
+
+            if len(stop_set) == 2:
+                if stop_set not in segment_dict:
+                    segment_dict[stop_set] = [dist, bus_lines[bus_id]]
+                else:
+                    segment_dict[stop_set][0] += dist
+
+    fig, ax = plt.subplots()
+
+    max_thickness = 10.0
+    for stop_set in sorted(segment_dict.keys(), key=lambda u: segment_dict[u][0], reverse=True):
+        stop_1, stop_2 = stop_set
+        x1, y1 = coordinates[stop_1]
+        x2, y2 = coordinates[stop_2]
+        ax.plot([x1, x2], [y1, y2], color=color_dict[segment_dict[stop_set][1]],
+                lw=max_thickness * (segment_dict[stop_set][0] / dist_overall))
+
+    all_stops = sorted({y for x in line_stops.values() for y in x})
+    ax.plot([coordinates[x][0] for x in all_stops], [coordinates[x][1] for x in all_stops], 'ko')
+
+    fig.savefig(os.path.join(output_dir, PLOT_FILE))
+    plt.close(fig)
+    return output_dir
+
+
+def render_plans(tasks: List[Tuple[str, str]], processes: int = None):
+    """
+    Draws plans in a pool of worker processes.
+    :param tasks: list of output directory and path to network file
+    :param processes: number of worker processes (None for number of cpus)
+    :return: number of drawn plans
+    """
+    count = 0
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(render_plan, *task) for task in tasks]
+        for task, future in zip(tasks, futures):
+            try:
+                future.result()
+                count += 1
+            except Exception as e:
+                print(f"Could not draw plan of {task[0]}: {e}")
+    return count
+
+
+def find_network_path(output_dir: str, network_dir: str):
+    """
+    :return: path to network file of an output directory, by instance id of metrics_out.json
+            or by output layout <network>/<length>/<instance>
+    """
+    metrics_path = os.path.join(output_dir, "metrics_out.json")
+    network_name = os.path.normpath(output_dir).split(os.sep)[-3]
+    if os.path.exists(metrics_path):
+        with open(metrics_path, 'r', encoding="utf-8") as metrics_file:
+            instance_id = json.load(metrics_file).get("instance_id")
+        if instance_id is not None:
+            network_name = instance_id.split("/")[0]
+    return os.path.join(network_dir, f"{network_name}.json")
+
+
+def render_tree(output_root: str, network_dir: str = NETWORK_DIR, processes: int = None, overwrite: bool = False):
+    """
+    Draws plans of all output directories below output_root.
+    :param output_root: root of output tree
+    :param network_dir: directory of network files
+    :param processes: number of worker processes (None for number of cpus)
+    :param overwrite: draw plans again if plan.png exists
+    :return: number of drawn plans
+    """
+    tasks: List[Tuple[str, str]] = []
+    for root, dirs, files in os.walk(output_root):
+        if "requests_out.csv" in files and (overwrite or PLOT_FILE not in files):
+            tasks.append((root, find_network_path(root, network_dir)))
+    return render_plans(tasks, processes)
+
+
+if __name__ == "__main__":
+    if 2 <= len(sys.argv) <= 4:
+        drawn = render_tree(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else NETWORK_DIR,
+                            int(sys.argv[3]) if len(sys.argv) == 4 else None)
+        print(f"Drew {drawn} plans")
+    else:
+        print("Please provide the path to the output tree and optionally the network directory and number of processes.")
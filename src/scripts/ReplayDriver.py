@@ -0,0 +1,112 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: ReplayDriver.py
+Description: Replays a day of bookings on a simulated clock against the planner (replay context),
+            requests come from a request file or from a Poisson process on the network.
+            Reports throughput, acceptance rate and replanning latency per trigger in replay_out.csv.
+            Usage: python scripts/ReplayDriver.py <config file> <network file> <request file | requests per hour> <output path> [seed]
+"""
+import csv
+import os
+import random
+import sys
+import time
+from typing import List, Tuple
+
+from models.Network import Bus
+from scripts.IOHandler import load_config, read_bus_network, solve_instance
+from scripts.RunMetrics import get_percentile
+from utils import Global, Timer
+
+# minutes between booking (arrivalTime) and earliest pick-up (startTime) of generated requests
+LEAD_MINUTES: Tuple[int, int] = (15, 120)
+
+
+def poisson_rows(buses: List[Bus], requests_per_hour: float, seed: int = 0):
+    """
+    Generates rows of a request file, bookings arrive as Poisson process over the service time of the network.
+    Pick-up and drop-off are drawn uniformly from the stops of the lines, every request has one passenger.
+    :param buses: list of buses (with lines)
+    :param requests_per_hour: arrival rate of bookings
+    :param seed: seed of random generator
+    :return: list of rows (id, arrivalTime, startTime, pickUp, dropOff, amount)
+    """
+    rng = random.Random(seed)
+    lines = {x.line for x in buses}
+    stop_ids = sorted({y.id for x in lines for y in x.stops})
+    service_start = min(x.start_time.get_in_seconds() for x in lines)
+    # latest pick-up leaves time for the ride before end of service
+    last_start = max(x.end_time.get_in_seconds() for x in lines) - 7200
+
+    rows: List[List[str]] = []
+    arrival = float(service_start)
+    while True:
+        arrival += rng.expovariate(requests_per_hour / 3600)
+        start = arrival + rng.uniform(LEAD_MINUTES[0], LEAD_MINUTES[1]) * 60
+        if start > last_start:
+            break
+        pick_up, drop_off = rng.sample(stop_ids, 2)
+        rows.append([str(len(rows)), str(Timer.create_time_object(round(arrival))),
+                     str(Timer.create_time_object(round(start))), str(pick_up), str(drop_off), "1"])
+    return rows
+
+
+def replay(path_2_config: str, network_path: str, source: str, output_path: str, seed: int = 0):
+    """
+    Runs the replay context and writes replay_out.csv.
+    :param path_2_config: Path to configuration file
+    :param network_path: Path to network file
+    :param source: path to request file or number of requests per hour (Poisson arrivals)
+    :param output_path: directory of output file
+    :param seed: seed of Poisson arrivals
+    """
+    config = load_config(path_2_config)
+    config['context'] = 'replay'
+    run_config = Global.config()
+    run_config.AVERAGE_KMH = config.get('averageKmH')
+    run_config.KM_PER_UNIT = config.get('KmPerUnit')
+    Global.metrics().COMPUTATION_START_TIME = time.time()
+
+    if source.endswith(".csv"):
+        requests, context = solve_instance(config, source, network_path)
+    else:
+        rows = poisson_rows(read_bus_network(network_path, run_config.CAPACITY_PER_LINE), float(source), seed)
+        requests, context = solve_instance(config, source, network_path, request_rows=rows)
+
+    csv_out: List[List] = [["simulated time", "new requests", "processed requests", "accepted requests",
+                            "acceptance rate", "latency", "lag", "wall time", "throughput"]]
+    for record in context.replay_log:
+        csv_out.append([str(record.sim_time), record.new_requests, record.processed_requests,
+                        record.accepted_requests, round(record.accepted_requests / record.processed_requests, 3),
+                        record.latency, record.lag, record.wall_time,
+                        round(record.processed_requests / record.wall_time, 3) if record.wall_time > 0 else "-"])
+
+    os.makedirs(output_path, exist_ok=True)
+    with open(f"{output_path}/replay_out.csv", mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerows(csv_out)
+
+    if len(context.replay_log) == 0:
+        print("No requests replayed")
+        return
+    latencies = [x.latency for x in context.replay_log]
+    last = context.replay_log[-1]
+    print(f"Replayed {len(requests)} requests in {len(latencies)} triggers and {last.wall_time} seconds; "
+          f"accepted {last.accepted_requests}; latency p50/p90/p99: {get_percentile(latencies, 50)}/"
+          f"{get_percentile(latencies, 90)}/{get_percentile(latencies, 99)}; max lag: {max(x.lag for x in context.replay_log)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in [5, 6]:
+        replay(sys.argv[1], sys.argv[2], sys.argv[3], sys.argv[4], int(sys.argv[5]) if len(sys.argv) == 6 else 0)
+    else:
+        print("Please provide the file path to the config file, network file, request file (or requests per hour), "
+              "output path and optionally a seed.")
@@ -0,0 +1,291 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: ResultIndex.py
+Description: Index of all runs below an output directory (liDARPT runs and DARP result files) as one table,
+            runs are parsed in parallel and kept in results_index.json, only new or changed runs are parsed again.
+            The ResultTable can be filtered, grouped and aggregated by network, window length, number of requests and method.
+            Usage: python scripts/ResultIndex.py <output path> [processes]
+"""
+import csv
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Tuple, Callable, Any
+
+from scripts.RunMetrics import REQUEST_ROOT, record_from_text
+from utils import Global
+
+NETWORK_ROOT: str = "../input/bus_networks/real_networks"
+INDEX_FILE: str = "results_index.json"
+
+# fields of DARP result files and their names in the table
+DARP_FIELDS: Dict[str, str] = {"Number of requests": "number_requests", "Empty KM": "km_empty_total",
+                               "Used Km": "km_used_total", "System efficiency": "system_efficiency",
+                               "Vehicle Utilization": "vehicle_utilization", "Deviation Factor": "deviation_factor",
+                               "CPLEX Gap": "gap_first", "Number Event Nodes": "event_graph_nodes",
+                               "Number Event Arcs": "event_graph_edges", "Processed nodes count": "nodes_first"}
+
+
+class ResultTable:
+    """
+    Column-oriented table of runs, every column is a list with one value per run.
+    """
+
+    def __init__(self, columns: Dict[str, List]):
+        self.columns: Dict[str, List] = columns
+
+    @classmethod
+    def from_rows(cls, rows: List[dict]):
+        """
+        :param rows: list of dictionaries (missing fields become None)
+        :return: ResultTable
+        """
+        keys: List[str] = []
+        for row in rows:
+            keys += [x for x in row.keys() if x not in keys]
+        return cls({x: [y.get(x) for y in rows] for x in keys})
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()), []))
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    def rows(self):
+        """
+        :return: list of rows as dictionaries
+        """
+        return [dict(zip(self.columns.keys(), x)) for x in zip(*self.columns.values())]
+
+    def select(self, indices: List[int]):
+        """
+        :return: table with the runs at indices
+        """
+        return ResultTable({x: [y[i] for i in indices] for x, y in self.columns.items()})
+
+    def where(self, **conditions):
+        """
+        :param conditions: column name to required value, e.g. network="sw-geo_full", window=9
+        :return: table of runs matching all conditions
+        """
+        indices = [i for i in range(len(self)) if all(self.columns[x][i] == y for x, y in conditions.items())]
+        return self.select(indices)
+
+    def filter(self, predicate: Callable[[dict], bool]):
+        """
+        :param predicate: function of a row
+        :return: table of runs with predicate true
+        """
+        return self.select([i for i, x in enumerate(self.rows()) if predicate(x)])
+
+    def group_by(self, *keys: str):
+        """
+        :param keys: names of columns
+        :return: dictionary of key values to table of their runs (sorted by key values)
+        """
+        groups: Dict[Tuple, List[int]] = {}
+        for i, values in enumerate(zip(*(self.columns[x] for x in keys))):
+            groups.setdefault(values, []).append(i)
+        return {x: self.select(groups[x]) for x in sorted(groups.keys(), key=lambda x: tuple(str(y) for y in x))}
+
+    def aggregate(self, keys: List[str], columns: List[str], function: Callable[[List], Any] = None):
+        """
+        Groups by keys and reduces columns of every group (None values are ignored).
+        :param keys: names of columns to group by
+        :param columns: names of columns to aggregate
+        :param function: reduces a list of values, mean by default
+        :return: table with one run per group, columns keys + columns + count
+        """
+        if function is None:
+            function = lambda x: sum(x) / len(x)
+        rows: List[dict] = []
+        for key_values, table in self.group_by(*keys).items():
+            row = dict(zip(keys, key_values)) | {"count": len(table)}
+            for column in columns:
+                values = [x for x in table[column] if x is not None]
+                row[column] = function(values) if len(values) > 0 else None
+            rows.append(row)
+        return ResultTable.from_rows(rows)
+
+    def to_csv(self, path: str):
+        with open(path, mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.columns.keys())
+            writer.writerows(zip(*self.columns.values()))
+
+
+@lru_cache(maxsize=None)
+def network_constants(network_name: str):
+    """
+    :param network_name: name of network file (without .json)
+    :return: number of stops, speed and km per unit of network (read once per worker)
+    """
+    with open(os.path.join(NETWORK_ROOT, f"{network_name}.json"), 'r') as network_file:
+        number_stops = len(json.load(network_file).get("stops"))
+    speed, km_per_unit = Global.NETWORK_UNITS.get(network_name, (None, None))
+    return number_stops, speed, km_per_unit
+
+
+@lru_cache(maxsize=None)
+def request_passengers(network_name: str, window: int, number_requests: int):
+    """
+    :return: list of number of passengers per request id of the request file of the instance, None if not found
+    """
+    number_stops = network_constants(network_name)[0]
+    request_path = os.path.join(REQUEST_ROOT, network_name, Global.WINDOW_FOLDERS.get(window, ""),
+                                f"L{window}-{number_stops}-{number_requests}.csv")
+    if not os.path.exists(request_path):
+        return None
+    with open(request_path, 'r') as request_file:
+        rows = list(csv.reader(request_file))[1:]
+    return [int(x[-1]) for x in rows]
+
+
+def parse_run(path: str, kind: str, output_root: str):
+    """
+    Parses a single run.
+    :param path: output directory of a liDARPT run or DARP result file
+    :param kind: 'liDARPT' or 'DARP'
+    :param output_root: root of output tree
+    :return: row of the table
+    """
+    parts = os.path.relpath(path, output_root).split(os.sep)
+    match = re.match(r"L(\d+)-(\d+)", parts[-1])
+    row = {"method": kind, "run": "/".join(parts[:-3]), "network": parts[-3], "length": parts[-2],
+           "window": int(match.group(1)) if match else None, "output_path": path}
+
+    if kind == "DARP":
+        with open(path, 'r') as result_file:
+            values = dict(x.split(" = ", 1) for x in result_file.read().splitlines() if " = " in x)
+        for key, name in DARP_FIELDS.items():
+            row[name] = float(values[key]) if key in values else None
+        row["number_requests"] = int(row["number_requests"])
+        row["requests_accepted"] = row["number_requests"] - int(values.get("Number rejected requests", 0))
+        row["km_travelled_total"] = round(row["km_empty_total"] + row["km_used_total"], 3)
+        row["seconds_total"] = float(values["EntireModel time (ms)"]) / 1000 if "EntireModel time (ms)" in values else None
+        return row
+
+    metrics_path = os.path.join(path, "metrics_out.json")
+    if os.path.exists(metrics_path):
+        with open(metrics_path, 'r', encoding="utf-8") as metrics_file:
+            record = json.load(metrics_file)
+    else:
+        record = record_from_text(path)
+    row |= {x: y for x, y in record.items() if x not in ("network", "admission_latency_by_batch_size")}
+    timings = [record.get(x) for x in ("seconds_reading", "seconds_building_graph", "seconds_building_model",
+                                       "seconds_solving_first", "seconds_solving_second")]
+    row["seconds_total"] = sum(x for x in timings if x is not None)
+
+    # delay (percent of shortest time) and ride time of accepted requests from requests_out.csv
+    with open(os.path.join(path, "requests_out.csv"), 'r', encoding="utf-8") as request_file:
+        request_rows = list(csv.reader(request_file))[1:]
+    delays: List[float] = []
+    ride_times: Dict[int, float] = {}
+    for request_row in request_rows:
+        if request_row[3] != "-":
+            wait_time, ride_time, short_time = float(request_row[3]), float(request_row[4]), float(request_row[5])
+            delays.append(((wait_time + ride_time) - short_time) * 100 / short_time)
+            ride_times[int(request_row[0])] = ride_time
+    row["average_delay"] = round(sum(delays) / len(delays), 3) if len(delays) > 0 else None
+
+    # share of driving time of buses used by passengers (weighted by number of passengers)
+    row["time_utilization"] = None
+    passengers = request_passengers(row["network"], row["window"], row["number_requests"]) if match else None
+    speed = Global.NETWORK_UNITS.get(row["network"], (None, None))[0]
+    if passengers is not None and speed is not None and record.get("km_travelled_total"):
+        time_travel_total = record["km_travelled_total"] * 60 / speed
+        row["time_utilization"] = round(sum(passengers[x] * y for x, y in ride_times.items()) / time_travel_total, 3)
+    return row
+
+
+def parse_runs(tasks: List[Tuple[str, str, str]]):
+    """
+    Parses a chunk of runs (in a worker process), runs that can not be parsed are skipped.
+    :return: list of (path, row or None)
+    """
+    results = []
+    for path, kind, output_root in tasks:
+        try:
+            results.append((path, parse_run(path, kind, output_root)))
+        except (OSError, ValueError, KeyError, IndexError) as e:
+            print(f"Skipping {path}: {e}")
+            results.append((path, None))
+    return results
+
+
+def find_runs(output_root: str):
+    """
+    :param output_root: root of output tree
+    :return: dictionary of path of every run to its kind and modification time
+    """
+    runs: Dict[str, Tuple[str, float]] = {}
+    for root, dirs, files in os.walk(output_root):
+        if "metrics_out.json" in files or ("overall_out.csv" in files and "requests_out.csv" in files):
+            result_file = "metrics_out.json" if "metrics_out.json" in files else "overall_out.csv"
+            runs[root] = ("liDARPT", os.path.getmtime(os.path.join(root, result_file)))
+        elif "DARP" in os.path.relpath(root, output_root).split(os.sep):
+            for file_name in files:
+                if re.fullmatch(r"L\d+-\d+", file_name):
+                    path = os.path.join(root, file_name)
+                    runs[path] = ("DARP", os.path.getmtime(path))
+    return runs
+
+
+def build_index(output_root: str, processes: int = None, use_cache: bool = True):
+    """
+    Creates table of all runs below output_root. Runs are parsed in parallel,
+    runs unchanged since the last call are taken from results_index.json in output_root.
+    :param output_root: root of output tree
+    :param processes: number of worker processes (None for number of cpus)
+    :param use_cache: read and write results_index.json
+    :return: ResultTable
+    """
+    index_path = os.path.join(output_root, INDEX_FILE)
+    cached: Dict[str, dict] = {}
+    if use_cache and os.path.exists(index_path):
+        with open(index_path, 'r', encoding="utf-8") as index_file:
+            cached = json.load(index_file)
+
+    runs = find_runs(output_root)
+    index: Dict[str, dict] = {x: cached[x] for x, (kind, mtime) in runs.items()
+                              if x in cached and cached[x]["mtime"] == mtime}
+    open_runs = sorted(x for x in runs.keys() if x not in index)
+
+    if len(open_runs) > 0:
+        chunk_size = max(len(open_runs) // (4 * (processes or os.cpu_count() or 1)), 1)
+        chunks = [[(x, runs[x][0], output_root) for x in open_runs[i:i + chunk_size]]
+                  for i in range(0, len(open_runs), chunk_size)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            for results in pool.map(parse_runs, chunks):
+                for path, row in results:
+                    if row is not None:
+                        index[path] = {"mtime": runs[path][1], "row": row}
+
+    if use_cache and len(open_runs) > 0:
+        with open(index_path, mode="w", encoding="utf-8") as index_file:
+            json.dump(index, index_file)
+
+    print(f"Indexed {len(index)} runs, parsed {len(open_runs)}")
+    return ResultTable.from_rows([index[x]["row"] for x in sorted(index.keys())])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) in [2, 3]:
+        table = build_index(sys.argv[1], int(sys.argv[2]) if len(sys.argv) == 3 else None)
+        summary = table.aggregate(["method", "network", "window", "number_requests"],
+                                  ["requests_accepted", "system_efficiency", "km_travelled_total", "seconds_total"])
+        summary.to_csv(os.path.join(sys.argv[1], "results_summary.csv"))
+        print(f"Wrote {len(summary)} groups to results_summary.csv")
+    else:
+        print("Please provide the path to the output tree and optionally the number of processes.")
@@ -0,0 +1,303 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: RunMetrics.py
+Description: Machine-readable metrics record of a run (metrics_out.json) with typed fields:
+            key performance indicators, model sizes, gaps, replanning latencies and phase timings,
+            identified by instance id and hash of the configuration.
+            The overall_out.csv text file is an optional view on the record.
+"""
+import csv
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import List, Dict, Tuple
+
+from utils import Global
+
+# request files per network and window length, e.g. <network>/long_window/L9-28-20.csv
+REQUEST_ROOT: str = "../input/requests/random_requests"
+
+# increased when fields of the record change
+METRICS_VERSION: int = 1
+
+# configuration entries that only select the instance, they do not change the hash
+INSTANCE_KEYS: Tuple[str, ...] = ("pathRequestFile", "pathNetworkFile", "outputPath")
+
+# field of record, label in text view and if field is a duration
+TEXT_VIEW: List[Tuple[str, str, bool]] = [
+    ("km_travelled_total", "km travelled total", False),
+    ("km_empty_total", "empty km total", False),
+    ("km_used_total", "used km total", False),
+    ("system_efficiency", "system efficiency", False),
+    ("network_system_efficiency", "network system efficiency", False),
+    ("deviation_factor", "deviation factor", False),
+    ("vehicle_utilization", "vehicle utilization", False),
+    ("empty_km_share", "empty km share", False),
+    ("requests_accepted", "Number of Requests accepted", False),
+    ("max_occupancy", "Max Occupancy", False),
+    ("average_max_occupancy", "Average Max Occupancy", False),
+    ("gap_first", "Relative MIP Gap Number Requests", False),
+    ("gap_second", "Relative MIP Gap KM travelled", False),
+    ("nodes_first", "Number of Nodes first model", False),
+    ("nodes_second", "Number of Nodes second model", False),
+    ("constraints", "Number of Constraints", False),
+    ("variables", "Number of Variables", False),
+    ("split_requests", "Number of Split Requests", False),
+    ("event_graph_nodes", "Event Graph Nodes", False),
+    ("event_graph_edges", "Event Graph Edges", False),
+    ("replanning_triggers", "Number of Replanning Triggers", False),
+    ("replanning_latency_avg", "Average Replanning Latency", False),
+    ("replanning_latency_max", "Max Replanning Latency", False),
+    ("replanning_latency_p50", "Replanning Latency p50", False),
+    ("replanning_latency_p90", "Replanning Latency p90", False),
+    ("replanning_latency_p99", "Replanning Latency p99", False),
+    ("fallback_plans", "Number of Fallback Plans", False),
+    ("batch_size_avg", "Average Batch Size", False),
+    ("admission_latency_avg", "Average Admission Latency", False),
+    ("admission_latency_by_batch_size", "Average Admission Latency Batch Size", False),
+    ("seconds_reading", "computation time for reading in", True),
+    ("seconds_building_graph", "computation time for building event graph", True),
+    ("seconds_building_model", "computation time for building model", True),
+    ("seconds_solving_first", "computation time for solving first model", True),
+    ("seconds_solving_second", "computation time for solving second model", True)]
+
+# fields left out of the text view if they are None (not applicable for the run)
+OPTIONAL_FIELDS = {"system_efficiency", "network_system_efficiency", "deviation_factor", "vehicle_utilization",
+                   "empty_km_share", "replanning_triggers", "replanning_latency_avg", "replanning_latency_max",
+                   "replanning_latency_p50", "replanning_latency_p90", "replanning_latency_p99", "fallback_plans",
+                   "batch_size_avg", "admission_latency_avg", "admission_latency_by_batch_size"}
+
+
+def config_hash(config: dict):
+    """
+    :param config: dictionary of configuration
+    :return: short hash of all entries of the configuration that do not select the instance
+    """
+    relevant = {x: y for x, y in config.items() if x not in INSTANCE_KEYS}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def get_instance_id(network_name: str, request_path: str):
+    """
+    :param network_name: name of network file (without extension)
+    :param request_path: path to request file
+    :return: id of the instance, e.g. sw-schlee_full/L9-28-20
+    """
+    return f"{network_name}/{os.path.basename(request_path).split('.')[0]}"
+
+
+def find_request_file(output_dir: str, request_root: str = REQUEST_ROOT):
+    """
+    Finds the request file of an output directory,
+    e.g. <output>/sw-schlee_full/long/L9-20 -> <requests>/sw-schlee_full/long_window/L9-*-20.csv
+    :param output_dir: output directory of one instance
+    :param request_root: directory of request files (per network and window length)
+    :return: path to request file, None if not found
+    """
+    parts = os.path.normpath(output_dir).split(os.sep)
+    network_name, length_word, instance_name = parts[-3], parts[-2], parts[-1]
+    name_parts = instance_name.split("-")
+    pattern = os.path.join(request_root, network_name, f"{length_word}_window", f"{name_parts[0]}-*-{name_parts[-1]}.csv")
+    request_files = sorted(glob.glob(pattern))
+    return request_files[0] if len(request_files) > 0 else None
+
+
+def get_percentile(values: List[float], percentile: int):
+    """
+    Nearest-rank percentile of a list of values.
+    :param values: non-empty list of values
+    :param percentile: percentile between 0 and 100
+    :return: value
+    """
+    sorted_values = sorted(values)
+    rank = max(1, -(-percentile * len(sorted_values) // 100))
+    return sorted_values[rank - 1]
+
+
+def collect_run_metrics(metrics: Global.RunMetrics):
+    """
+    :param metrics: metrics of the run, written by the planner and context
+    :return: part of the record from the metrics of the run
+            (model sizes, gaps, replanning latencies, admission latencies and phase timings)
+    """
+    record = {"gap_first": metrics.INTEGRALITY_GAP_FIRST, "gap_second": metrics.INTEGRALITY_GAP_SECOND,
+              "nodes_first": metrics.NUMBER_OF_NODES_FIRST, "nodes_second": metrics.NUMBER_OF_NODES_SECOND,
+              "constraints": metrics.NUMBER_OF_CONSTRAINTS, "variables": metrics.NUMBER_OF_VARIABLES,
+              "split_requests": metrics.NUMBER_OF_SPLITS, "event_graph_nodes": metrics.EVENT_GRAPH_NODES,
+              "event_graph_edges": metrics.EVENT_GRAPH_EDGES}
+
+    latencies = metrics.REPLANNING_LATENCIES
+    multiple = len(latencies) > 1
+    record["replanning_triggers"] = len(latencies) if multiple else None
+    record["replanning_latency_avg"] = round(sum(latencies) / len(latencies), 4) if multiple else None
+    record["replanning_latency_max"] = max(latencies) if multiple else None
+    for percentile in [50, 90, 99]:
+        record[f"replanning_latency_p{percentile}"] = get_percentile(latencies, percentile) if multiple else None
+    record["fallback_plans"] = metrics.FALLBACK_PLANS if multiple else None
+
+    admissions = metrics.ADMISSION_RECORDS
+    record["batch_size_avg"] = None
+    record["admission_latency_avg"] = None
+    record["admission_latency_by_batch_size"] = None
+    if len(admissions) > 0:
+        admission_dict: Dict[int, List[float]] = {}
+        for batch_size, wait_seconds, replanning_seconds in admissions:
+            admission_dict.setdefault(batch_size, []).append(wait_seconds + replanning_seconds)
+        record["batch_size_avg"] = round(sum(x[0] for x in admissions) / len(admissions), 2)
+        record["admission_latency_avg"] = round(sum(sum(x) for x in admission_dict.values()) / len(admissions), 2)
+        record["admission_latency_by_batch_size"] = {str(x): round(sum(y) / len(y), 2)
+                                                     for x, y in sorted(admission_dict.items())}
+
+    record |= {"seconds_reading": metrics.COMPUTATION_TIME_READING,
+               "seconds_building_graph": metrics.COMPUTATION_TIME_BUILDING,
+               "seconds_building_model": metrics.COMPUTATION_TIME_BUILDING_CPLEX,
+               "seconds_solving_first": metrics.COMPUTATION_TIME_SOLVING_FIRST,
+               "seconds_solving_second": metrics.COMPUTATION_TIME_SOLVING_SECOND}
+    return record
+
+
+def create_record(kpis: dict, number_requests: int, metrics: Global.RunMetrics):
+    """
+    :param kpis: key performance indicators of the executed plan
+    :param number_requests: number of requests of the instance
+    :param metrics: metrics of the run (see Global.Run)
+    :return: metrics record of the run
+    """
+    instance_id = metrics.INSTANCE_ID
+    return {"schema_version": METRICS_VERSION, "instance_id": instance_id,
+            "network": None if instance_id is None else instance_id.split("/")[0],
+            "config_hash": metrics.CONFIG_HASH, "number_requests": number_requests} | kpis | collect_run_metrics(metrics)
+
+
+def write_record(record: dict, path_to_output: str, text_metrics: bool = True):
+    """
+    Writes metrics_out.json and, if configured, its text view overall_out.csv.
+    :param record: metrics record of create_record
+    :param path_to_output: output directory of the instance
+    :param text_metrics: also write overall_out.csv (textMetrics of the configuration)
+    """
+    if text_metrics:
+        with open(f"{path_to_output}/overall_out.csv", mode="w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerows([x] for x in text_view(record))
+
+    # written last, marks output of instance as complete
+    with open(f"{path_to_output}/metrics_out.json", mode="w", encoding="utf-8") as file:
+        json.dump(record, file, indent=1)
+
+
+def text_view(record: dict):
+    """
+    :param record: metrics record
+    :return: lines of overall_out.csv
+    """
+    lines: List[str] = []
+    for key, label, is_duration in TEXT_VIEW:
+        value = record.get(key)
+        if value is None and key in OPTIONAL_FIELDS:
+            continue
+        if key == "admission_latency_by_batch_size":
+            lines += [f"{label} {x}: {y}" for x, y in value.items()]
+        elif is_duration:
+            lines.append(f"{label}: {time.strftime('%H:%M:%S', time.gmtime(value))}")
+        else:
+            lines.append(f"{label}: {value}")
+    return lines
+
+
+def parse_value(value: str):
+    """
+    :param value: value of a text view line
+    :return: int, float or None
+    """
+    if value == "None":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+
+def record_from_text(path_to_output: str, request_root: str = REQUEST_ROOT):
+    """
+    Creates a record from the text view of runs without metrics_out.json (older output trees).
+    Network is taken from the folder, e.g. <network>/<length>/L9-20, instance id from its request file
+    (see find_request_file, None if not found) and number of requests from requests_out.csv.
+    :param path_to_output: output directory of the instance
+    :param request_root: directory of request files (per network and window length)
+    :return: metrics record, fields missing in the text view are None
+    """
+    label_dict: Dict[str, Tuple[str, bool]] = {x[1]: (x[0], x[2]) for x in TEXT_VIEW}
+    parts = os.path.normpath(path_to_output).split(os.sep)
+    with open(os.path.join(path_to_output, "requests_out.csv"), 'r', encoding="utf-8") as file:
+        number_requests = sum(1 for _ in file) - 1
+
+    record = dict.fromkeys([x[0] for x in TEXT_VIEW])
+    request_path = find_request_file(path_to_output, request_root)
+    record |= {"schema_version": 0, "network": parts[-3],
+               "instance_id": None if request_path is None else get_instance_id(parts[-3], request_path),
+               "config_hash": None, "number_requests": number_requests}
+    with open(os.path.join(path_to_output, "overall_out.csv"), 'r', encoding="utf-8") as file:
+        for line in file.read().splitlines():
+            label, value = line.rsplit(": ", 1)
+            if label.startswith("Average Admission Latency Batch Size "):
+                record["admission_latency_by_batch_size"] = (record["admission_latency_by_batch_size"] or {}) | {
+                    label.split(" ")[-1]: parse_value(value)}
+            elif label in label_dict:
+                key, is_duration = label_dict[label]
+                if is_duration:
+                    hours, minutes, seconds = value.split(":")
+                    record[key] = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+                else:
+                    record[key] = parse_value(value)
+    return record
+
+
+def load_records(root_path: str):
+    """
+    Reads all metrics records below root_path in one pass (text view for runs without metrics_out.json).
+    :param root_path: root of output tree
+    :return: dictionary of field to list of values (one entry per run, None if a run has no such field)
+    """
+    records: List[dict] = []
+    for root, dirs, files in os.walk(root_path):
+        if "metrics_out.json" in files:
+            with open(os.path.join(root, "metrics_out.json"), 'r', encoding="utf-8") as file:
+                records.append(json.load(file) | {"output_path": root})
+        elif "overall_out.csv" in files and "requests_out.csv" in files:
+            records.append(record_from_text(root) | {"output_path": root})
+
+    columns: Dict[str, List] = {}
+    for index, record in enumerate(records):
+        for key, value in record.items():
+            if key not in columns:
+                columns[key] = [None] * index
+            columns[key].append(value)
+        for key in columns.keys() - record.keys():
+            columns[key].append(None)
+    return columns
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 2:
+        # writes metrics_out.json for runs of an output tree that only have the text view
+        count = 0
+        for folder, sub_folders, file_names in os.walk(sys.argv[1]):
+            if "metrics_out.json" not in file_names and "overall_out.csv" in file_names and "requests_out.csv" in file_names:
+                with open(os.path.join(folder, "metrics_out.json"), mode="w", encoding="utf-8") as out_file:
+                    json.dump(record_from_text(folder), out_file, indent=1)
+                count += 1
+        print(f"Converted {count} runs")
+    else:
+        print("Please provide the path to the output tree.")
@@ -0,0 +1,117 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: SolverTuning.py
+Description: Tuning harness for solver parameters.
+            Sweeps a grid of parameter settings over a benchmark set of instances,
+            reports time-to-optimal and final gap per setting.
+            Usage: python scripts/SolverTuning.py <config file> <tuning file>
+"""
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+from typing import List, Dict, Any
+
+from scripts.IOHandler import load_config, solve_instance
+from utils import Global
+
+
+def build_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    Builds all combinations of the given parameter values.
+    :param grid: dictionary of parameter name to list of values
+    :return: list of parameter settings
+    """
+    keys = sorted(grid.keys())
+    return [dict(zip(keys, values)) for values in itertools.product(*[grid[k] for k in keys])]
+
+
+def run_setting(path_2_config: str, instance: dict, setting: Dict[str, Any]):
+    """
+    Solves a single benchmark instance with the given parameter setting.
+    :param path_2_config: Path to configuration file
+    :param instance: benchmark entry with paths to request/network file and speed/unit distance
+    :param setting: solver parameters to override
+    :return: solution status, solve time, time-to-optimal (None if not optimal) and final gap
+    """
+    # metrics of the previous setting are not carried over
+    Global.new_run()
+    config = load_config(path_2_config)
+    run_config, metrics = Global.config(), Global.metrics()
+    run_config.AVERAGE_KMH = instance.get('averageKmH', config.get('averageKmH'))
+    run_config.KM_PER_UNIT = instance.get('KmPerUnit', config.get('KmPerUnit'))
+    metrics.COMPUTATION_START_TIME = time.time()
+
+    try:
+        solve_instance(config, instance['pathRequestFile'], instance['pathNetworkFile'], setting)
+    except Exception as e:
+        print(f"Run failed for {instance['pathRequestFile']} with {setting}: {e}")
+        return "error", None, None, None
+
+    status = metrics.SOLUTION_STATUS_FIRST
+    solve_time = metrics.COMPUTATION_TIME_SOLVING_FIRST
+    time_to_opt = solve_time if "optimal" in status else None
+
+    return status, solve_time, time_to_opt, metrics.INTEGRALITY_GAP_FIRST
+
+
+def tune(path_2_config: str, path_2_tuning: str):
+    """
+    Runs all settings of the grid on all benchmark instances and writes the reports.
+    :param path_2_config: Path to configuration file
+    :param path_2_tuning: Path to tuning file with 'benchmark', 'grid' and 'outputPath'
+    """
+    with open(path_2_tuning, 'r') as tuning_file:
+        tuning: dict = json.load(tuning_file)
+
+    settings = build_grid(tuning.get('grid', {}))
+    benchmark: List[dict] = tuning.get('benchmark')
+    output_path: str = tuning.get('outputPath')
+    os.makedirs(output_path, exist_ok=True)
+
+    csv_out_runs: List[List] = [["setting", "parameters", "instance", "status", "solve time", "time to optimal",
+                                 "final gap"]]
+    csv_out_summary: List[List] = [["setting", "parameters", "number optimal", "number runs",
+                                    "average time to optimal", "average final gap"]]
+
+    for idx, setting in enumerate(settings):
+        times_opt = []
+        gaps = []
+        for instance in benchmark:
+            status, solve_time, time_to_opt, gap = run_setting(path_2_config, instance, setting)
+            csv_out_runs.append([idx, json.dumps(setting), instance['pathRequestFile'], status, solve_time,
+                                 "-" if time_to_opt is None else time_to_opt, "-" if gap is None else gap])
+            if time_to_opt is not None:
+                times_opt.append(time_to_opt)
+            if gap is not None:
+                gaps.append(gap)
+
+        csv_out_summary.append([idx, json.dumps(setting), len(times_opt), len(benchmark),
+                                round(sum(times_opt) / len(times_opt), 4) if len(times_opt) > 0 else "-",
+                                round(sum(gaps) / len(gaps), 4) if len(gaps) > 0 else "-"])
+        print(f"Finished setting {idx + 1} of {len(settings)}: {setting}")
+
+    with open(f"{output_path}/tuning_runs.csv", mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerows(csv_out_runs)
+
+    with open(f"{output_path}/tuning_summary.csv", mode="w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerows(csv_out_summary)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3:
+        tune(sys.argv[1], sys.argv[2])
+    else:
+        print("Please provide the file path to the config file and the tuning file.")
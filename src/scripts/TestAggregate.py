@@ -10,6 +10,8 @@ import re
 from matplotlib import pyplot as plt
 
 from models.Network import Stop
+from scripts.ResultIndex import build_index
+from scripts.RunMetrics import record_from_text
 from utils import Timer
 from utils.Timer import TimeImpl
 
@@ -161,28 +163,18 @@ def get_time_window_length(bus_files: List[str], parent_folder: Path):
 
         return duration
 
-def requests_to_efficiency(parent_folder: Path, val_dict: dict, overall_lines: List[str], req_lines: List[str],
+def requests_to_efficiency(parent_folder: Path, val_dict: dict, metrics: dict, req_lines: List[str],
                           bus_names: List[str], limit: int):
-    network_name = str(parent_folder).split("/")[-3]
+    network_name = metrics["network"]
     time_span = float(parent_folder.name[1])
-    number_req = len(req_lines) - 1
+    number_req = metrics["number_requests"]
     '''
-    empty_line = [x for x in overall_lines if "empty km total:" in x]
-    empty_km = float(empty_line[0].split(" ")[-1])
-    total_line = [x for x in overall_lines if "km travelled total:" in x]
-    total_km = float(total_line[0].split(" ")[-1])
-    share = empty_km / total_km
+    share = metrics["km_empty_total"] / metrics["km_travelled_total"]
     '''
-    interesting_lines = [x for x in overall_lines if "computation time" in x]
-    comp_time = 0
-    for t in interesting_lines[3:]:
-        comp_time += Timer.conv_string_2_time(t.split(" ")[-1]).get_in_seconds()
-
-    some_line = [x for x in overall_lines if "Event Graph Edges" in x]
-    edges = int(get_val(some_line))
+    comp_time = metrics["seconds_solving_first"] + metrics["seconds_solving_second"]
 
-    some_line2 = [x for x in overall_lines if "Event Graph Nodes" in x]
-    nodes = int(get_val(some_line2))
+    edges = metrics["event_graph_edges"]
+    nodes = metrics["event_graph_nodes"]
 
     if limit >= number_req:
         add_to_dict(network_name, number_req, time_span, True, (nodes, edges, comp_time), val_dict)
@@ -241,22 +233,26 @@ def rec_check_folder(folder: Path, val_dict: Dict[str, Dict[int, List[float]]],
             files.append(item.name)
 
     bus_files = [x for x in files if re.match("bus_.*", x)]
-    overall_file = [x for x in files if x == "overall_out.csv"]
+    metrics_file = [x for x in files if x == "metrics_out.json"]
     request_file = [x for x in files if x == "requests_out.csv"]
 
-    if len(overall_file) > 0:
-        o_file = folder / overall_file[0]
-        o_f = o_file.open("r", encoding="utf-8")
-        o_lines = o_f.readlines()
-        o_f.close()
+    metrics = None
+    if len(metrics_file) > 0:
+        m_file = folder / metrics_file[0]
+        with m_file.open("r", encoding="utf-8") as m_f:
+            metrics = json.load(m_f)
+    elif "overall_out.csv" in files and len(request_file) > 0:
+        # older runs only have the text view
+        metrics = record_from_text(str(folder))
 
+    if metrics is not None:
         r_file = folder / request_file[0]
         r_f = r_file.open("r", encoding="utf-8")
         r_lines = r_f.readlines()
         r_f.close()
         print(folder)
         if duration is None or int(folder.name[1]) == duration:
-           requests_to_efficiency(folder, val_dict, o_lines, r_lines, bus_files, limit)
+           requests_to_efficiency(folder, val_dict, metrics, r_lines, bus_files, limit)
 
 def rec_check_folder_DARP(parent_folder, val_dict, duration):
     files = list()
@@ -277,11 +273,11 @@ def rec_check_folder_DARP(parent_folder, val_dict, duration):
 
 # method receives path to folder root -> searches all subdirectories, looking for overall/request file -> extracts some value and makes plots
 def aggregate_tests(folder_path: str, figure,  limit: int, duration: int=None):
-    root_folder = Path(folder_path)
-    val_dict = {}
-
-    rec_check_folder(root_folder, val_dict, duration, limit)
-    #rec_check_folder_DARP(root_folder, val_dict, duration)
+    # index of all runs, parsed in parallel and cached in results_index.json
+    table = build_index(folder_path).where(method="liDARPT")
+    if duration is not None:
+        table = table.where(window=duration)
+    table = table.filter(lambda x: x["number_requests"] <= limit)
     count = 0
     sum_all = 0
 
@@ -291,15 +287,11 @@ def aggregate_tests(folder_path: str, figure,  limit: int, duration: int=None):
     x = list()
     y = list()
     z = list()
-    n_list = sorted(list(val_dict.keys()))
-    for key in n_list:
-        key_list = sorted(list(val_dict[key].keys()), key=lambda x: x[0])
-        for val in key_list:
-            #if val_dict[key][val][0] > sumAll:
-            #    sumAll = val_dict[key][val][0]
-            x.append(val_dict[key][val][True][0][0])
-            y.append(val_dict[key][val][True][0][1])
-            z.append(val_dict[key][val][True][0][2])
+    # first run of every instance
+    for key, group in table.group_by("network", "number_requests", "window").items():
+        x.append(group["event_graph_nodes"][0])
+        y.append(group["event_graph_edges"][0])
+        z.append(group["seconds_solving_first"][0] + group["seconds_solving_second"][0])
     sc = ax.scatter(x, y, c=z, cmap='viridis')
     cbar = fig.colorbar(sc, ax=ax)
     cbar.set_label('seconds')
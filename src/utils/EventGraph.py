@@ -13,9 +13,10 @@ Description: Modelling class of Events and EventGraph
 """
 from typing import List, Set, Tuple, Dict
 
-from models.Network import Stop, Line
-from utils import Global, Timer, RequestPreprocessing
+from models.Network import Stop, Line, Bus
+from utils import Global, Timer, RequestPreprocessing, Instrumentation
 from models.Demand import SplitRequest
+from utils.Global import RunConfig
 from utils.Timer import TimeImpl
 
 
@@ -23,8 +24,6 @@ class Event:
     """
     Abstract basic event class, formed over a split action and set of other splits in the vehicle.
     """
-    id_counter: int = 0
-
     def __init__(self, first: SplitRequest = None, remaining: Set[SplitRequest] = None):
         if remaining is None:
             remaining = set()
@@ -34,8 +33,7 @@ class Event:
         self.earl_depart: TimeImpl | None = None
         self.lat_depart: TimeImpl  | None = None
         self.location: Stop | None = None
-        self.id: int = Event.id_counter
-        Event.id_counter += 1
+        self.id: int = Global.current_run().next_event_id()
 
     def set_before_event(self):
         pass
@@ -113,13 +111,59 @@ class DropOffEvent(Event):
         return f"({self.first.id},{self.remaining_id},{self.location.id},{self.first.line.id})-"
 
 
+class StartEvent(Event):
+    """
+    Event for a bus already on its tour (dynamic context), marking its current location and the time it is available,
+    together with the splits currently in the vehicle.
+    """
+    def __init__(self, bus: Bus, location: Stop, avail_time: TimeImpl, onboard: Set[SplitRequest]):
+        super().__init__(None, onboard)
+        self.bus: Bus = bus
+        self.line: Line = bus.line
+        self.location: Stop = location
+        self.earl_depart: TimeImpl = avail_time
+        self.lat_depart: TimeImpl = avail_time
+
+    def set_before_event(self):
+        return None
+
+    def set_after_event(self):
+        return frozenset(self.remaining_split_id)
+
+    def __repr__(self):
+        return f"StartEvent(bus:{self.bus.id}; others:{self.remaining_id}; location:{self.location.id}; line:{self.line.id})"
+
+    def __str__(self):
+        return f"(-,{self.remaining_id},{self.location.id},{self.line.id})*"
+
+
+def get_event_line(event: Event):
+    if isinstance(event, (IdleEvent, StartEvent)):
+        return event.line
+    return event.first.line
+
+
 class EventGraph:
     """
     Nodes are the Events, with directed edges between possibly subsequent events.
     """
-    def __init__(self):
+    def __init__(self, config: RunConfig):
         self.request_dict: Dict[SplitRequest, Tuple[Set[Event], Set[Event]]] = {}
         self.edge_dict: Dict[Event, Tuple[List[Event], List[Event]]] = {}
+        self.time_bounds: Dict[Event, Tuple[int, int]] = {}  # propagated time windows in seconds
+        self.pruned_edges: List[Tuple[Event, Event]] = []
+        # dynamic context: current positions of buses, known times of executed actions and current time (in seconds)
+        self.start_events: Dict[Bus, StartEvent] = {}
+        self.fixed_times: Dict[Tuple[SplitRequest, bool], int] = {}
+        self.time_now: int | None = None
+        # kept between dynamic replanning triggers: idle events and events by set of splits before/after per line
+        self.idle_events: Dict[Line, IdleEvent] = {}
+        self.key_index: Dict[Line, Tuple[Dict[frozenset, Set[Event]], Dict[frozenset, Set[Event]]]] = {}
+        # configuration of the run, read once for the hot loops below
+        self.transfer_seconds: int = config.TRANSFER_SECONDS
+        self.km_per_unit: float = config.KM_PER_UNIT
+        self.average_kmh: float = config.AVERAGE_KMH
+        self.durations: Dict[Tuple[Stop, Stop], int] = {}
 
     def data_in_string(self):
         nodes = len(self.edge_dict.keys())
@@ -127,6 +171,15 @@ class EventGraph:
 
         return f"Number of split_requests: {split_requests}; Number of nodes: {nodes}; Number of edges: {self.get_number_of_edges()}."
 
+    def travel(self, stop_a: Stop, stop_b: Stop):
+        """
+        :return: travel time between the stops in seconds (computed once per pair)
+        """
+        duration = self.durations.get((stop_a, stop_b))
+        if duration is None:
+            duration = self.durations[(stop_a, stop_b)] = Timer.calc_time(stop_a.calc_distance(stop_b, self.km_per_unit), self.average_kmh)
+        return duration
+
     def get_edges_in(self, event: Event):
         return self.edge_dict[event][0]
 
@@ -138,16 +191,27 @@ class EventGraph:
         """
         Checks if all events have a path to and from idle event.
         """
+        if len(self.find_unconnected(idle_event)) > 0:
+            raise ValueError("There are events in EventGraph not connected to idle event")
+
+    def find_unconnected(self, idle_event: IdleEvent):
+        """
+        :return: events of the line of idle event without a path from idle event (or a start event) or to idle event
+        """
         look_up_dict: Dict[Event, List[bool]] = {x: [False, False] for x in self.edge_dict.keys()
-                                                 if not isinstance(x, IdleEvent) and x.first.line == idle_event.line}
+                                                 if not isinstance(x, IdleEvent) and get_event_line(x) == idle_event.line}
         look_up_dict |= {idle_event: [True, True]}
+        # buses already on their tour start at their start events instead of the idle event
+        start_events = {x for x in self.start_events.values() if x.line == idle_event.line}
+        for start_event in start_events:
+            look_up_dict[start_event][1] = True
 
         # do breadth-search for incoming and outgoing edges, respectively
         # conjunct per idle_event -> delete all others
-        found_sets: Tuple[Set[Event], Set[Event]] = ({idle_event}, {idle_event})
+        found_sets: Tuple[Set[Event], Set[Event]] = ({idle_event}, {idle_event} | start_events)
 
         for i in {0, 1}:
-            last_found: Set[Event] = {idle_event}
+            last_found: Set[Event] = set(found_sets[i])
             while len(last_found) > 0:
                 new_found = set()
                 for event in last_found:
@@ -160,56 +224,215 @@ class EventGraph:
 
         overall_found = found_sets[0] & found_sets[1]
 
-        unconnected_events = set(look_up_dict.keys()) - overall_found
-        if len(unconnected_events) > 0:
-            raise ValueError("There are events in EventGraph not connected to idle event")
+        return set(look_up_dict.keys()) - overall_found
 
 
+    @Instrumentation.traced("add_events")
     def add_events(self, event_set_line: Set[Event]):
         """
-        Adds events to the graph and connects them accordingly.
+        Adds events to the graph and connects them accordingly, also to the events of the line already in the graph.
         :param event_set_line: set of events that can occur on a specific line, to be added to event graph
         """
+        if len(event_set_line) == 0:
+            return
+        line = get_event_line(next(iter(event_set_line)))
+        index_before, index_after = self.key_index.setdefault(line, ({}, {}))
+
         self.edge_dict |= {x: ([], []) for x in event_set_line}
-        split_requests = {x.first for x in event_set_line if not isinstance(x, IdleEvent)}
+        split_requests = {x.first for x in event_set_line if x.first is not None and x.first not in self.request_dict}
         self.request_dict |= {x: (set(), set()) for x in split_requests}
 
-        hash_dict: Dict[int, Set[Tuple[bool, Event]]] = {}
-
         for event in event_set_line:
             if isinstance(event, PickUpEvent):
                 self.request_dict[event.first][0].add(event)
             elif isinstance(event, DropOffEvent):
                 self.request_dict[event.first][1].add(event)
+            elif isinstance(event, StartEvent):
+                self.start_events[event.bus] = event
+            else:
+                self.idle_events[event.line] = event
+
+            # start events have no predecessor
+            if not isinstance(event, StartEvent):
+                index_before.setdefault(event.set_before_event(), set()).add(event)
+            index_after.setdefault(event.set_after_event(), set()).add(event)
+
+        # edges between events with the same passengers after and before, from new events and to new events
+        for event_before in event_set_line:
+            for event_after in index_before.get(event_before.set_after_event(), set()):
+                self.connect_events(event_before, event_after)
+        for event_after in event_set_line:
+            if isinstance(event_after, StartEvent):
+                continue
+            for event_before in index_after.get(event_after.set_before_event(), set()):
+                if event_before not in event_set_line:
+                    self.connect_events(event_before, event_after)
+
+    def connect_events(self, event_before: Event, event_after: Event):
+        """
+        Adds edge between two events, if the second can be reached in time.
+        """
+        duration = self.travel(event_before.location, event_after.location)
+        # the bus already departs from a start event at its time
+        service_time = self.transfer_seconds * int(bool(duration) and not isinstance(event_before, StartEvent))
+        if (event_before is not event_after) and event_before.earl_depart.add_seconds(
+                duration + service_time) <= event_after.lat_depart:
+            self.edge_dict[event_after][0].append(event_before)
+            self.edge_dict[event_before][1].append(event_after)
+
+    def remove_events(self, event_set: Set[Event]):
+        """
+        Removes events together with their edges from the graph (dynamic context).
+        Split requests without any event left are removed as well.
+        :param event_set: set of events in the graph
+        """
+        for event in event_set:
+            for event_before in self.edge_dict[event][0]:
+                if event_before not in event_set:
+                    self.edge_dict[event_before][1].remove(event)
+            for event_after in self.edge_dict[event][1]:
+                if event_after not in event_set:
+                    self.edge_dict[event_after][0].remove(event)
+            del self.edge_dict[event]
+
+            index_before, index_after = self.key_index[get_event_line(event)]
+            if not isinstance(event, StartEvent):
+                index_before[event.set_before_event()].discard(event)
+            index_after[event.set_after_event()].discard(event)
+
+            if isinstance(event, (PickUpEvent, DropOffEvent)):
+                self.request_dict[event.first][int(isinstance(event, DropOffEvent))].discard(event)
+                if len(self.request_dict[event.first][0]) == 0 and len(self.request_dict[event.first][1]) == 0:
+                    del self.request_dict[event.first]
+            elif isinstance(event, StartEvent) and self.start_events.get(event.bus) is event:
+                del self.start_events[event.bus]
+
+    def restore_pruned_edges(self):
+        """
+        Adds the edges removed by the last propagation again (if both events are still in the graph).
+        """
+        for event_before, event_after in self.pruned_edges:
+            if event_before in self.edge_dict and event_after in self.edge_dict:
+                self.edge_dict[event_after][0].append(event_before)
+                self.edge_dict[event_before][1].append(event_after)
+        self.pruned_edges = []
 
-            key_before: int = hash(event.set_before_event())
-            key_after: int = hash(event.set_after_event())
+    def propagate_time_windows(self):
+        """
+        Tightens the time windows of the events by propagating them along the edges,
+        earliest times forward and latest times backward. Edges that can not be used afterwards are removed.
+        Original windows of the events are kept, propagated windows are stored in time_bounds (in seconds).
+        Every intermediate value is a valid bound, so the number of updates is capped for cyclic graphs.
+        Edges removed by an earlier propagation are restored first, as added events can widen the windows.
+        """
+        self.restore_pruned_edges()
 
-            # hash function does not have collisions
-            if key_before in hash_dict:
-                hash_dict[key_before].add((True, event))
-            else:
-                hash_dict[key_before] = {(True, event)}
+        travel = self.travel
+        transfer_seconds = self.transfer_seconds
 
-            if key_after in hash_dict:
-                hash_dict[key_after].add((False, event))
+        earl: Dict[Event, int] = {}
+        lat: Dict[Event, int] = {}
+        for event in self.edge_dict.keys():
+            if isinstance(event, (IdleEvent, StartEvent)):
+                continue
+            # event windows can not exceed the windows of their split request
+            if isinstance(event, PickUpEvent):
+                earl[event] = max(event.earl_depart, event.first.earl_start_time).get_in_seconds()
+                lat[event] = min(event.lat_depart, event.first.latest_start_time).get_in_seconds()
             else:
-                hash_dict[key_after] = {(False, event)}
-
-        for key in hash_dict:
-            same_pass_events_succ: Set[Event] = {x[1] for x in hash_dict[key] if x[0]}
-            same_pass_events_pred: Set[Event] = {x[1] for x in hash_dict[key] if not x[0]}
-
-            for event_before in same_pass_events_pred:
-                for event_after in same_pass_events_succ:
-                    duration = Timer.calc_time(event_before.location.calc_distance(event_after.location))
-                    service_time = Global.TRANSFER_SECONDS * int(bool(duration))
-                    #if event_before.first is not None and event_before.first.id == 2 and event_after.first is not None and event_after.first.id == 2:
-                    #    print("hi")
-                    if (event_before is not event_after) and event_before.earl_depart.add_seconds(
-                            duration + service_time) <= event_after.lat_depart:
-                        self.edge_dict[event_after][0].append(event_before)
-                        self.edge_dict[event_before][1].append(event_after)
+                earl[event] = max(event.earl_depart, event.first.earl_arr_time).get_in_seconds()
+                lat[event] = min(event.lat_depart, event.first.latest_arr_time).get_in_seconds()
+            # in a dynamic context no action can take place in the past
+            if self.time_now is not None:
+                earl[event] = max(earl[event], self.time_now)
+
+        max_updates = 10 * (self.get_number_of_edges() + len(earl))
+
+        # forward: earliest time is at least the earliest arrival from any possible predecessor
+        queue: List[Event] = list(earl.keys())
+        in_queue: Set[Event] = set(queue)
+        updates = 0
+        while len(queue) > 0 and updates < max_updates:
+            event = queue.pop()
+            in_queue.remove(event)
+            candidates = []
+            for pred in self.edge_dict[event][0]:
+                if isinstance(pred, IdleEvent):
+                    candidates.append(pred.line.start_time.get_in_seconds() + travel(pred.location, event.location))
+                elif isinstance(pred, StartEvent):
+                    candidates.append(pred.earl_depart.get_in_seconds() + travel(pred.location, event.location))
+                elif earl[pred] <= lat[pred]:
+                    duration = travel(pred.location, event.location)
+                    candidates.append(earl[pred] + duration + transfer_seconds * int(bool(duration)))
+            if len(candidates) > 0 and min(candidates) > earl[event]:
+                earl[event] = min(candidates)
+                updates += 1
+                for suc in self.edge_dict[event][1]:
+                    if suc in earl and suc not in in_queue:
+                        queue.append(suc)
+                        in_queue.add(suc)
+
+        # backward: latest time is at most the latest departure to reach any possible successor
+        queue = list(lat.keys())
+        in_queue = set(queue)
+        updates = 0
+        while len(queue) > 0 and updates < max_updates:
+            event = queue.pop()
+            in_queue.remove(event)
+            candidates = []
+            for suc in self.edge_dict[event][1]:
+                duration = travel(event.location, suc.location)
+                if isinstance(suc, IdleEvent):
+                    candidates.append(suc.line.end_time.get_in_seconds() - duration - transfer_seconds)
+                elif earl[suc] <= lat[suc]:
+                    candidates.append(lat[suc] - duration - transfer_seconds * int(bool(duration)))
+            if len(candidates) > 0 and max(candidates) < lat[event]:
+                lat[event] = max(candidates)
+                updates += 1
+                for pred in self.edge_dict[event][0]:
+                    if pred in lat and pred not in in_queue:
+                        queue.append(pred)
+                        in_queue.add(pred)
+
+        self.time_bounds = {x: (earl[x], lat[x]) for x in earl.keys()}
+
+        # remove edges that are infeasible with tightened windows
+        for event_before in self.edge_dict.keys():
+            for event_after in self.edge_dict[event_before][1].copy():
+                duration = travel(event_before.location, event_after.location)
+                if isinstance(event_after, IdleEvent) and isinstance(event_before, StartEvent):
+                    # bus can always return to depot
+                    feasible = True
+                elif isinstance(event_before, (IdleEvent, StartEvent)):
+                    if isinstance(event_before, IdleEvent):
+                        start_time = event_before.line.start_time.get_in_seconds() + duration
+                    else:
+                        start_time = event_before.earl_depart.get_in_seconds() + duration
+                    feasible = earl[event_after] <= lat[event_after] and start_time <= lat[event_after]
+                elif isinstance(event_after, IdleEvent):
+                    end_time = event_after.line.end_time.get_in_seconds() - duration - transfer_seconds
+                    feasible = earl[event_before] <= min(lat[event_before], end_time)
+                else:
+                    feasible = earl[event_before] <= lat[event_before] and earl[event_after] <= lat[event_after] \
+                               and earl[event_before] + duration + transfer_seconds * int(bool(duration)) <= lat[event_after]
+
+                if not feasible:
+                    self.edge_dict[event_before][1].remove(event_after)
+                    self.edge_dict[event_after][0].remove(event_before)
+                    self.pruned_edges.append((event_before, event_after))
+
+    def get_split_bounds(self, split_req: SplitRequest, pick_up: bool):
+        """
+        Hull of the propagated windows of all feasible events of a split request action.
+        :param split_req: SplitRequest
+        :param pick_up: True for pick-up events, False for drop-off events
+        :return: earliest and latest time in seconds, None if no feasible event exists
+        """
+        bounds = [self.time_bounds[x] for x in self.request_dict[split_req][int(not pick_up)]
+                  if x in self.time_bounds and self.time_bounds[x][0] <= self.time_bounds[x][1]]
+        if len(bounds) == 0:
+            return None
+        return min(x[0] for x in bounds), max(x[1] for x in bounds)
 
     def get_number_of_edges(self):
         """
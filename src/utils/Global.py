@@ -10,29 +10,176 @@ License: https://creativecommons.org/licenses/by-nc-sa/4.0/
 
 File: Global.py
 Description: Constant variables shared across different files.
+            Configuration and metrics belong to a run (RunConfig, RunMetrics), every thread or context has its own
+            current run, so instances can be solved side by side in thread or process pools.
+            Planner, solver, executor and context hold their run, helpers get the configuration values as parameters.
 """
-AVERAGE_KMH: int
-TRANSFER_SECONDS: int
-NUMBER_OF_EXTRA_TRANSFERS: int
-TIME_WINDOW_SECONDS: int
+import contextvars
+import functools
+import itertools
+from contextlib import contextmanager
+
 INFINITE_INT: int = 10**18
-KM_PER_UNIT: int
-COST_PER_KM: int
-CO2_PER_KM: int
-CAPACITY_PER_LINE: int
-MAX_DELAY_EQUATION: str
-COMPUTATION_START_TIME: float
-COMPUTATION_TIME_READING: float
-COMPUTATION_TIME_BUILDING: float
-COMPUTATION_TIME_SOLVING_FIRST: float
-COMPUTATION_TIME_SOLVING_SECOND: float
-COMPUTATION_TIME_BUILDING_CPLEX: float
-EVENT_GRAPH_NODES: int
-EVENT_GRAPH_EDGES: int
-NUMBER_OF_SPLITS: int
-INTEGRALITY_GAP_FIRST: int
-INTEGRALITY_GAP_SECOND: int = 0
-NUMBER_OF_VARIABLES: int
-NUMBER_OF_CONSTRAINTS: int
-MAX_OCCUPANCY: int
-AVG_MAX_OCCUPANCY: int
+# speed and km per unit of the benchmark networks (as in TestLoop), config values are used for other networks
+NETWORK_UNITS: dict = {"markt-karl": (65.0, 2.0), "markt-karl-lohr": (65.0, 2.0), "sw-geo_2": (70.0, 3.0),
+                       "sw-geo_full": (70.0, 3.0), "sw-schlee_2": (65.0, 1.5), "sw-schlee_3": (65.0, 1.5),
+                       "sw-schlee_full": (65.0, 1.5)}
+# window length (hours) of request file to its folder (naming scheme of the shipped instances)
+WINDOW_FOLDERS: dict = {3: "short_window", 6: "medium_window", 9: "long_window"}
+
+
+class RunConfig:
+    """
+    Configuration of a run, set from the configuration file (see IOHandler.load_config).
+    """
+    AVERAGE_KMH: int
+    KM_PER_UNIT: int
+    TRANSFER_SECONDS: int
+    NUMBER_OF_EXTRA_TRANSFERS: int
+    TIME_WINDOW_SECONDS: int
+    HORIZON_WINDOW_SECONDS: int = 3600
+    HORIZON_OVERLAP_SECONDS: int = 900
+    REPLANNING_BUDGET_SECONDS: float | None = None
+    INSTANCE_DEADLINE: float | None = None  # wall-clock time (time.time()) the instance has to be solved by
+    REPLAY_CADENCE_SECONDS: int = 300
+    REPLAY_SPEEDUP: float | None = None
+    BATCH_WINDOW_SECONDS: int = 0
+    BATCH_MAX_SIZE: int | None = None
+    TEXT_METRICS: bool = True
+    PLOT_PLANS: bool = False
+    COST_PER_KM: int
+    CO2_PER_KM: int
+    CAPACITY_PER_LINE: int
+    MAX_DELAY_EQUATION: str
+    SOLVER_PARAMETERS: dict | None = None
+    CPLEX_PATH: str | None = None
+
+
+class RunMetrics:
+    """
+    Metrics collected during a run, written to the output (see RunMetrics.create_record).
+    """
+    INSTANCE_ID: str | None = None
+    CONFIG_HASH: str | None = None
+    COMPUTATION_START_TIME: float
+    COMPUTATION_TIME_READING: float
+    COMPUTATION_TIME_BUILDING: float
+    COMPUTATION_TIME_SOLVING_FIRST: float
+    COMPUTATION_TIME_SOLVING_SECOND: float
+    COMPUTATION_TIME_BUILDING_CPLEX: float
+    COMPUTATION_TIME_DECOMPOSITION: float = 0
+    DECOMPOSITION_ITERATIONS: int = 0
+    DECOMPOSITION_BOUND: float | None = None
+    REPLANNING_LATENCIES: list
+    FALLBACK_PLANS: int = 0
+    ADMISSION_RECORDS: list  # (batch size, seconds waiting for batch, seconds of replanning) per request
+    EVENT_GRAPH_NODES: int
+    EVENT_GRAPH_EDGES: int
+    NUMBER_OF_SPLITS: int
+    INTEGRALITY_GAP_FIRST: float | None
+    INTEGRALITY_GAP_SECOND: float | None = 0
+    SOLUTION_STATUS_FIRST: str
+    NUMBER_OF_NODES_FIRST: int
+    NUMBER_OF_NODES_SECOND: int = 0
+    NUMBER_OF_VARIABLES: int
+    NUMBER_OF_CONSTRAINTS: int
+    MAX_OCCUPANCY: int
+    AVG_MAX_OCCUPANCY: int
+
+    def __init__(self):
+        self.REPLANNING_LATENCIES = []
+        self.ADMISSION_RECORDS = []
+
+
+class Run:
+    """
+    State of solving one instance: configuration, metrics, id counters of splits and events
+    and the recorder of utils.Instrumentation (None if disabled).
+    """
+    def __init__(self):
+        self.config: RunConfig = RunConfig()
+        self.metrics: RunMetrics = RunMetrics()
+        self.split_ids = itertools.count()
+        self.event_ids = itertools.count()
+        self.instrumentation = None
+
+    def next_split_id(self):
+        return next(self.split_ids)
+
+    def next_event_id(self):
+        return next(self.event_ids)
+
+
+_current_run: contextvars.ContextVar[Run] = contextvars.ContextVar("current_run")
+
+
+def current_run():
+    """
+    :return: run of the current thread or context (created on first use)
+    """
+    run = _current_run.get(None)
+    if run is None:
+        run = new_run()
+    return run
+
+
+def config() -> RunConfig:
+    """
+    :return: configuration of the current run
+    """
+    return current_run().config
+
+
+def metrics() -> RunMetrics:
+    """
+    :return: metrics of the current run
+    """
+    return current_run().metrics
+
+
+def new_run():
+    """
+    Starts a new run in the current thread or context, e.g. before the next instance.
+    :return: new run
+    """
+    run = Run()
+    _current_run.set(run)
+    return run
+
+
+@contextmanager
+def use_run(run: Run):
+    """
+    Makes run the current run of the enclosed block.
+    """
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+def run_scoped(function):
+    """
+    Decorator for entry points: the function takes an optional keyword argument run and is executed in this run
+    (in the current run if not given).
+    """
+    @functools.wraps(function)
+    def wrapper(*args, run: Run = None, **kwargs):
+        if run is None:
+            return function(*args, **kwargs)
+        with use_run(run):
+            return function(*args, **kwargs)
+    return wrapper
+
+
+def in_run(method):
+    """
+    Decorator for methods of classes bound to a run (attribute run), the method is executed in this run,
+    also if called from another thread.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with use_run(self.run):
+            return method(self, *args, **kwargs)
+    return wrapper
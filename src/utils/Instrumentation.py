@@ -0,0 +1,260 @@
+"""
+© 2025 Jonas Barth
+
+This file is licensed under the Creative Commons Attribution-NonCommercial-ShareAlike 4.0 International License (CC BY-NC-SA 4.0).
+
+You may share and adapt the material for non-commercial use, provided you give appropriate credit,
+indicate if changes were made, and distribute your contributions under the same license.
+
+License: https://creativecommons.org/licenses/by-nc-sa/4.0/
+
+File: Instrumentation.py
+Description: Instrumentation of a run: nested timing spans with peak memory, counters and call statistics
+            of hot functions, optional cProfile/pyinstrument capture of selected spans.
+            Disabled by default (one check per call), enabled with 'instrumentation' in the configuration.
+            Every run has its own recorder (see Global.Run). Exports to JSON or Chrome trace format (chrome://tracing, Perfetto).
+"""
+import cProfile
+import functools
+import importlib.util
+import json
+import os
+import pstats
+import resource
+import time
+from contextlib import contextmanager
+from typing import List, Dict, Set, NamedTuple, Any
+
+from utils import Global
+
+EXPORT_FORMATS = ["json", "chrome"]
+PROFILERS = ["cprofile", "pyinstrument"]
+
+
+class Span(NamedTuple):
+    """
+    Finished timing span, times in seconds since start of recorder.
+    """
+    name: str
+    start: float
+    duration: float
+    depth: int
+    parent: str | None
+    memory_mb: float  # peak memory of the process at end of span
+    memory_growth_mb: float  # increase of peak memory during span
+
+
+class Recorder:
+    """
+    Spans, counters, call statistics and profiles recorded in a run.
+    """
+    def __init__(self, settings: dict):
+        self.export_format: str = settings.get('format', "json")
+        if self.export_format not in EXPORT_FORMATS:
+            raise ValueError(f"the instrumentation format {self.export_format} is not registered in the system")
+        self.profiler: str = settings.get('profiler', "cprofile")
+        if self.profiler not in PROFILERS:
+            raise ValueError(f"the profiler {self.profiler} is not registered in the system")
+        # optional dependency, only needed if selected
+        if self.profiler == "pyinstrument" and importlib.util.find_spec("pyinstrument") is None:
+            raise ValueError(f"the profiler {self.profiler} is not installed")
+        self.profile_spans: Set[str] = set(settings.get('profile', []))
+
+        self.spans: List[Span] = []
+        self.counters: Dict[str, int] = {}
+        # calls and seconds of hot functions, recursive calls are counted but timed by the outermost call
+        self.functions: Dict[str, List[float]] = {}
+        # captured profiles by span name (cProfile.Profile or list of pyinstrument profilers)
+        self.profiles: Dict[str, Any] = {}
+        self.open_spans: List[str] = []
+        self.active_functions: Set[str] = set()
+        self.profiling: bool = False
+        self.start_time: float = time.perf_counter()
+
+    def start_profiler(self, name: str):
+        """
+        :return: started profiler for a span of the name, None if the span is not profiled or a profiler is running
+        """
+        if name not in self.profile_spans or self.profiling:
+            return None
+        self.profiling = True
+        if self.profiler == "cprofile":
+            # spans of the same name add to one profile
+            profiler = self.profiles.setdefault(name, cProfile.Profile())
+            profiler.enable()
+        else:
+            import pyinstrument
+            profiler = pyinstrument.Profiler()
+            self.profiles.setdefault(name, []).append(profiler)
+            profiler.start()
+        return profiler
+
+    def stop_profiler(self, profiler):
+        if profiler is None:
+            return
+        if self.profiler == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+        self.profiling = False
+
+
+def configure(settings: dict | None):
+    """
+    Enables instrumentation of the current run with the 'instrumentation' entry of the configuration, e.g.
+    {"format": "chrome", "profile": ["event_graph"], "profiler": "cprofile"}, None disables it.
+    :param settings: dictionary of instrumentation settings
+    """
+    Global.current_run().instrumentation = None if settings is None else Recorder(settings)
+
+
+def get_recorder():
+    """
+    :return: recorder of the current run, None if instrumentation is disabled
+    """
+    return Global.current_run().instrumentation
+
+
+def get_peak_memory():
+    """
+    :return: peak memory of the process so far (in MB)
+    """
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Times the enclosed block as span, nested in the enclosing span.
+    :param name: name of span (spans of the same name are profiled if selected)
+    """
+    recorder: Recorder = get_recorder()
+    if recorder is None:
+        yield
+        return
+
+    parent = recorder.open_spans[-1] if len(recorder.open_spans) > 0 else None
+    depth = len(recorder.open_spans)
+    recorder.open_spans.append(name)
+    memory_start = get_peak_memory()
+    profiler = recorder.start_profiler(name)
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start_time
+        recorder.stop_profiler(profiler)
+        recorder.open_spans.pop()
+        memory_end = get_peak_memory()
+        recorder.spans.append(Span(name, start_time - recorder.start_time, duration, depth, parent, memory_end,
+                                   round(memory_end - memory_start, 1)))
+
+
+def traced(name: str):
+    """
+    Decorator recording every call of the function as span.
+    :param name: name of span
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if get_recorder() is None:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed(name: str):
+    """
+    Decorator counting calls and time of a hot function without recording spans,
+    the time of recursive calls is part of the outermost call.
+    :param name: name of function in the statistics
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            recorder: Recorder = get_recorder()
+            if recorder is None:
+                return function(*args, **kwargs)
+            statistics = recorder.functions.setdefault(name, [0, 0.0])
+            statistics[0] += 1
+            if name in recorder.active_functions:
+                return function(*args, **kwargs)
+
+            recorder.active_functions.add(name)
+            start_time = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                statistics[1] += time.perf_counter() - start_time
+                recorder.active_functions.discard(name)
+        return wrapper
+    return decorator
+
+
+def count(name: str, value: int = 1):
+    """
+    Adds value to a counter.
+    """
+    recorder: Recorder = get_recorder()
+    if recorder is not None:
+        recorder.counters[name] = recorder.counters.get(name, 0) + value
+
+
+def to_dict(recorder: Recorder):
+    """
+    :return: spans, counters and call statistics as dictionary
+    """
+    return {"spans": [x._asdict() | {"start": round(x.start, 6), "duration": round(x.duration, 6)}
+                      for x in recorder.spans],
+            "functions": {x: {"calls": y[0], "seconds": round(y[1], 6)} for x, y in sorted(recorder.functions.items())},
+            "counters": dict(sorted(recorder.counters.items())),
+            "peak_memory_mb": get_peak_memory()}
+
+
+def to_chrome_trace(recorder: Recorder):
+    """
+    :return: trace in Chrome trace event format, spans as complete events (times in microseconds),
+            memory as counter events, call statistics and counters as metadata
+    """
+    process_id = os.getpid()
+    events: List[dict] = [{"name": "process_name", "ph": "M", "pid": process_id, "tid": 0,
+                           "args": {"name": "liDARPT"}}]
+    for x in sorted(recorder.spans, key=lambda y: (y.start, y.depth)):
+        events.append({"name": x.name, "cat": "span", "ph": "X", "pid": process_id, "tid": 0,
+                       "ts": round(x.start * 1e6, 1), "dur": round(x.duration * 1e6, 1),
+                       "args": {"memory_mb": x.memory_mb, "memory_growth_mb": x.memory_growth_mb}})
+        events.append({"name": "peak memory", "ph": "C", "pid": process_id, "tid": 0,
+                       "ts": round((x.start + x.duration) * 1e6, 1), "args": {"MB": x.memory_mb}})
+    data = to_dict(recorder)
+    return {"traceEvents": events, "displayTimeUnit": "ms",
+            "otherData": {"functions": data["functions"], "counters": data["counters"],
+                          "peak_memory_mb": data["peak_memory_mb"]}}
+
+
+def write_output(path_to_output: str):
+    """
+    Writes the instrumentation of the current run (instrumentation_out.json or trace_out.json) and captured profiles
+    (profile_<span>.prof for pstats/snakeviz or profile_<span>_<number>.html) to the output directory.
+    :param path_to_output: output directory of the instance
+    """
+    recorder: Recorder = get_recorder()
+    if recorder is None:
+        return
+
+    if recorder.export_format == "chrome":
+        with open(f"{path_to_output}/trace_out.json", mode="w", encoding="utf-8") as file:
+            json.dump(to_chrome_trace(recorder), file)
+    else:
+        with open(f"{path_to_output}/instrumentation_out.json", mode="w", encoding="utf-8") as file:
+            json.dump(to_dict(recorder), file, indent=1)
+
+    for name, profile in recorder.profiles.items():
+        if recorder.profiler == "cprofile":
+            pstats.Stats(profile).dump_stats(f"{path_to_output}/profile_{name}.prof")
+        else:
+            for index, profiler in enumerate(profile):
+                with open(f"{path_to_output}/profile_{name}_{index}.html", mode="w", encoding="utf-8") as file:
+                    file.write(profiler.output_html())
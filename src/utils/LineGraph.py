@@ -14,7 +14,8 @@ Description: Graph structure for a network of lines and stops.
 """
 from typing import List, Set, Dict, Tuple
 
-from utils import Timer, RequestPreprocessing
+from utils import Timer, RequestPreprocessing, Instrumentation
+from utils.Global import RunConfig
 from models.Network import Bus, Stop, Line
 
 
@@ -23,14 +24,11 @@ class LineEdge:
     Edge for the LineGraph class, consists of two stops and a line,
     Only instantiated between transfer stops, transfer to pick-up/drop-off location or pick-up and drop-off location of request.
     """
-    def __init__(self, v1: Stop, v2: Stop, line: Line, duration: int = -1):
+    def __init__(self, v1: Stop, v2: Stop, line: Line, duration: int):
         self.v1: Stop = v1
         self.v2: Stop = v2
         self.line: Line = line
-        if duration == -1:
-            self.duration: int = Timer.calc_time(v1.calc_distance(v2))
-        else:
-            self.duration: int = duration
+        self.duration: int = duration
 
     def contains_stop(self, v: Stop):
         if self.v1 == v or self.v2 == v:
@@ -46,8 +44,12 @@ class LineGraph:
     """
     Models directed Graph for network of lines and stops.
     Graph is altered for every request to incorporate individual drop-off and pick-up location.
+    Travel times use speed and unit distance of the configuration it is built with.
     """
-    def __init__(self, network: List[Bus]):
+    @Instrumentation.traced("line_graph")
+    def __init__(self, network: List[Bus], config: RunConfig):
+        self.average_kmh: float = config.AVERAGE_KMH
+        self.km_per_unit: float = config.KM_PER_UNIT
         self.all_lines: Set[Line] = {bus.line for bus in network}
         self._graph_dict: Dict[Stop, Tuple[Set[LineEdge], Set[LineEdge]]] = {}
         self.transfer_nodes: Set[Stop] = set()
@@ -56,6 +58,12 @@ class LineGraph:
         self.temp_edges: Set[LineEdge] | None = None
         self.all_stops: Set[Stop] = set().union(*[set(x.stops) for x in self.all_lines])
 
+    def travel(self, stop_a: Stop, stop_b: Stop):
+        """
+        :return: travel time between the stops in seconds
+        """
+        return Timer.calc_time(stop_a.calc_distance(stop_b, self.km_per_unit), self.average_kmh)
+
     def get_nodes(self):
         return self._graph_dict.keys()
 
@@ -85,7 +93,7 @@ class LineGraph:
                     self._graph_dict[transfer_a] = (set(), set())
 
                 for other_stop in (transfer_stops_a - {transfer_a}):
-                    duration: int = Timer.calc_time(transfer_a.calc_distance(other_stop))
+                    duration: int = self.travel(transfer_a, other_stop)
                     edge_to = LineEdge(transfer_a, other_stop, line_a, duration)
                     self._graph_dict[transfer_a][1].add(edge_to)
 
@@ -113,7 +121,7 @@ class LineGraph:
 
             self._graph_dict[pick_up] = (set(), set())
             for stop in transfer_stops:
-                duration: int = Timer.calc_time(pick_up.calc_distance(stop))
+                duration: int = self.travel(pick_up, stop)
                 edge_to = LineEdge(pick_up, stop, pick_up_line, duration)
                 self._graph_dict[pick_up][1].add(edge_to)
                 self._graph_dict[stop][0].add(edge_to)
@@ -125,7 +133,7 @@ class LineGraph:
 
             self._graph_dict[drop_off] = (set(), set())
             for stop in transfer_stops:
-                duration: int = Timer.calc_time(stop.calc_distance(drop_off))
+                duration: int = self.travel(stop, drop_off)
                 edge_from = LineEdge(stop, drop_off, drop_off_line, duration)
                 self._graph_dict[drop_off][0].add(edge_from)
                 self._graph_dict[stop][1].add(edge_from)
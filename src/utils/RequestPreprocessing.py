@@ -16,7 +16,8 @@ import math
 from typing import Dict, Set, List, Tuple
 
 from models.Network import Stop, Line
-from utils import Global, Timer
+from utils import Global, Timer, Instrumentation
+from utils.Global import RunConfig
 from models.Demand import SplitRequest, Request
 from utils.LineGraph import LineGraph, LineEdge
 from utils.PriorityQueue import PriorityQueue
@@ -24,14 +25,16 @@ from utils.Timer import TimeImpl
 from models.Plan import RouteStop
 
 
+@Instrumentation.timed("dijkstra")
 def calc_fastest(pick_up_location: Stop, drop_off_location: Stop, network_graph: LineGraph,
-                 number_of_passengers: int) -> Tuple[int, int]:
+                 number_of_passengers: int, transfer_seconds: int) -> Tuple[int, int]:
     """
     Calculates the fastest route of a request from pick-up to drop-off with Dijkstra-Algorithm.
     :param pick_up_location: pick-up stop of request
     :param drop_off_location: drop-off stop of request
     :param network_graph: LineGraph with request-specific edges
     :param number_of_passengers: number of passengers connected to request
+    :param transfer_seconds: time of every boarding (and transfer)
     :return: Tuple of fastest time to arrive at destination and the number of transfers required.
     """
     pred_dict: Dict[Stop, (
@@ -45,7 +48,7 @@ def calc_fastest(pick_up_location: Stop, drop_off_location: Stop, network_graph:
     pred_dict[pick_up_location] = (pick_lines, 1)
 
     queue: PriorityQueue = PriorityQueue(network_graph.get_nodes())
-    queue.replace(pick_up_location, Global.TRANSFER_SECONDS)
+    queue.replace(pick_up_location, transfer_seconds)
 
     while (not queue.is_empty()) and (queue.get_priority(drop_off_location) is not None):
         v, dist_v = queue.pop()
@@ -59,7 +62,7 @@ def calc_fastest(pick_up_location: Stop, drop_off_location: Stop, network_graph:
                     alter: int = dist_v + adj_edge.duration
 
                     if adj_edge.line not in pred_dict[v][0]:
-                        alter += Global.TRANSFER_SECONDS
+                        alter += transfer_seconds
                         numb_transfer += 1
 
                     # if equal decide by number of transfers
@@ -73,26 +76,31 @@ def calc_fastest(pick_up_location: Stop, drop_off_location: Stop, network_graph:
     return fast_time, transfers
 
 
-def complete_request(pick_up: Stop, drop_off: Stop, network_graph: LineGraph, number_of_passengers: int):
+def complete_request(pick_up: Stop, drop_off: Stop, network_graph: LineGraph, number_of_passengers: int,
+                     config: RunConfig):
     """
     Fills out required info from data input of request
     :param pick_up: pick-up stop of request
     :param drop_off: drop-off stop of request
     :param network_graph: LineGraph with request-specific edges
     :param number_of_passengers: number of passengers connected to request
+    :param config: configuration of the run (transfer time, maximum delay)
     :return: maximum travel time, number of transfers in shortest route, duration of shortest route
     """
     # calculate fastest time -> account for transfers -> plug into max_delay_equation, return corresp. km
-    fastest_time, numb_transfers = calc_fastest(pick_up, drop_off, network_graph, number_of_passengers)
+    fastest_time, numb_transfers = calc_fastest(pick_up, drop_off, network_graph, number_of_passengers,
+                                                  config.TRANSFER_SECONDS)
     assert fastest_time is not Global.INFINITE_INT
-    long_delay: int = 60 * max(0, round(eval(Global.MAX_DELAY_EQUATION, {"math": math, "x": (fastest_time / 60)})))
+    long_delay: int = 60 * max(0, round(eval(config.MAX_DELAY_EQUATION, {"math": math, "x": (fastest_time / 60)})))
 
     return long_delay + fastest_time, numb_transfers, fastest_time
 
 
+@Instrumentation.timed("dfs")
 def rec_dfs(last_line: LineEdge, curr_seconds: int, curr_transfers: int, prev_visited: Set[Stop],
             curr_open: List[SplitRequest], look_up_dict: Dict[LineEdge, SplitRequest], max_time: int,
-            max_hop_count: int, target: Stop, network_graph: LineGraph, number_of_passengers: int):
+            max_hop_count: int, target: Stop, network_graph: LineGraph, number_of_passengers: int,
+            transfer_seconds: int):
     """
     Finds all route options for a request
     Recursive method for Depth-First-Search on LineGraph
@@ -107,6 +115,7 @@ def rec_dfs(last_line: LineEdge, curr_seconds: int, curr_transfers: int, prev_vi
     :param target: drop-off location of request
     :param network_graph: request-specific LineGraph
     :param number_of_passengers: number of passengers of request
+    :param transfer_seconds: time of every transfer
     :return: List of List of SplitRequests
     """
     if curr_transfers > max_hop_count or curr_seconds > max_time:
@@ -124,9 +133,9 @@ def rec_dfs(last_line: LineEdge, curr_seconds: int, curr_transfers: int, prev_vi
 
             combined_poss: List[List[SplitRequest]] = []
             for suc in successors:
-                combined_poss += rec_dfs(suc, curr_seconds + Global.TRANSFER_SECONDS + suc.duration, curr_transfers + 1,
+                combined_poss += rec_dfs(suc, curr_seconds + transfer_seconds + suc.duration, curr_transfers + 1,
                                          prev_visited.copy(), curr_open.copy(), look_up_dict, max_time,
-                                         max_hop_count, target, network_graph, number_of_passengers)
+                                         max_hop_count, target, network_graph, number_of_passengers, transfer_seconds)
 
             return combined_poss
 
@@ -135,11 +144,12 @@ def rec_dfs(last_line: LineEdge, curr_seconds: int, curr_transfers: int, prev_vi
 # + Per request: make SplitRequest for all pick-up/drop-off to transfer points subroutes(for every request) and for all subroutes in network -> store in dict
 
 # only call dfs once with split-req dict, starting at all subroutes of start -> check time and transfer constraints
-def find_split_requests(request: Request, network_graph: LineGraph) -> List[List[SplitRequest]]:
+def find_split_requests(request: Request, network_graph: LineGraph, config: RunConfig) -> List[List[SplitRequest]]:
     """
     Finds all SplitRequests for given request. Builds look-up-dictionary of LineEdge to SplitRequest, before calling rec_dfs
     :param request: object of request
     :param network_graph: request-specific LineGraph
+    :param config: configuration of the run (transfer time, number of extra transfers)
     :return: List of List of SplitRequests (each list is a route option)
     """
     pick_up_edges: List[LineEdge] = network_graph.get_edges_out(request.pick_up_location)
@@ -180,34 +190,40 @@ def find_split_requests(request: Request, network_graph: LineGraph) -> List[List
 
     for start_sub_line in start_tupels:
         if start_sub_line.line.capacity >= request.number_of_passengers:
-            result += rec_dfs(start_sub_line, Global.TRANSFER_SECONDS + start_sub_line.duration, 1,
+            result += rec_dfs(start_sub_line, config.TRANSFER_SECONDS + start_sub_line.duration, 1,
                                {request.pick_up_location},
-                               [], agg_edges_dict, max_time, request.numb_transfer + Global.NUMBER_OF_EXTRA_TRANSFERS,
-                               request.drop_off_location, network_graph, request.number_of_passengers)
+                               [], agg_edges_dict, max_time, request.numb_transfer + config.NUMBER_OF_EXTRA_TRANSFERS,
+                               request.drop_off_location, network_graph, request.number_of_passengers,
+                               config.TRANSFER_SECONDS)
 
-    return [x for x in result if len(x) > 0]
+    result = [x for x in result if len(x) > 0]
+    Instrumentation.count("route_options", len(result))
+    return result
 
 
-def fill_time_windows(request: Request, split_req_list: List[SplitRequest]):
+def fill_time_windows(request: Request, split_req_list: List[SplitRequest], config: RunConfig):
     """
     Fill the time windows of split requests of a route option
     :param request: Object of a request
     :param split_req_list: list of split requests of route option
+    :param config: configuration of the run (speed, unit distance, transfer time, time window)
     """
     # go through split_req_list and fill time windows (as big as possible)
+    transfer_seconds = config.TRANSFER_SECONDS
 
-    total_distance: float = sum(x.pick_up_location.calc_distance(x.drop_off_location) for x in split_req_list)
+    total_distance: float = sum(x.pick_up_location.calc_distance(x.drop_off_location, config.KM_PER_UNIT)
+                                for x in split_req_list)
 
-    shortest_time: int = Timer.calc_time(total_distance) + (len(split_req_list) * Global.TRANSFER_SECONDS)
+    shortest_time: int = Timer.calc_time(total_distance, config.AVERAGE_KMH) + (len(split_req_list) * transfer_seconds)
     curr_earl_time: int = 0
 
     # special case for first split, because of fixed time window for pick-up
     start_split = split_req_list[0]
     start_split.earl_start_time = request.earl_start_time.add_seconds(0)
-    start_split.latest_start_time = request.earl_start_time.add_seconds(Global.TIME_WINDOW_SECONDS)
+    start_split.latest_start_time = request.earl_start_time.add_seconds(config.TIME_WINDOW_SECONDS)
 
-    curr_earl_time += Global.TRANSFER_SECONDS + Timer.calc_time(
-        start_split.pick_up_location.calc_distance(start_split.drop_off_location))
+    curr_earl_time += transfer_seconds + Timer.calc_time(
+        start_split.pick_up_location.calc_distance(start_split.drop_off_location, config.KM_PER_UNIT), config.AVERAGE_KMH)
 
     start_split.earl_arr_time = start_split.earl_start_time.add_seconds(curr_earl_time)
     prop_lat_arr: TimeImpl = request.latest_arr_time.sub_seconds(shortest_time - curr_earl_time)
@@ -221,8 +237,8 @@ def fill_time_windows(request: Request, split_req_list: List[SplitRequest]):
         if split_req.earl_start_time is None or split_req.earl_start_time > prop_time_earl_start:
             split_req.earl_start_time = prop_time_earl_start
 
-        intermediate_time = Global.TRANSFER_SECONDS + Timer.calc_time(
-            split_req.pick_up_location.calc_distance(split_req.drop_off_location))
+        intermediate_time = transfer_seconds + Timer.calc_time(
+            split_req.pick_up_location.calc_distance(split_req.drop_off_location, config.KM_PER_UNIT), config.AVERAGE_KMH)
 
         prop_time_earl_arr = prop_time_earl_start.add_seconds(intermediate_time)
         if split_req.earl_arr_time is None or split_req.earl_arr_time > prop_time_earl_arr:
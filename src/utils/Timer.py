@@ -15,8 +15,6 @@ Description: Basic Implementation of Time class based on seconds
 from dataclasses import dataclass
 from typing import List
 
-from utils import Global
-
 
 def convert_2_time_from_sec(duration_sec: int):
     h = int(duration_sec // 3600)
@@ -27,13 +25,13 @@ def convert_2_time_from_sec(duration_sec: int):
 
 
 # gives duration in seconds
-def calc_time(distance: float) -> int:
-    return round((distance * 3600) / Global.AVERAGE_KMH)
+def calc_time(distance: float, average_kmh: float) -> int:
+    return round((distance * 3600) / average_kmh)
 
 
 # can lead to issues with distance
-def conv_time_to_dist(duration: int):
-    return (duration * Global.AVERAGE_KMH) / 3600
+def conv_time_to_dist(duration: int, average_kmh: float):
+    return (duration * average_kmh) / 3600
 
 
 def conv_string_2_time(time_string: str):